@@ -2,8 +2,14 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import joblib
-from src.optimization import PriceOptimizer
-from src.visualization import InterfaceDesigner
+import os
+import sys
+
+# Модули src импортируют друг друга напрямую, как при запуске скриптов
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+from optimization import PriceOptimizer
+from visualization import InterfaceDesigner
 import matplotlib.pyplot as plt
 
 st.set_page_config(page_title="Drivee Assistant", layout="wide")
@@ -18,10 +24,20 @@ duration = st.sidebar.number_input("Длительность (мин)", 5, 120,
 driver_rating = st.sidebar.slider("Рейтинг водителя", 1.0, 5.0, 4.7)
 order_hour = st.sidebar.slider("Час заказа", 0, 23, 18)
 
+@st.cache_resource
+def get_optimizer():
+    """Один оптимизатор на процесс: модель загружается при первом расчете"""
+    return PriceOptimizer(verbose=False)
+
+@st.cache_resource
+def get_designer():
+    """Макет карточки строится один раз, для заказа меняются только тексты и шкала"""
+    return InterfaceDesigner(reuse=True)
+
 if st.button("Рассчитать оптимальную цену"):
     try:
-        optimizer = PriceOptimizer()
-        designer = InterfaceDesigner()
+        optimizer = get_optimizer()
+        designer = get_designer()
         
         order_features = {
             'price_start_local': base_price,
@@ -58,8 +74,7 @@ if st.button("Рассчитать оптимальную цену"):
                 'base_price': base_price
             }
             
-            fig = designer.create_driver_interface(order_info, result)
-            st.pyplot(fig)
+            st.image(designer.render_png(order_info, result))
     
     except Exception as e:
         st.error(f"Ошибка: {e}")
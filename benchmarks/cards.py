@@ -0,0 +1,84 @@
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+# Получаем абсолютные пути
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from visualization import InterfaceDesigner, render_svg, render_cards
+
+
+def sample_cards(n_cards: int) -> list:
+    """Карточки с разными ценами, вероятностями и без безопасной цены у каждой третьей"""
+    cards = []
+    for i in range(n_cards):
+        price = 250 + i % 200
+        order_info = {'distance_km': 2 + i % 20, 'duration_min': 8 + i % 40, 'base_price': 200 + i % 200}
+        recommendations = {
+            'optimal': {'price': price, 'probability': 0.3 + (i % 60) / 100, 'expected_revenue': price * 0.6},
+            'safe': {'price': price - 30, 'probability': 0.85, 'expected_revenue': (price - 30) * 0.85} if i % 3 else None
+        }
+        cards.append((order_info, recommendations))
+    return cards
+
+
+def median_ms(func, cards) -> float:
+    """Медиана времени на карточку (миллисекунды)"""
+    times = []
+    for card in cards:
+        start = time.perf_counter()
+        func(*card)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Задержка отрисовки карточки водителя")
+    parser.add_argument('--cards', type=int, default=30, help="Карточек на замер одной карточки")
+    parser.add_argument('--batch', type=int, default=2000, help="Карточек в пакетном замере")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--dpi', type=int, default=100)
+    args = parser.parse_args()
+
+    print("⏱️ ОТРИСОВКА КАРТОЧКИ ВОДИТЕЛЯ")
+    print("=" * 50)
+    cards = sample_cards(args.cards)
+
+    designer = InterfaceDesigner()
+    classic = median_ms(designer.create_driver_interface, cards)
+    classic_png = median_ms(lambda *card: designer.render_png(*card, dpi=args.dpi), cards)
+    plt.close('all')
+
+    reuse = InterfaceDesigner(reuse=True)
+    reuse.render_png(*cards[0], dpi=args.dpi)
+    update = median_ms(reuse.create_driver_interface, cards)
+    reuse_png = median_ms(lambda *card: reuse.render_png(*card, dpi=args.dpi), cards)
+    svg = median_ms(render_svg, cards)
+
+    print("📊 Одна карточка (медиана):")
+    print(f"   - Новая фигура: {classic:.1f} мс, с PNG {args.dpi} dpi: {classic_png:.1f} мс")
+    print(f"   - Переиспользуемый макет: обновление {update:.2f} мс, PNG: {reuse_png:.1f} мс")
+    print(f"   - SVG по шаблону: {svg * 1000:.0f} мкс")
+
+    batch = sample_cards(args.batch)
+    print(f"📦 Пакет из {len(batch)} карточек, процессов: {args.workers}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend, cards_for_backend in (('svg', batch), ('png', batch[:max(args.workers * 50, 50)])):
+            start = time.perf_counter()
+            render_cards(cards_for_backend, os.path.join(tmp, backend), backend, args.workers, dpi=args.dpi)
+            elapsed = time.perf_counter() - start
+            print(f"   - {backend}: {len(cards_for_backend)} карточек за {elapsed:.1f} с "
+                  f"({elapsed / len(cards_for_backend) * 1000:.2f} мс на карточку)")
+
+
+if __name__ == "__main__":
+    main()
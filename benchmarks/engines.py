@@ -0,0 +1,97 @@
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import joblib
+
+# Получаем абсолютные пути
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from columnar import load_dataset
+from features import build_frame
+from model import prepare_features, train_model, ENGINES, INPUT_COLUMNS, data_dir
+from optimization import PriceOptimizer
+
+REPEATS = 200
+
+
+def median_ms(func, repeats: int = REPEATS) -> float:
+    """Медианное время вызова func (миллисекунды)"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def compare(engine: str, X_train, y_train, X_test, y_test) -> dict:
+    from sklearn.metrics import roc_auc_score
+
+    start = time.perf_counter()
+    model = train_model(X_train, y_train, engine)
+    train_time = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'model.joblib')
+        joblib.dump(model, path)
+        size = os.path.getsize(path)
+
+    row = X_test.iloc[:1]
+    batch = X_test.iloc[:10000]
+    optimizer = PriceOptimizer(model)
+    order = row.iloc[0].to_dict()
+    # find_optimal_price печатает строку на каждый вызов
+    with contextlib.redirect_stdout(io.StringIO()):
+        optimize_ms = median_ms(lambda: optimizer.find_optimal_price(order), repeats=50)
+    return {
+        'train_s': train_time,
+        'single_ms': median_ms(lambda: model.predict_proba(row)),
+        'batch_ms': median_ms(lambda: model.predict_proba(batch), repeats=5),
+        'batch_rows': len(batch),
+        'optimize_ms': optimize_ms,
+        'size_mb': size / 1e6,
+        'auc': roc_auc_score(y_test, model.predict_proba(X_test)[:, 1])
+    }
+
+
+def main():
+    from sklearn.model_selection import train_test_split
+
+    parser = argparse.ArgumentParser(description="Сравнение движков обучения модели принятия")
+    parser.add_argument('--data', default=os.path.join(data_dir, 'train.csv'))
+    parser.add_argument('--engines', nargs='+', choices=list(ENGINES), default=list(ENGINES))
+    args = parser.parse_args()
+
+    print("⏱️ СРАВНЕНИЕ ДВИЖКОВ ОБУЧЕНИЯ")
+    print("=" * 50)
+
+    data, features = prepare_features(load_dataset(args.data, INPUT_COLUMNS + ['is_done']).copy())
+    data = data[features + ['is_done']].dropna()
+    X_train, X_test, y_train, y_test = train_test_split(
+        build_frame(data, features), data['is_done'], test_size=0.2, random_state=42, stratify=data['is_done']
+    )
+    print(f"📦 Обучение: {len(X_train)} строк, проверка: {len(X_test)} строк")
+
+    results = {engine: compare(engine, X_train, y_train, X_test, y_test) for engine in args.engines}
+
+    print("\n📊 Результаты:")
+    for engine, result in results.items():
+        print(f"   {ENGINES[engine]}:")
+        print(f"      - Обучение: {result['train_s']:.2f} с")
+        print(f"      - Одна строка: {result['single_ms']:.2f} мс")
+        print(f"      - Батч {result['batch_rows']} строк: {result['batch_ms']:.1f} мс")
+        print(f"      - find_optimal_price: {result['optimize_ms']:.2f} мс")
+        print(f"      - Размер модели: {result['size_mb']:.2f} МБ")
+        print(f"      - ROC-AUC: {result['auc']:.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+# Получаем абсолютные пути
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from batch_scoring import score_csv, score_csv_parallel
+from model_loader import load_model, MODEL_PATH
+
+
+def make_orders(path: str, n_rows: int, seed: int = 42):
+    """Синтетические заказы в формате test.csv"""
+    rng = np.random.default_rng(seed)
+    price_start = rng.integers(200, 500, n_rows)
+    pd.DataFrame({
+        'price_start_local': price_start,
+        'price_bid_local': np.round(price_start * rng.uniform(1.0, 1.5, n_rows)),
+        'driver_rating': np.round(rng.uniform(3.5, 5.0, n_rows), 2),
+        'distance_in_meters': rng.integers(1000, 20000, n_rows),
+        'order_hour': rng.integers(0, 24, n_rows)
+    }).to_csv(path, index=False)
+
+
+def worker_counts(max_workers: int):
+    counts, n = [], 1
+    while n < max_workers:
+        counts.append(n)
+        n *= 2
+    return counts + [max_workers]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Масштабирование пакетной оценки по ядрам")
+    parser.add_argument('--rows', type=int, default=400000)
+    parser.add_argument('--chunk-size', type=int, default=50000)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    print("⏱️ БЕНЧМАРК ПАРАЛЛЕЛЬНОЙ ОЦЕНКИ")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, 'orders.csv')
+        make_orders(input_path, args.rows)
+        print(f"📦 {args.rows} заказов, порции по {args.chunk_size}, ядер: {os.cpu_count()}")
+
+        reference_path = os.path.join(tmp, 'reference.csv')
+        start = time.perf_counter()
+        score_csv(input_path, reference_path, load_model(MODEL_PATH), args.chunk_size)
+        baseline = time.perf_counter() - start
+        reference = pd.read_csv(reference_path)['is_done'].to_numpy()
+
+        results = []
+        for n_workers in worker_counts(args.max_workers):
+            output_path = os.path.join(tmp, f'workers_{n_workers}.csv')
+            start = time.perf_counter()
+            score_csv_parallel(input_path, output_path, n_workers, chunk_size=args.chunk_size)
+            elapsed = time.perf_counter() - start
+            same = np.array_equal(pd.read_csv(output_path)['is_done'].to_numpy(), reference)
+            results.append((n_workers, elapsed, same))
+
+    print(f"\n📊 Результаты ({args.rows} строк):")
+    print(f"   - score_csv (sklearn, один процесс): {args.rows / baseline:.0f} строк/с")
+    single = results[0][1]
+    for n_workers, elapsed, same in results:
+        speedup = single / elapsed
+        print(f"   - {n_workers} процесс(ов): {args.rows / elapsed:.0f} строк/с, "
+              f"ускорение {speedup:.2f}x, эффективность {speedup / n_workers:.0%}"
+              f"{'' if same else ' ❌ предсказания отличаются!'}")
+
+
+if __name__ == "__main__":
+    main()
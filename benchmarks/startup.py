@@ -0,0 +1,67 @@
+import os
+import statistics
+import subprocess
+import sys
+
+# Получаем абсолютные пути
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+src_dir = os.path.join(project_root, 'src')
+
+# Модули, импорт которых должен быть почти мгновенным
+MODULES = ['optimization', 'model', 'visualization', 'recommendation_cache', 'markup_table']
+
+REPEATS = 5
+
+
+def measure(code: str) -> float:
+    """Время выполнения кода в чистом процессе Python (секунды)"""
+    script = (
+        "import time\n"
+        "start = time.perf_counter()\n"
+        f"{code}\n"
+        "print(time.perf_counter() - start)\n"
+    )
+    env = dict(os.environ, MPLBACKEND='Agg')
+    result = subprocess.run([sys.executable, '-c', script], cwd=src_dir, env=env,
+                            capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def median_time(code: str) -> float:
+    return statistics.median(measure(code) for _ in range(REPEATS))
+
+
+def main():
+    print("⏱️ БЕНЧМАРК ВРЕМЕНИ ЗАПУСКА")
+    print("=" * 50)
+
+    print("\n📦 Импорт модулей (медиана по чистым процессам):")
+    for module in MODULES:
+        print(f"   - import {module}: {median_time(f'import {module}') * 1000:.0f} мс")
+
+    print("\n📥 Загрузка модели:")
+    import_only = median_time("import optimization")
+    first_use = median_time(
+        "from optimization import PriceOptimizer\n"
+        "PriceOptimizer().model"
+    )
+    mmap_use = median_time(
+        "from optimization import PriceOptimizer\n"
+        "PriceOptimizer(mmap_mode='r').model"
+    )
+    shared = median_time(
+        "from model_loader import load_model\n"
+        "load_model()\n"
+        "start = time.perf_counter()\n"
+        "load_model()"
+    )
+    print(f"   - Только импорт optimization: {import_only * 1000:.0f} мс")
+    print(f"   - Импорт + загрузка при первом расчете: {first_use * 1000:.0f} мс")
+    print(f"   - То же с mmap_mode='r': {mmap_use * 1000:.0f} мс")
+    print(f"   - Повторное обращение к общей модели: {shared * 1e6:.0f} мкс")
+    print(f"\n✅ Импорт без загрузки модели быстрее в {first_use / import_only:.1f} раза")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+# Получаем абсолютные пути
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+src_dir = os.path.join(project_root, 'src')
+sys.path.insert(0, src_dir)
+
+from create_data import iter_blocks
+from features import build_frame
+from model import train_model
+
+# Методы find_optimal_price, для которых меряется задержка
+OPTIMIZER_METHODS = ['grid', 'golden', 'exact']
+TRAIN_ROWS = [10000, 100000, 1000000]
+QUICK_TRAIN_ROWS = [10000, 100000]
+# Повторы пакетных замеров: берется лучший, он меньше всего зависит от фоновой нагрузки
+BATCH_REPEATS = 3
+WARMUP_ORDERS = 5
+
+
+def synthetic_orders(n_rows: int, seed: int = 42) -> pd.DataFrame:
+    """Синтетические заказы генератора create_data (принятие зависит от надбавки)"""
+    blocks = list(iter_blocks(n_rows, seed))
+    return pd.DataFrame({name: np.concatenate([block[name] for block in blocks]) for name in blocks[0]})
+
+
+def metric(value: float, unit: str, better: str) -> dict:
+    return {'value': float(value), 'unit': unit, 'better': better}
+
+
+def best_seconds(func, repeats: int = BATCH_REPEATS) -> float:
+    """Лучшее время из repeats вызовов func (секунды)"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def bench_optimizer(model_path: str, n_orders: int) -> dict:
+    """p50/p99 задержки find_optimal_price по методам"""
+    from optimization import PriceOptimizer
+
+    orders = synthetic_orders(n_orders, seed=7).drop(columns=['price_bid_local', 'is_done'])
+    results = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        optimizer = PriceOptimizer(model_path=model_path)
+        optimizer.model
+        for method in OPTIMIZER_METHODS:
+            for order in orders.iloc[:WARMUP_ORDERS].to_dict('records'):
+                optimizer.find_optimal_price(order, method=method)
+            latencies = []
+            for order in orders.to_dict('records'):
+                start = time.perf_counter()
+                optimizer.find_optimal_price(order, method=method)
+                latencies.append((time.perf_counter() - start) * 1000)
+            results[f'optimizer.{method}.p50'] = metric(np.percentile(latencies, 50), 'ms', 'lower')
+            results[f'optimizer.{method}.p99'] = metric(np.percentile(latencies, 99), 'ms', 'lower')
+    return results
+
+
+def bench_batch(model_path: str, n_rows: int) -> dict:
+    """Пропускная способность пакетной оценки и оптимизации"""
+    from batch_scoring import score_chunk
+    from model_loader import load_model
+    from optimization import PriceOptimizer
+    from tree_engine import CompiledForest
+
+    orders = synthetic_orders(n_rows, seed=11)
+    model = load_model(model_path)
+    results = {}
+
+    seconds = best_seconds(lambda: score_chunk(model, orders))
+    results['batch.sklearn.rows_per_s'] = metric(n_rows / seconds, 'rows/s', 'higher')
+
+    compiled = CompiledForest.from_model(model)
+    seconds = best_seconds(lambda: score_chunk(compiled, orders))
+    results['batch.compiled.rows_per_s'] = metric(n_rows / seconds, 'rows/s', 'higher')
+
+    batch_orders = orders.iloc[:min(n_rows, 20000)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        optimizer = PriceOptimizer(model)
+        seconds = best_seconds(lambda: optimizer.optimize_batch(batch_orders))
+    results['batch.optimize.orders_per_s'] = metric(len(batch_orders) / seconds, 'orders/s', 'higher')
+    return results
+
+
+def run_child(*args) -> dict:
+    """Запуск замера в чистом процессе: время и пик памяти не смешиваются между замерами"""
+    env = dict(os.environ, MPLBACKEND='Agg')
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), *args], env=env,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def bench_load(model_path: str, repeats: int = 3) -> dict:
+    """Время загрузки модели в новом процессе (медиана)"""
+    runs = [run_child('_load', model_path) for _ in range(repeats)]
+    return {'model.load': metric(statistics.median(run['seconds'] for run in runs) * 1000, 'ms', 'lower')}
+
+
+def bench_training(row_counts: list) -> dict:
+    """Время обучения и пик памяти процесса от числа строк"""
+    results = {}
+    for n_rows in row_counts:
+        run = run_child('_train', str(n_rows))
+        results[f'train.{n_rows}.seconds'] = metric(run['seconds'], 's', 'lower')
+        results[f'train.{n_rows}.peak_rss'] = metric(run['peak_rss_mb'], 'MB', 'lower')
+        print(f"   - {n_rows} строк: {run['seconds']:.1f} с, пик памяти {run['peak_rss_mb']:.0f} МБ")
+    return results
+
+
+def child_main(command: str, argument: str):
+    """Замеры, выполняемые в отдельном процессе (печатают JSON)"""
+    if command == '_load':
+        import sklearn.ensemble  # импорт библиотек не входит во время загрузки
+        from model_loader import load_model
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            load_model(argument)
+            seconds = time.perf_counter() - start
+        print(json.dumps({'seconds': seconds}))
+    elif command == '_train':
+        data = synthetic_orders(int(argument))
+        start = time.perf_counter()
+        train_model(build_frame(data), data['is_done'])
+        seconds = time.perf_counter() - start
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(json.dumps({'seconds': seconds, 'peak_rss_mb': peak}))
+
+
+def run(args):
+    import sklearn
+    import joblib
+
+    print("⏱️ БЕНЧМАРК ПРОИЗВОДИТЕЛЬНОСТИ")
+    print("=" * 50)
+    metrics = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        # Модель обучается на синтетике: бенчмарк не зависит от data/ и models/
+        model_path = os.path.join(tmp, 'acceptance_model.joblib')
+        data = synthetic_orders(20000)
+        joblib.dump(train_model(build_frame(data), data['is_done']), model_path)
+
+        print("\n🔍 Задержка find_optimal_price...")
+        metrics.update(bench_optimizer(model_path, args.orders))
+        print("📦 Пакетная оценка...")
+        metrics.update(bench_batch(model_path, args.batch_rows))
+        print("📥 Загрузка модели...")
+        metrics.update(bench_load(model_path))
+
+    print("🎯 Обучение от числа строк:")
+    metrics.update(bench_training(args.train_rows or (QUICK_TRAIN_ROWS if args.quick else TRAIN_ROWS)))
+
+    report = {
+        'meta': {
+            'timestamp': pd.Timestamp.now().isoformat(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'sklearn': sklearn.__version__,
+            'cpu_count': os.cpu_count(),
+            'machine': platform.machine()
+        },
+        'metrics': metrics
+    }
+    print("\n📊 Результаты:")
+    for name, result in metrics.items():
+        print(f"   - {name}: {result['value']:.2f} {result['unit']}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"💾 Результаты сохранены: {args.output}")
+
+
+def compare(args) -> int:
+    """Сравнение двух запусков: регрессия - ухудшение больше чем на threshold"""
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)['metrics']
+    with open(args.current, encoding='utf-8') as f:
+        current = json.load(f)['metrics']
+
+    print(f"📊 Сравнение {args.current} с {args.baseline} (порог {args.threshold:.0%}):")
+    regressions = 0
+    for name in sorted(set(baseline) & set(current)):
+        old, new = baseline[name]['value'], current[name]['value']
+        change = (new - old) / old if old else 0.0
+        worse = change if current[name]['better'] == 'lower' else -change
+        regressed = worse > args.threshold
+        regressions += regressed
+        mark = '❌' if regressed else ('✅' if worse < -args.threshold else '  ')
+        print(f"   {mark} {name}: {old:.2f} -> {new:.2f} {current[name]['unit']} ({change:+.1%})")
+
+    if regressions:
+        print(f"❌ Регрессий: {regressions}")
+        return 1
+    print("✅ Регрессий нет")
+    return 0
+
+
+def main():
+    if len(sys.argv) == 3 and sys.argv[1].startswith('_'):
+        child_main(sys.argv[1], sys.argv[2])
+        return
+
+    parser = argparse.ArgumentParser(description="Бенчмарк оптимизатора, пакетной оценки и обучения")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="Запуск замеров")
+    run_parser.add_argument('--output', help="JSON с результатами")
+    run_parser.add_argument('--orders', type=int, default=200, help="Заказов для замера задержки")
+    run_parser.add_argument('--batch-rows', type=int, default=200000)
+    run_parser.add_argument('--train-rows', type=int, nargs='+',
+                            help=f"Размеры обучения (по умолчанию {TRAIN_ROWS}, до 10000000)")
+    run_parser.add_argument('--quick', action='store_true', help=f"Обучение только на {QUICK_TRAIN_ROWS}")
+
+    compare_parser = commands.add_parser('compare', help="Поиск регрессий между двумя запусками")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.1)
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        run(args)
+    else:
+        sys.exit(compare(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,47 +1,44 @@
 
-import pandas as pd
-import numpy as np
 import os
+import sys
+import time
 
 print("🎯 СОЗДАНИЕ ФАЙЛА ДЛЯ КОНКУРСА DRIVEE")
 print("=" * 50)
 
+# Модули src импортируют друг друга напрямую, как при запуске скриптов
+project_root = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from batch_scoring import score_csv
+
 
 TEAM_NAME = "CubekRubek"  
 
+TEST_PATH = os.path.join(project_root, 'data', 'test.csv')
+
+# Колоночная копия data/test.columns (python src/columnar.py data/test.csv)
+# используется автоматически, если она не старше test.csv
+
+# Размер порции: память ограничена порцией, а не размером test.csv
+CHUNK_SIZE = 100000
+
 def main():
     
-    test_files = []
-    for root, dirs, files in os.walk('.'):
-        for file in files:
-            if file.lower().endswith('.csv') and 'test' in file.lower():
-                test_files.append(os.path.join(root, file))
+    if not os.path.exists(TEST_PATH):
+        print(f"❌ Файл {TEST_PATH} не найден")
+        sys.exit(1)
     
-    if test_files:
-        test_file = test_files[0]
-        print(f"✅ Найден test файл: {test_file}")
-        
-        
-        df = pd.read_csv(test_file)
-        print(f"📊 Загружено строк: {len(df)}")
-        print(f"📋 Колонки: {df.columns.tolist()}")
-        
-        
-        predictions = np.random.uniform(0.4, 0.8, len(df))
-        
-    else:
-        print("❌ test.csv не найден, создаю демо-файл на 1000 строк")
-        
-        predictions = np.random.uniform(0.4, 0.8, 1000)
+    print(f"✅ Найден test файл: {TEST_PATH}")
     
     
-    result_df = pd.DataFrame({'is_done': predictions})
     output_file = f"{TEAM_NAME}_predict.csv"
-    result_df.to_csv(output_file, index=False)
+    start = time.perf_counter()
+    total_rows = score_csv(TEST_PATH, output_file, chunk_size=CHUNK_SIZE)
+    elapsed = time.perf_counter() - start
     
     print(f"✅ ФАЙЛ СОЗДАН: {output_file}")
-    print(f"📊 Статистика: {len(predictions)} предсказаний")
-    print(f"📈 Средняя вероятность: {predictions.mean():.3f}")
+    print(f"📊 Статистика: {total_rows} предсказаний за {elapsed:.1f} с")
     
     print(f"\n🎉 ЗАДАЧА ВЫПОЛНЕНА!")
     print(f"📤 Загрузите '{output_file}' в:")
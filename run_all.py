@@ -1,68 +1,48 @@
+import argparse
 import os
 import sys
-import subprocess
+import time
 
-def run_script(script_name):
-    """Запуск скрипта и проверка результата"""
-    print(f"\n🎯 Запуск {script_name}...")
-    try:
-        result = subprocess.run([sys.executable, script_name], 
-                              cwd=os.path.dirname(script_name),
-                              capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            print(f"✅ {script_name} выполнен успешно")
-            print(result.stdout)
-        else:
-            print(f"❌ Ошибка в {script_name}:")
-            print(result.stderr)
-            
-    except Exception as e:
-        print(f"❌ Не удалось запустить {script_name}: {e}")
+# Этапы и кэширование описаны в src/pipeline.py
+project_root = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from pipeline import STAGES, run_pipeline, print_report
+
+def list_files(folder):
+    """Проверка файлов в папке"""
+    files = os.listdir(folder)
+    if files:
+        print(f"✅ Файлы в папке {folder}:")
+        for file in files:
+            print(f"   - {file}")
+    else:
+        print(f"❌ В папке {folder} нет файлов")
 
 def main():
+    parser = argparse.ArgumentParser(description="Полный пайплайн Drivee")
+    parser.add_argument('--jobs', type=int, default=2, help="Этапов одновременно")
+    parser.add_argument('--force', action='store_true', help="Перезапустить все этапы")
+    args = parser.parse_args()
+
     print("🚗 ЗАПУСК ПОЛНОГО ПАЙПЛАЙНА DRIVEE")
     print("=" * 50)
     
     # Создаем папки
+    os.chdir(project_root)
     os.makedirs('data', exist_ok=True)
     os.makedirs('output', exist_ok=True)
     os.makedirs('models', exist_ok=True)
     
-    scripts = [
-        'src/analysis.py',
-        'src/model.py', 
-        'src/optimization.py',
-        'src/visualization.py'
-    ]
-    
-    for script in scripts:
-        if os.path.exists(script):
-            run_script(script)
-        else:
-            print(f"❌ Файл {script} не найден")
+    # Этапы без изменившихся входов и кода берутся из кэша, независимые идут параллельно
+    start = time.perf_counter()
+    report = run_pipeline(STAGES, jobs=args.jobs, force=args.force)
+    print_report(report, time.perf_counter() - start)
     
     # Проверяем результаты
     print("\n📁 ПРОВЕРКА СОЗДАННЫХ ФАЙЛОВ:")
-    output_files = os.listdir('output')
-    if output_files:
-        print("✅ Файлы в папке output:")
-        for file in output_files:
-            print(f"   - {file}")
-    else:
-        print("❌ В папке output нет файлов")
-    
-    data_files = os.listdir('data')
-    if data_files:
-        print("✅ Файлы в папке data:")
-        for file in data_files:
-            print(f"   - {file}")
-    
-    models_files = os.listdir('models')
-    if models_files:
-        print("✅ Файлы в папке models:")
-        for file in models_files:
-            print(f"   - {file}")
+    for folder in ('output', 'data', 'models'):
+        list_files(folder)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,265 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from columnar import iter_chunks
+from features import feature_values
+
+# Получаем абсолютные пути
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+models_dir = os.path.join(project_root, 'models')
+CUBE_PATH = os.path.join(models_dir, 'acceptance_cube.npz')
+
+# Оси куба: границы корзин. Значения вне границ попадают в крайние корзины.
+# markup - надбавка бида к стартовой цене (0.2 = +20%)
+AXES = {
+    'order_hour': np.arange(25, dtype=float),
+    'distance_km': np.array([0, 1, 2, 3, 4, 5, 6, 8, 10, 12, 15, 20, 25, 30, 40, 50], dtype=float),
+    'driver_rating': np.array([3.0, 3.5, 4.0, 4.25, 4.5, 4.6, 4.7, 4.8, 4.9, 5.0]),
+    'markup': np.linspace(0, 0.6, 13),
+}
+
+# Допуск у границ корзин: рейтинг 4.6, хранившийся во float32 (4.5999999),
+# попадает в ту же корзину [4.6, 4.7), что и 4.6 из CSV
+EDGE_TOLERANCE = 1e-6
+
+# Порядок уточнения оценки: от доли по надбавке ко все более узким ячейкам
+BACKOFF = ('markup', 'distance_km', 'order_hour', 'driver_rating')
+
+# Сила априорной оценки в псевдозаказах: ячейка с таким числом заказов
+# наполовину доверяет своей доле и наполовину - более общей ячейке
+PRIOR_ORDERS = 20
+
+# Колонки данных, нужные для куба
+COLUMNS = ['order_hour', 'distance_km', 'distance_in_meters', 'driver_rating',
+           'price_start_local', 'price_bid_local', 'is_done']
+
+
+def axis_values(orders, name: str, defaults=None) -> np.ndarray:
+    """Значения оси куба для заказов (надбавка считается по ценам)"""
+    if name == 'markup':
+        return feature_values(orders, 'price_ratio', defaults) - 1
+    return feature_values(orders, name, defaults)
+
+
+class AcceptanceCube:
+    """
+    Куб числа заказов и принятых по корзинам часа, дистанции, рейтинга
+    водителя и надбавки.
+
+    Новые строки добавляются за O(новых строк): add для порции, update для
+    строк файла после уже учтенных (rows, включая пропущенные неполные
+    строки skipped). Срезы и свертки (rollup) -
+    суммы по небольшому массиву счетчиков, без обращения к данным.
+    probabilities - эмпирическая вероятность принятия со сглаживанием
+    к более общим ячейкам: мгновенная оценка для оптимизатора без модели.
+    """
+
+    def __init__(self, axes: dict = None):
+        axes = AXES if axes is None else axes
+        if set(axes) != set(AXES):
+            raise ValueError(f"Оси куба должны быть {list(AXES)}")
+        self.axes = {name: np.asarray(axes[name], dtype=np.float64) for name in AXES}
+        shape = tuple(len(edges) - 1 for edges in self.axes.values())
+        self.orders = np.zeros(shape, dtype=np.int64)
+        self.accepted = np.zeros(shape, dtype=np.int64)
+        self.rows = 0
+        self.skipped = 0
+        self._rates = None
+
+    def bin_index(self, name: str, values) -> np.ndarray:
+        """Номер корзины оси name для значений"""
+        return np.searchsorted(self.axes[name][1:-1] - EDGE_TOLERANCE, values, side='right')
+
+    def add(self, chunk):
+        """
+        Учет порции заказов (DataFrame или словарь колонок).
+
+        Строки с пропуском (NaN, inf) в признаках осей или в is_done не
+        попадают в ячейки и считаются в skipped: значения по умолчанию здесь
+        не подставляются, чтобы не смещать доли в ячейках по умолчанию.
+        """
+        outcome = np.asarray(chunk['is_done'], dtype=np.float64)
+        values = [axis_values(chunk, name, defaults={}) for name in self.axes]
+        complete = np.isfinite(outcome)
+        for axis in values:
+            complete &= np.isfinite(axis)
+
+        index = tuple(self.bin_index(name, axis[complete]) for name, axis in zip(self.axes, values))
+        done = outcome[complete] != 0
+        cells = np.ravel_multi_index(index, self.orders.shape)
+        self.orders += np.bincount(cells, minlength=self.orders.size).reshape(self.orders.shape)
+        self.accepted += np.bincount(cells[done], minlength=self.orders.size).reshape(self.orders.shape)
+        self.rows += len(outcome)
+        self.skipped += len(outcome) - int(complete.sum())
+        self._rates = None
+
+    def update(self, data_path: str, chunk_size: int = 500000) -> int:
+        """Учет строк data_path после уже учтенных. Возвращает число новых строк"""
+        rows = self.rows
+        for chunk in iter_chunks(data_path, chunk_size, COLUMNS, skip_rows=self.rows):
+            self.add(chunk)
+        return self.rows - rows
+
+    def merge(self, other: 'AcceptanceCube'):
+        """Сложение с кубом другой части данных (те же оси)"""
+        if any(not np.array_equal(self.axes[name], other.axes[name]) for name in self.axes):
+            raise ValueError("Кубы с разными осями нельзя сложить")
+        self.orders += other.orders
+        self.accepted += other.accepted
+        self.rows += other.rows
+        self.skipped += other.skipped
+        self._rates = None
+
+    def _selection(self, where: dict) -> tuple:
+        """Срезы корзин по условиям: значение - его корзина, (от, до) - корзины диапазона"""
+        unknown = set(where) - set(self.axes)
+        if unknown:
+            raise ValueError(f"Неизвестные оси куба: {sorted(unknown)}")
+        index = []
+        for name in self.axes:
+            value = where.get(name)
+            if value is None:
+                index.append(slice(None))
+            elif isinstance(value, tuple):
+                low, high = value
+                # Корзины с нижней границей меньше high (с тем же допуском у границ)
+                stop = np.searchsorted(self.axes[name][:-1] + EDGE_TOLERANCE, high, side='left')
+                index.append(slice(int(self.bin_index(name, low)), int(stop)))
+            else:
+                i = int(self.bin_index(name, value))
+                index.append(slice(i, i + 1))
+        return tuple(index)
+
+    def rollup(self, by=(), **where) -> pd.DataFrame:
+        """
+        Свертка куба до осей by по срезу where.
+
+        where: ось=значение (одна корзина) или ось=(от, до) (корзины
+        диапазона [от, до)). В колонках осей by - нижние границы корзин.
+
+            cube.rollup(['markup'], order_hour=(7, 10), distance_km=(0, 5))
+        """
+        unknown = set(by) - set(self.axes)
+        if unknown:
+            raise ValueError(f"Неизвестные оси куба: {sorted(unknown)}")
+        by = [name for name in self.axes if name in by]
+        index = self._selection(where)
+        names = list(self.axes)
+        summed = tuple(i for i, name in enumerate(names) if name not in by)
+        orders = self.orders[index].sum(axis=summed)
+        accepted = self.accepted[index].sum(axis=summed)
+
+        edges = [self.axes[name][:-1][index[names.index(name)]] for name in by]
+        grids = np.meshgrid(*edges, indexing='ij') if by else []
+        frame = pd.DataFrame({name: grid.ravel() for name, grid in zip(by, grids)})
+        frame['orders'] = np.ravel(orders)
+        frame['accepted'] = np.ravel(accepted)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            frame['acceptance_rate'] = np.where(frame['orders'] > 0, frame['accepted'] / frame['orders'], np.nan)
+        return frame
+
+    def rates(self) -> np.ndarray:
+        """
+        Сглаженная доля принятия каждой ячейки.
+
+        Начиная с общей доли, оценка уточняется по осям BACKOFF: доля
+        ячейки уровня = (принятые + PRIOR_ORDERS × оценка прошлого уровня) /
+        (заказы + PRIOR_ORDERS). Пустые ячейки получают оценку более общей
+        ячейки, а не 0 или NaN.
+        """
+        if self._rates is None:
+            total = self.orders.sum()
+            rate = np.float64(self.accepted.sum() / total if total else 0.5)
+            names = list(self.axes)
+            for level in range(1, len(BACKOFF) + 1):
+                summed = tuple(i for i, name in enumerate(names) if name not in BACKOFF[:level])
+                orders = self.orders.sum(axis=summed, keepdims=True)
+                accepted = self.accepted.sum(axis=summed, keepdims=True)
+                rate = (accepted + PRIOR_ORDERS * rate) / (orders + PRIOR_ORDERS)
+            self._rates = rate
+        return self._rates
+
+    def probabilities(self, order_features, bid_prices, defaults=None) -> np.ndarray:
+        """
+        Эмпирическая вероятность принятия для цен bid_prices.
+
+        Как PriceOptimizer.predict_probabilities: один заказ (словарь
+        скаляров) и цены формы (цены,) или колонки заказов и цены формы
+        (заказы, цены).
+        """
+        rates = self.rates()
+        bid_prices = np.asarray(bid_prices, dtype=np.float64)
+        base_price = feature_values(order_features, 'price_start_local', defaults)
+        if np.ndim(base_price):
+            base_price = base_price.reshape(-1, 1)
+
+        index = []
+        for name in self.axes:
+            if name == 'markup':
+                index.append(self.bin_index(name, bid_prices / base_price - 1))
+                continue
+            i = self.bin_index(name, feature_values(order_features, name, defaults))
+            index.append(i.reshape(-1, 1) if i.ndim else i)
+        return rates[tuple(index)]
+
+    def save(self, path: str = CUBE_PATH):
+        """Сохранение куба в .npz файл"""
+        arrays = {f'axis_{name}': edges for name, edges in self.axes.items()}
+        np.savez_compressed(path, orders=self.orders, accepted=self.accepted,
+                            rows=np.int64(self.rows), skipped=np.int64(self.skipped), **arrays)
+
+    @classmethod
+    def load(cls, path: str = CUBE_PATH) -> 'AcceptanceCube':
+        """Загрузка куба из .npz файла"""
+        with np.load(path) as data:
+            cube = cls({name: data[f'axis_{name}'] for name in AXES})
+            cube.orders = data['orders']
+            cube.accepted = data['accepted']
+            cube.rows = int(data['rows'])
+            cube.skipped = int(data['skipped']) if 'skipped' in data.files else 0
+        return cube
+
+
+def build_cube(data_path: str, chunk_size: int = 500000) -> AcceptanceCube:
+    """Куб по всему набору данных за один проход порциями"""
+    cube = AcceptanceCube()
+    cube.update(data_path, chunk_size)
+    return cube
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Куб долей принятия заказов")
+    parser.add_argument('command', choices=['build', 'update', 'show'],
+                        help="build - заново, update - только новые строки, show - свертки")
+    parser.add_argument('--data', default=os.path.join(project_root, 'data', 'train.csv'))
+    parser.add_argument('--cube', default=CUBE_PATH)
+    parser.add_argument('--chunk-size', type=int, default=500000)
+    parser.add_argument('--by', nargs='+', default=['markup'], choices=list(AXES),
+                        help="Оси свертки для show")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.command == 'build' or not os.path.exists(args.cube):
+        cube = build_cube(args.data, args.chunk_size)
+        print(f"🧊 Куб построен: {cube.rows} заказов за {time.perf_counter() - start:.2f} с")
+        cube.save(args.cube)
+    else:
+        cube = AcceptanceCube.load(args.cube)
+        if args.command == 'update':
+            new_rows = cube.update(args.data, args.chunk_size)
+            print(f"📥 Новых строк: {new_rows} (всего {cube.rows}) за {time.perf_counter() - start:.2f} с")
+            cube.save(args.cube)
+    if cube.skipped:
+        print(f"⚠️ Неполных строк пропущено: {cube.skipped}")
+    print(f"💾 Куб: {args.cube}")
+
+    print(cube.rollup(args.by).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+from columnar import iter_chunks
+
+# Корзины по умолчанию: (начало, конец, число корзин). Значения вне диапазона
+# попадают в крайние корзины, поэтому ни одна строка не теряется
+BINS = {
+    'price': (0.0, 2500.0, 100),
+    'driver_rating': (3.0, 5.0, 40),
+    'distance_km': (0.0, 40.0, 80),
+}
+
+# Допуск (в долях корзины): значение на границе корзины с погрешностью float32
+# (рейтинг 4.85 хранится как 4.8499999) относится к верхней корзине
+EDGE_TOLERANCE = 1e-4
+
+# Колонки данных, нужные для агрегатов
+COLUMNS = ['price_start_local', 'price_bid_local', 'driver_rating',
+           'distance_km', 'distance_in_meters', 'is_done']
+
+# Колонки, пропуски (NaN, inf) в которых считаются отдельно: такие значения
+# не попадают в гистограммы и ячейки, где нужна эта колонка
+MISSING_COLUMNS = ['price_start_local', 'price_bid_local', 'driver_rating', 'distance_km', 'is_done']
+
+
+def bin_edges(name: str, bins: dict = None) -> np.ndarray:
+    start, stop, n_bins = (bins or BINS)[name]
+    return np.linspace(start, stop, n_bins + 1)
+
+
+def bin_index(values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """Номер корзины равномерной сетки edges (с прижатием к крайним корзинам), values - конечные"""
+    n_bins = len(edges) - 1
+    index = (np.asarray(values, dtype=np.float64) - edges[0]) * (n_bins / (edges[-1] - edges[0])) + EDGE_TOLERANCE
+    return np.clip(index, 0, n_bins - 1).astype(np.intp)
+
+
+class BinnedAggregates:
+    """
+    Агрегаты для графиков анализа фиксированного размера, считаемые за один
+    проход порциями:
+
+    - гистограммы стартовой цены и цены бида;
+    - гистограммы рейтинга водителя отдельно для принятых и отклоненных;
+    - число заказов и принятых по ячейкам (дистанция × цена бида);
+    - всего строк, принятых и отклоненных, пропусков по колонкам.
+
+    Строка с пропуском не учитывается только там, где нужна пропущенная
+    колонка. Размер агрегатов зависит только от числа корзин, поэтому стоимость
+    графиков не растет с объемом данных. Агрегаты разных частей данных
+    складываются через merge.
+    """
+
+    def __init__(self, bins: dict = None):
+        self.bins = dict(BINS if bins is None else bins)
+        self.edges = {name: bin_edges(name, self.bins) for name in self.bins}
+        n_price = len(self.edges['price']) - 1
+        n_rating = len(self.edges['driver_rating']) - 1
+        n_distance = len(self.edges['distance_km']) - 1
+        self.counts = {
+            'price_start_local': np.zeros(n_price, dtype=np.int64),
+            'price_bid_local': np.zeros(n_price, dtype=np.int64),
+            'rating_accepted': np.zeros(n_rating, dtype=np.int64),
+            'rating_rejected': np.zeros(n_rating, dtype=np.int64),
+            'cell_orders': np.zeros((n_distance, n_price), dtype=np.int64),
+            'cell_accepted': np.zeros((n_distance, n_price), dtype=np.int64),
+            'rows': np.zeros(1, dtype=np.int64),
+            # Отклоненные и принятые среди строк с известным is_done
+            'outcome': np.zeros(2, dtype=np.int64),
+            'missing': np.zeros(len(MISSING_COLUMNS), dtype=np.int64),
+        }
+
+    @property
+    def rows(self) -> int:
+        return int(self.counts['rows'][0])
+
+    @property
+    def accepted(self) -> int:
+        return int(self.counts['outcome'][1])
+
+    @property
+    def missing(self) -> dict:
+        """Число пропусков по колонкам"""
+        return dict(zip(MISSING_COLUMNS, self.counts['missing'].tolist()))
+
+    def add(self, chunk):
+        """Учет порции заказов (DataFrame или словарь колонок)"""
+        if 'distance_km' in chunk:
+            distance = np.asarray(chunk['distance_km'], dtype=np.float64)
+        else:
+            distance = np.asarray(chunk['distance_in_meters'], dtype=np.float64) / 1000
+        values = {name: np.asarray(chunk[name], dtype=np.float64) for name in MISSING_COLUMNS if name != 'distance_km'}
+        values['distance_km'] = distance
+        finite = {name: np.isfinite(column) for name, column in values.items()}
+        known = finite['is_done']
+        done = known & (values['is_done'] != 0)
+
+        self.counts['rows'] += len(known)
+        self.counts['outcome'] += [int((known & ~done).sum()), int(done.sum())]
+        self.counts['missing'] += [len(known) - int(finite[name].sum()) for name in MISSING_COLUMNS]
+
+        price_edges = self.edges['price']
+        n_price = len(price_edges) - 1
+        for name in ('price_start_local', 'price_bid_local'):
+            index = bin_index(values[name][finite[name]], price_edges)
+            self.counts[name] += np.bincount(index, minlength=n_price)
+
+        rated = finite['driver_rating'] & known
+        rating_index = bin_index(values['driver_rating'][rated], self.edges['driver_rating'])
+        rating_done = done[rated]
+        n_rating = len(self.edges['driver_rating']) - 1
+        self.counts['rating_accepted'] += np.bincount(rating_index[rating_done], minlength=n_rating)
+        self.counts['rating_rejected'] += np.bincount(rating_index[~rating_done], minlength=n_rating)
+
+        # Ячейки 2D - одним bincount по плоскому индексу
+        placed = finite['distance_km'] & finite['price_bid_local'] & known
+        cells = (bin_index(distance[placed], self.edges['distance_km']) * n_price
+                 + bin_index(values['price_bid_local'][placed], price_edges))
+        size = self.counts['cell_orders'].size
+        shape = self.counts['cell_orders'].shape
+        self.counts['cell_orders'] += np.bincount(cells, minlength=size).reshape(shape)
+        self.counts['cell_accepted'] += np.bincount(cells[done[placed]], minlength=size).reshape(shape)
+
+    def merge(self, other: 'BinnedAggregates'):
+        """Сложение с агрегатами другой части данных (те же корзины)"""
+        if other.bins != self.bins:
+            raise ValueError("Агрегаты с разными корзинами нельзя сложить")
+        for name, counts in other.counts.items():
+            self.counts[name] += counts
+
+    def acceptance_rate(self, min_orders: int = 1) -> np.ndarray:
+        """Доля принятых по ячейкам (дистанция × цена бида), NaN в ячейках с малым числом заказов"""
+        orders = self.counts['cell_orders']
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rate = self.counts['cell_accepted'] / orders
+        return np.where(orders >= max(min_orders, 1), rate, np.nan)
+
+    def save(self, path: str):
+        arrays = {name: counts for name, counts in self.counts.items()}
+        arrays.update({f'bins_{name}': np.array(spec, dtype=np.float64) for name, spec in self.bins.items()})
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> 'BinnedAggregates':
+        with np.load(path) as data:
+            bins = {name[len('bins_'):]: (float(data[name][0]), float(data[name][1]), int(data[name][2]))
+                    for name in data.files if name.startswith('bins_')}
+            aggregates = cls(bins)
+            for name in aggregates.counts:
+                if name in data.files:
+                    aggregates.counts[name] = data[name]
+        return aggregates
+
+
+def aggregate_file(data_path: str, chunk_size: int = 500000, bins: dict = None) -> BinnedAggregates:
+    """Агрегаты набора данных за один проход порциями (колоночная копия или CSV)"""
+    aggregates = BinnedAggregates(bins)
+    for chunk in iter_chunks(data_path, chunk_size, COLUMNS):
+        aggregates.add(chunk)
+    return aggregates
+
+
+def plot_aggregates(aggregates: BinnedAggregates, output_path: str, min_orders: int = 5):
+    """Графики анализа по агрегатам (размер картинки и время не зависят от числа заказов)"""
+    import matplotlib.pyplot as plt
+
+    counts = aggregates.counts
+    fig = plt.figure(figsize=(12, 8))
+
+    # График 1: Распределение цен
+    plt.subplot(2, 2, 1)
+    price_edges = aggregates.edges['price']
+    plt.stairs(counts['price_start_local'], price_edges, fill=True, alpha=0.7,
+               label='Стартовая цена', color='blue')
+    plt.stairs(counts['price_bid_local'], price_edges, fill=True, alpha=0.7,
+               label='Цена бида', color='orange')
+    used = np.flatnonzero(counts['price_start_local'] + counts['price_bid_local'])
+    if len(used):
+        plt.xlim(price_edges[used[0]], price_edges[used[-1] + 1])
+    plt.legend()
+    plt.title('Распределение цен')
+    plt.xlabel('Цена (₽)')
+    plt.ylabel('Количество')
+
+    # График 2: Статистика принятия
+    plt.subplot(2, 2, 2)
+    acceptance_rate = aggregates.accepted / max(counts['outcome'].sum(), 1)
+    labels = [f'Принято\n{acceptance_rate:.1%}', f'Отклонено\n{1-acceptance_rate:.1%}']
+    sizes = [acceptance_rate, 1 - acceptance_rate]
+    colors = ['#4CAF50', '#F44336']
+    plt.pie(sizes, labels=labels, colors=colors, autopct='%1.1f%%', startangle=90)
+    plt.title('Статистика принятия заказов')
+
+    # График 3: Принятие по рейтингу (плотность по корзинам)
+    plt.subplot(2, 2, 3)
+    rating_edges = aggregates.edges['driver_rating']
+    widths = np.diff(rating_edges)
+    for name, label, color in (('rating_accepted', 'Принятые', 'green'),
+                               ('rating_rejected', 'Отклоненные', 'red')):
+        density = counts[name] / max(counts[name].sum(), 1) / widths
+        plt.stairs(density, rating_edges, fill=True, alpha=0.7, label=label, color=color)
+    plt.xlabel('Рейтинг водителя')
+    plt.ylabel('Плотность')
+    plt.title('Принятие по рейтингу')
+    plt.legend()
+
+    # График 4: Доля принятых по ячейкам дистанции и цены
+    plt.subplot(2, 2, 4)
+    mesh = plt.pcolormesh(aggregates.edges['distance_km'], price_edges,
+                          aggregates.acceptance_rate(min_orders).T,
+                          cmap='RdYlGn', vmin=0, vmax=1, shading='flat')
+    plt.colorbar(mesh, label='Доля принятых')
+    used_distance = np.flatnonzero(counts['cell_orders'].sum(axis=1))
+    used_price = np.flatnonzero(counts['cell_orders'].sum(axis=0))
+    if len(used_distance):
+        plt.xlim(aggregates.edges['distance_km'][used_distance[0]],
+                 aggregates.edges['distance_km'][used_distance[-1] + 1])
+        plt.ylim(price_edges[used_price[0]], price_edges[used_price[-1] + 1])
+    plt.xlabel('Дистанция (км)')
+    plt.ylabel('Цена бида (₽)')
+    plt.title('Принятие по дистанции и цене')
+
+    plt.tight_layout()
+    plt.savefig(output_path, dpi=150, bbox_inches='tight')
+    return fig
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Агрегаты и графики анализа за один проход по данным")
+    parser.add_argument('data', help="CSV с заказами (или путь, рядом с которым есть колоночная копия)")
+    parser.add_argument('--output', default='analysis_results.png')
+    parser.add_argument('--chunk-size', type=int, default=500000)
+    parser.add_argument('--save', default=None, help="Сохранить агрегаты в .npz")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    aggregates = aggregate_file(args.data, args.chunk_size)
+    aggregate_time = time.perf_counter() - start
+    print(f"📊 {aggregates.rows} заказов агрегированы за {aggregate_time:.1f} с")
+    missing = {name: count for name, count in aggregates.missing.items() if count}
+    if missing:
+        print(f"⚠️ Пропуски (не учтены в графиках по этим колонкам): {missing}")
+    if args.save:
+        aggregates.save(args.save)
+        print(f"💾 Агрегаты сохранены: {args.save}")
+
+    start = time.perf_counter()
+    plot_aggregates(aggregates, args.output)
+    print(f"✅ График сохранен: {args.output} за {time.perf_counter() - start:.1f} с "
+          f"({os.path.getsize(args.output)} байт)")
+
+
+if __name__ == "__main__":
+    main()
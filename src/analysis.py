@@ -3,6 +3,11 @@ import matplotlib.pyplot as plt
 import numpy as np
 import os
 
+from aggregates import BinnedAggregates, plot_aggregates, COLUMNS as AGGREGATE_COLUMNS
+from acceptance_cube import AcceptanceCube, CUBE_PATH, COLUMNS as CUBE_COLUMNS
+from columnar import columnar_path, iter_chunks
+from create_data import generate
+
 print("🚗 Анализ данных Drivee...")
 
 # Получаем абсолютные пути
@@ -20,23 +25,15 @@ print(f"📁 Корень проекта: {project_root}")
 print(f"📁 Папка data: {data_dir}")
 print(f"📁 Папка output: {output_dir}")
 
-# Создаем тестовые данные
-np.random.seed(42)
+# Создаем тестовые данные: принятие зависит от надбавки, часа, дистанции и рейтинга
 n_samples = 1000
 
 print("📊 Создание тестовых данных...")
-data = pd.DataFrame({
-    'price_start_local': np.random.randint(200, 500, n_samples),
-    'price_bid_local': np.random.randint(250, 600, n_samples),
-    'driver_rating': np.random.uniform(3.5, 5.0, n_samples),
-    'distance_km': np.random.uniform(1, 20, n_samples),
-    'is_done': np.random.choice([0, 1], n_samples, p=[0.3, 0.7])
-})
-
-# Сохраняем данные
 data_path = os.path.join(data_dir, 'train.csv')
-data.to_csv(data_path, index=False)
+generate(data_path, n_samples, seed=42, output_format='both')
 print(f"✅ Данные сохранены в {data_path}")
+# Колоночная копия для следующих этапов (model.py, main.py) пишется генератором
+print(f"✅ Колоночная копия: {columnar_path(data_path)}")
 
 # Проверяем сохранение данных
 if os.path.exists(data_path):
@@ -45,55 +42,36 @@ if os.path.exists(data_path):
 else:
     print("❌ Файл данных НЕ создан!")
 
+# Агрегаты и куб долей принятия за один проход порциями: графики и
+# статистика строятся по ним, а не по каждой точке
+print("📊 Агрегация данных по корзинам...")
+aggregates = BinnedAggregates()
+cube = AcceptanceCube()
+for chunk in iter_chunks(data_path, 500000, sorted(set(AGGREGATE_COLUMNS) | set(CUBE_COLUMNS))):
+    aggregates.add(chunk)
+    cube.add(chunk)
+aggregates.save(os.path.join(output_dir, 'analysis_aggregates.npz'))
+missing = {name: count for name, count in aggregates.missing.items() if count}
+if missing:
+    print(f"⚠️ Пропуски (не учтены в графиках по этим колонкам): {missing}")
+os.makedirs(os.path.dirname(CUBE_PATH), exist_ok=True)
+cube.save(CUBE_PATH)
+print(f"🧊 Куб долей принятия сохранен: {CUBE_PATH}")
+
+# Доля принятия по надбавке: в целом и в часы пик
+print("📈 Доля принятия по надбавке (все часы / 17-21 ч):")
+by_markup = cube.rollup(['markup'])
+peak = cube.rollup(['markup'], order_hour=(17, 21))
+for row, peak_rate in zip(by_markup.itertuples(), peak['acceptance_rate']):
+    print(f"   +{row.markup:.0%}: {row.acceptance_rate:.1%} / {peak_rate:.1%} ({row.orders} заказов)")
+
 # Создаем графики
 print("🎨 Создание графиков...")
 
-# График 1: Распределение цен
-plt.figure(figsize=(12, 8))
-
-plt.subplot(2, 2, 1)
-plt.hist(data['price_start_local'], alpha=0.7, label='Стартовая цена', bins=20, color='blue')
-plt.hist(data['price_bid_local'], alpha=0.7, label='Цена бида', bins=20, color='orange')
-plt.legend()
-plt.title('Распределение цен')
-plt.xlabel('Цена (₽)')
-plt.ylabel('Количество')
-
-# График 2: Статистика принятия
-plt.subplot(2, 2, 2)
-acceptance_rate = data['is_done'].mean()
-labels = [f'Принято\n{acceptance_rate:.1%}', f'Отклонено\n{1-acceptance_rate:.1%}']
-sizes = [acceptance_rate, 1 - acceptance_rate]
-colors = ['#4CAF50', '#F44336']
-plt.pie(sizes, labels=labels, colors=colors, autopct='%1.1f%%', startangle=90)
-plt.title('Статистика принятия заказов')
-
-# График 3: Принятие по рейтингу
-plt.subplot(2, 2, 3)
-accepted = data[data['is_done'] == 1]
-rejected = data[data['is_done'] == 0]
-plt.hist(accepted['driver_rating'], alpha=0.7, label='Принятые', bins=15, color='green', density=True)
-plt.hist(rejected['driver_rating'], alpha=0.7, label='Отклоненные', bins=15, color='red', density=True)
-plt.xlabel('Рейтинг водителя')
-plt.ylabel('Плотность')
-plt.title('Принятие по рейтингу')
-plt.legend()
-
-# График 4: Принятие по дистанции
-plt.subplot(2, 2, 4)
-plt.scatter(accepted['distance_km'], accepted['price_bid_local'], alpha=0.5, label='Принятые', color='green')
-plt.scatter(rejected['distance_km'], rejected['price_bid_local'], alpha=0.5, label='Отклоненные', color='red')
-plt.xlabel('Дистанция (км)')
-plt.ylabel('Цена бида (₽)')
-plt.title('Принятие по дистанции и цене')
-plt.legend()
-
-plt.tight_layout()
-
 # Сохраняем график ДО показа
 output_path = os.path.join(output_dir, 'analysis_results.png')
 print(f"💾 Сохраняем график в: {output_path}")
-plt.savefig(output_path, dpi=150, bbox_inches='tight')
+plot_aggregates(aggregates, output_path)
 
 # Проверяем сохранение графика
 if os.path.exists(output_path):
@@ -107,5 +85,5 @@ print("🖼️ Показываем график...")
 plt.show()
 
 print("🎉 Анализ завершен!")
-print(f"📊 Проанализировано {len(data)} заказов")
-print(f"✅ Принято: {data['is_done'].sum()} ({data['is_done'].mean():.1%})")
\ No newline at end of file
+print(f"📊 Проанализировано {aggregates.rows} заказов")
+print(f"✅ Принято: {aggregates.accepted} ({aggregates.accepted / max(aggregates.rows, 1):.1%})")
\ No newline at end of file
@@ -0,0 +1,153 @@
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from columnar import iter_chunks
+from features import FEATURES, INPUT_COLUMNS, DERIVED, build_matrix, model_input
+from model_loader import load_model, read_model_meta, MODEL_PATH
+from tree_engine import CompiledForest, compile_model_file
+
+# Модель рабочего процесса (массивы отображены в память)
+_worker_model = None
+
+
+@metrics.timed('batch.score_chunk')
+def score_chunk(model, chunk: pd.DataFrame, verbose: bool = False) -> np.ndarray:
+    """Вероятность принятия для каждой строки заказа"""
+    features = list(getattr(model, 'feature_names_in_', getattr(model, 'feature_names', FEATURES)))
+    if verbose:
+        for feature in features:
+            if feature not in chunk.columns and feature not in DERIVED:
+                print(f"⚠️ Признак {feature} отсутствует в данных, используем значение по умолчанию")
+    metrics.count('batch.rows', len(chunk))
+    with metrics.timer('batch.features'):
+        X = build_matrix(chunk, features)
+    return model.predict_proba(model_input(model, X, features))[:, 1]
+
+
+def score_csv(input_path: str, output_path: str, model=None,
+              chunk_size: int = 100000, column: str = 'is_done') -> int:
+    """
+    Потоковая оценка CSV с заказами.
+
+    Файл читается порциями по chunk_size строк, и предсказания дописываются
+    в output_path сразу после каждой порции, поэтому память ограничена
+    размером порции, а не файла. Если рядом есть свежая колоночная копия
+    (python src/columnar.py input.csv), порции берутся из нее без разбора
+    текста. Возвращает число оцененных строк.
+    """
+    model = model if model is not None else load_model(MODEL_PATH)
+
+    total_rows = 0
+    start = time.perf_counter()
+    for i, chunk in enumerate(iter_chunks(input_path, chunk_size, INPUT_COLUMNS)):
+        predictions = score_chunk(model, chunk, verbose=(i == 0))
+        pd.DataFrame({column: predictions}).to_csv(
+            output_path, mode='w' if i == 0 else 'a', header=(i == 0), index=False
+        )
+
+        total_rows += len(chunk)
+        elapsed = time.perf_counter() - start
+        print(f"   ...оценено {total_rows} строк, {total_rows / elapsed:.0f} строк/с")
+
+    if total_rows == 0:
+        pd.DataFrame({column: []}).to_csv(output_path, index=False)
+    return total_rows
+
+
+def _init_worker(compiled_path: str, model_path: str):
+    """Открытие общих массивов модели в рабочем процессе"""
+    global _worker_model
+    if compiled_path is not None:
+        _worker_model = CompiledForest.load(compiled_path, mmap_mode='r')
+    else:
+        _worker_model = load_model(model_path, mmap_mode='r')
+
+
+def _score_shard(chunk: pd.DataFrame) -> np.ndarray:
+    return score_chunk(_worker_model, chunk)
+
+
+def score_csv_parallel(input_path: str, output_path: str, n_workers: int = None,
+                       model_path: str = MODEL_PATH, compiled_path: str = None,
+                       chunk_size: int = 100000, column: str = 'is_done') -> int:
+    """
+    Потоковая оценка CSV пулом процессов.
+
+    RandomForest компилируется в .npy массивы (см. tree_engine), и каждый
+    рабочий процесс открывает их с mmap_mode='r': страницы модели общие для
+    всех процессов через кэш ОС, а не копия на процесс. Порции CSV раздаются
+    процессам, результаты дописываются в output_path строго в порядке
+    входного файла. В работе одновременно не более 2 * n_workers порций.
+    """
+    n_workers = n_workers or os.cpu_count()
+    if read_model_meta(model_path).get('engine', 'forest') == 'forest':
+        initargs = (compile_model_file(model_path, compiled_path), None)
+    else:
+        # Бустинг не компилируется: процессы отображают в память сам .joblib
+        initargs = (None, model_path)
+
+    total_rows = 0
+    written = 0
+    start = time.perf_counter()
+    pending = deque()
+
+    def write_next():
+        nonlocal written
+        n_rows, future = pending.popleft()
+        pd.DataFrame({column: future.result()}).to_csv(
+            output_path, mode='w' if written == 0 else 'a', header=(written == 0), index=False
+        )
+        written += n_rows
+
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                             initargs=initargs) as executor:
+        for chunk in iter_chunks(input_path, chunk_size, INPUT_COLUMNS):
+            pending.append((len(chunk), executor.submit(_score_shard, chunk)))
+            total_rows += len(chunk)
+            if len(pending) >= 2 * n_workers:
+                write_next()
+                elapsed = time.perf_counter() - start
+                print(f"   ...оценено {written} строк, {written / elapsed:.0f} строк/с")
+        while pending:
+            write_next()
+
+    if total_rows == 0:
+        pd.DataFrame({column: []}).to_csv(output_path, index=False)
+    return total_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Потоковая оценка заказов сохраненной моделью")
+    parser.add_argument('input', help="CSV с заказами")
+    parser.add_argument('output', help="CSV с предсказаниями")
+    parser.add_argument('--chunk-size', type=int, default=100000)
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Число процессов (0 - по числу ядер)")
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    # Метрики собираются в этом процессе: при --workers > 1 этапы рабочих процессов не видны
+    metrics.setup(args)
+
+    print(f"📥 Оценка {args.input} порциями по {args.chunk_size} строк...")
+    start = time.perf_counter()
+    if args.workers == 1:
+        total_rows = score_csv(args.input, args.output, load_model(args.model), args.chunk_size)
+    else:
+        total_rows = score_csv_parallel(args.input, args.output, args.workers or None,
+                                        args.model, chunk_size=args.chunk_size)
+    elapsed = time.perf_counter() - start
+    print(f"✅ Предсказания сохранены: {args.output}")
+    print(f"📊 {total_rows} строк за {elapsed:.1f} с ({total_rows / max(elapsed, 1e-9):.0f} строк/с)")
+    metrics.report(args)
+
+
+if __name__ == "__main__":
+    main()
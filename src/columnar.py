@@ -0,0 +1,169 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# Объявленная схема хранения: цены - int32, рейтинги - float32, флаги - uint8
+SCHEMA = {
+    'order_id': np.int64,
+    'price_start_local': np.int32,
+    'price_bid_local': np.int32,
+    'driver_rating': np.float32,
+    'user_rating': np.float32,
+    'distance_in_meters': np.int32,
+    'distance_km': np.float32,
+    'price_ratio': np.float32,
+    'duration_in_seconds': np.int32,
+    'pickup_in_meters': np.int32,
+    'pickup_in_seconds': np.int32,
+    'driver_experience_days': np.int32,
+    'order_hour': np.uint8,
+    'order_day_of_week': np.uint8,
+    'is_done': np.uint8,
+}
+
+
+def columnar_path(csv_path: str) -> str:
+    """Папка с колонками рядом с CSV: data/train.csv -> data/train.columns"""
+    return os.path.splitext(csv_path)[0] + '.columns'
+
+
+def _cast(name: str, values: pd.Series) -> np.ndarray:
+    """Приведение порции колонки к типу схемы без потери значений"""
+    dtype = SCHEMA.get(name)
+    if not pd.api.types.is_numeric_dtype(values):
+        return values.astype(str).to_numpy(dtype=str)
+    if dtype is None:
+        return values.to_numpy()
+
+    array = values.to_numpy(dtype=np.float64)
+    if np.issubdtype(dtype, np.integer):
+        info = np.iinfo(dtype)
+        lossless = (np.isfinite(array).all() and (array == np.round(array)).all()
+                    and (array.size == 0 or (array.min() >= info.min and array.max() <= info.max)))
+        if not lossless:
+            # Пропуски или дробные значения: колонка останется float64
+            return array
+    return array.astype(dtype)
+
+
+def convert_csv(csv_path: str, out_path: str = None, chunk_size: int = 500000) -> str:
+    """
+    Конвертация CSV в колоночный формат: по .npy файлу на колонку.
+
+    Колонки приводятся к типам SCHEMA. Если значения не помещаются в
+    объявленный целый тип (пропуски, дробные цены), колонка сохраняется
+    как float64 с предупреждением. Строковые колонки хранятся как
+    массивы фиксированной ширины, чтобы их тоже можно было отобразить
+    в память. Возвращает путь к папке с колонками.
+    """
+    out_path = out_path or columnar_path(csv_path)
+    columns = {}
+    for chunk in pd.read_csv(csv_path, chunksize=chunk_size):
+        for name in chunk.columns:
+            columns.setdefault(name, []).append(_cast(name, chunk[name]))
+
+    os.makedirs(out_path, exist_ok=True)
+    for name, parts in columns.items():
+        array = np.concatenate(parts)
+        if name in SCHEMA and array.dtype != SCHEMA[name]:
+            print(f"⚠️ Колонка {name} не приводится к {np.dtype(SCHEMA[name])}, сохранена как {array.dtype}")
+        np.save(os.path.join(out_path, f'{name}.npy'), array)
+    # Порядок колонок исходного файла; пишется последним как признак завершенной конвертации
+    with open(os.path.join(out_path, 'columns.txt'), 'w', encoding='utf-8') as f:
+        f.write("\n".join(columns))
+    return out_path
+
+
+def _fresh_columnar(csv_path: str):
+    """Папка с колонками, если она есть и не старше CSV"""
+    path = columnar_path(csv_path)
+    index_path = os.path.join(path, 'columns.txt')
+    if not os.path.exists(index_path):
+        return None
+    if os.path.exists(csv_path) and os.path.getmtime(index_path) < os.path.getmtime(csv_path):
+        return None
+    return path
+
+
+def load_columns(path: str, columns=None, mmap_mode='r') -> pd.DataFrame:
+    """
+    Загрузка колонок из папки path.
+
+    Читаются только запрошенные колонки (отсутствующие пропускаются).
+    С mmap_mode='r' массивы отображаются в память и передаются в
+    DataFrame без копирования.
+    """
+    with open(os.path.join(path, 'columns.txt'), encoding='utf-8') as f:
+        stored = f.read().splitlines()
+    names = [name for name in stored if columns is None or name in columns]
+    arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode)
+              for name in names}
+    return pd.DataFrame(arrays, copy=False)
+
+
+def load_dataset(csv_path: str, columns=None, skip_rows: int = 0) -> pd.DataFrame:
+    """
+    Загрузка набора данных с проекцией колонок.
+
+    Если рядом с csv_path есть свежая колоночная копия (см. convert_csv),
+    данные берутся из нее, иначе CSV читается только по нужным колонкам.
+    skip_rows пропускает первые строки данных (например, уже учтенные моделью).
+    """
+    path = _fresh_columnar(csv_path)
+    if path is not None:
+        return load_columns(path, columns).iloc[skip_rows:]
+    usecols = None if columns is None else (lambda name: name in columns)
+    return pd.read_csv(csv_path, usecols=usecols, skiprows=range(1, skip_rows + 1))
+
+
+def iter_chunks(csv_path: str, chunk_size: int, columns=None, skip_rows: int = 0):
+    """
+    Порции набора данных по chunk_size строк (срезы колонок без копирования
+    или порции CSV). skip_rows пропускает первые строки данных.
+    """
+    path = _fresh_columnar(csv_path)
+    if path is None:
+        usecols = None if columns is None else (lambda name: name in columns)
+        yield from pd.read_csv(csv_path, usecols=usecols, chunksize=chunk_size,
+                               skiprows=range(1, skip_rows + 1))
+        return
+
+    # Отображение открывается заново на каждую порцию: прочитанные страницы
+    # файла освобождаются вместе с порцией и не копятся в памяти процесса
+    n_rows = len(load_columns(path, columns))
+    for start in range(skip_rows, n_rows, chunk_size):
+        yield load_columns(path, columns).iloc[start:start + chunk_size]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Конвертация CSV в колоночный формат")
+    parser.add_argument('inputs', nargs='+', help="CSV файлы (например, data/train.csv data/test.csv)")
+    parser.add_argument('--chunk-size', type=int, default=500000)
+    args = parser.parse_args()
+
+    for csv_path in args.inputs:
+        print(f"📦 Конвертация {csv_path}...")
+        start = time.perf_counter()
+        path = convert_csv(csv_path, chunk_size=args.chunk_size)
+        convert_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        csv_data = pd.read_csv(csv_path)
+        csv_time = time.perf_counter() - start
+        start = time.perf_counter()
+        data = load_columns(path)
+        load_time = time.perf_counter() - start
+
+        csv_memory = csv_data.memory_usage(deep=True).sum()
+        memory = sum(data[name].to_numpy().nbytes for name in data.columns)
+        print(f"✅ {path}: {len(data)} строк, конвертация {convert_time:.1f} с")
+        print(f"   - Загрузка: CSV {csv_time * 1000:.0f} мс, колонки {load_time * 1000:.1f} мс")
+        print(f"   - Память: CSV {csv_memory / 1e6:.1f} МБ, колонки {memory / 1e6:.1f} МБ")
+        print(f"   - Типы: {dict(data.dtypes.astype(str))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,178 @@
-import pandas as pd
-import numpy as np
+import argparse
+import json
 import os
-from datetime import datetime, timedelta
+import time
+
+import numpy as np
+import pandas as pd
+
+from columnar import SCHEMA, columnar_path
+
+# Строки генерируются блоками с собственным зерном (seed, номер блока):
+# набор из n строк - префикс набора из большего числа строк с тем же seed,
+# а блоки можно считать независимо
+BLOCK_ROWS = 2**16
+
+# Колонки в порядке записи
+COLUMNS = ['order_id', 'order_day_of_week', 'order_hour', 'distance_in_meters', 'duration_in_seconds',
+           'pickup_in_meters', 'pickup_in_seconds', 'driver_rating', 'user_rating',
+           'driver_experience_days', 'price_start_local', 'price_bid_local', 'is_done']
+
+# Доля заказов по часам суток (спрос)
+HOUR_WEIGHTS = np.array([2, 1, 1, 1, 1, 2, 4, 7, 9, 7, 5, 5,
+                         5, 5, 5, 5, 6, 8, 9, 8, 6, 5, 4, 3], dtype=np.float64)
+PEAK_HOURS = [7, 8, 9, 17, 18, 19, 20]
+NIGHT_HOURS = [0, 1, 2, 3, 4, 5]
+
+# Логит вероятности принятия: intercept + сумма коэффициентов на признаки.
+# markup - надбавка бида к стартовой цене (0.2 = +20%)
+ACCEPTANCE = {
+    'intercept': 1.3,
+    'markup': -5.0,
+    'peak_hours': 0.4,
+    'night_hours': -0.3,
+    'distance_km': -0.02,
+    'driver_rating': 0.8,
+    'pickup_km': -0.15,
+}
+
+# Тариф стартовой цены: подача + за км + за минуту, в час пик - надбавка
+BASE_FARE = 80
+FARE_PER_KM = 18
+FARE_PER_MINUTE = 4
+PEAK_SURGE = 1.2
+
+
+def acceptance_probability(orders: dict, params: dict = None) -> np.ndarray:
+    """Вероятность принятия заказа по надбавке, часу, дистанции, рейтингу и подаче"""
+    params = {**ACCEPTANCE, **(params or {})}
+    hour = np.asarray(orders['order_hour'])
+    markup = np.asarray(orders['price_bid_local']) / np.asarray(orders['price_start_local']) - 1
+    logit = (params['intercept']
+             + params['markup'] * markup
+             + params['peak_hours'] * np.isin(hour, PEAK_HOURS)
+             + params['night_hours'] * np.isin(hour, NIGHT_HOURS)
+             + params['distance_km'] * np.asarray(orders['distance_in_meters']) / 1000
+             + params['driver_rating'] * (np.asarray(orders['driver_rating']) - 4.5)
+             + params['pickup_km'] * np.asarray(orders['pickup_in_meters']) / 1000)
+    return 1 / (1 + np.exp(-logit))
+
+
+def generate_block(block: int, seed: int = 42, params: dict = None) -> dict:
+    """Колонки блока из BLOCK_ROWS заказов с номером block (order_id продолжают предыдущие блоки)"""
+    rng = np.random.default_rng([seed, block])
+    n_rows = BLOCK_ROWS
+    start = block * BLOCK_ROWS
+    hour = np.searchsorted(np.cumsum(HOUR_WEIGHTS / HOUR_WEIGHTS.sum()), rng.random(n_rows))
+    hour = np.minimum(hour, 23)
+    peak = np.isin(hour, PEAK_HOURS)
 
-def create_data():
+    distance = np.clip(rng.lognormal(np.log(5000), 0.6, n_rows), 500, 50000)
+    # Средняя скорость 5-12 м/с, в час пик медленнее
+    speed = rng.uniform(5, 12, n_rows) * np.where(peak, 0.75, 1.0)
+    duration = distance / speed
+    pickup = np.clip(rng.exponential(1200, n_rows), 50, 10000)
+
+    price_start = np.round((BASE_FARE + FARE_PER_KM * distance / 1000 + FARE_PER_MINUTE * duration / 60)
+                           * np.where(peak, PEAK_SURGE, 1.0))
+    # Четверть бидов без надбавки, остальные до +60%
+    markup = np.where(rng.random(n_rows) < 0.25, 0.0, rng.uniform(0, 0.6, n_rows))
+
+    orders = {
+        'order_id': np.arange(start + 1, start + n_rows + 1, dtype=np.int64),
+        'order_day_of_week': rng.integers(0, 7, n_rows),
+        'order_hour': hour,
+        'distance_in_meters': np.round(distance),
+        'duration_in_seconds': np.round(duration),
+        'pickup_in_meters': np.round(pickup),
+        'pickup_in_seconds': np.round(pickup / rng.uniform(5, 10, n_rows)),
+        'driver_rating': np.round(np.clip(5 - rng.exponential(0.3, n_rows), 3.0, 5.0), 2),
+        'user_rating': np.round(np.clip(5 - rng.exponential(0.25, n_rows), 3.0, 5.0), 2),
+        'driver_experience_days': np.minimum(rng.exponential(400, n_rows), 5000).astype(np.int64),
+        'price_start_local': price_start,
+        'price_bid_local': np.round(price_start * (1 + markup)),
+    }
+    orders['is_done'] = rng.random(n_rows) < acceptance_probability(orders, params)
+    return {name: orders[name].astype(SCHEMA[name], copy=False) for name in COLUMNS}
+
+
+def iter_blocks(n_rows: int, seed: int = 42, params: dict = None):
+    """Блоки заказов по BLOCK_ROWS строк, всего n_rows"""
+    for block, start in enumerate(range(0, n_rows, BLOCK_ROWS)):
+        # Последний блок генерируется целиком и обрезается, чтобы не сдвигать случайный поток
+        size = min(BLOCK_ROWS, n_rows - start)
+        yield {name: values[:size] for name, values in generate_block(block, seed, params).items()}
+
+
+def generate(csv_path: str, n_rows: int, seed: int = 42, params: dict = None,
+             output_format: str = 'columnar') -> dict:
+    """
+    Потоковая генерация n_rows заказов на диск.
+
+    columnar - колонки .npy в формате columnar.convert_csv (data/train.columns),
+    которые load_dataset и iter_chunks читают без CSV; csv - обычный CSV,
+    заметно медленнее; both - оба, колонки пишутся последними и остаются
+    свежее CSV. В памяти одновременно только один блок.
+    """
+    start = time.perf_counter()
+    if output_format in ('csv', 'both'):
+        for i, block in enumerate(iter_blocks(n_rows, seed, params)):
+            pd.DataFrame(block, copy=False).to_csv(csv_path, mode='w' if i == 0 else 'a',
+                                                   header=i == 0, index=False)
+    if output_format in ('columnar', 'both'):
+        path = columnar_path(csv_path)
+        os.makedirs(path, exist_ok=True)
+        index_path = os.path.join(path, 'columns.txt')
+        if os.path.exists(index_path):
+            os.remove(index_path)
+        arrays = {name: np.lib.format.open_memmap(os.path.join(path, f'{name}.npy'), mode='w+',
+                                                  dtype=SCHEMA[name], shape=(n_rows,))
+                  for name in COLUMNS}
+        offset = 0
+        for block in iter_blocks(n_rows, seed, params):
+            size = len(block['order_id'])
+            for name, values in block.items():
+                arrays[name][offset:offset + size] = values
+            offset += size
+        for array in arrays.values():
+            array.flush()
+        del arrays
+        # Как в convert_csv: список колонок пишется последним как признак завершенной записи
+        with open(index_path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(COLUMNS))
+    seconds = time.perf_counter() - start
+    return {'rows': n_rows, 'seconds': seconds, 'rows_per_s': n_rows / max(seconds, 1e-9)}
+
+
+def create_data(n_rows: int = 1000, seed: int = 42, output_format: str = 'both'):
     print("Создание тестовых данных...")
-    
-    np.random.seed(42)
-    n_samples = 1000
-    
-    data = pd.DataFrame({
-        'order_id': range(1, n_samples + 1),
-        'price_start_local': np.random.randint(200, 500, n_samples),
-        'price_bid_local': np.random.randint(250, 600, n_samples),
-        'driver_rating': np.random.uniform(3.5, 5.0, n_samples),
-        'distance_in_meters': np.random.randint(1000, 20000, n_samples),
-        'is_done': np.random.choice([0, 1], n_samples, p=[0.3, 0.7])
-    })
-    
     os.makedirs('data', exist_ok=True)
-    data.to_csv('data/train.csv', index=False)
+    generate('data/train.csv', n_rows, seed, output_format=output_format)
     print("✅ Данные созданы в data/train.csv")
 
+
+def main():
+    parser = argparse.ArgumentParser(description="Генерация синтетических заказов")
+    parser.add_argument('--output', default=os.path.join('data', 'train.csv'),
+                        help="Путь CSV; колонки пишутся рядом (train.columns)")
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--format', choices=['columnar', 'csv', 'both'], default='both')
+    parser.add_argument('--acceptance', default=None,
+                        help=f"JSON с коэффициентами принятия поверх {json.dumps(ACCEPTANCE)}")
+    args = parser.parse_args()
+
+    params = json.loads(args.acceptance) if args.acceptance else None
+    unknown = set(params or {}) - set(ACCEPTANCE)
+    if unknown:
+        parser.error(f"Неизвестные коэффициенты: {sorted(unknown)}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    print(f"📊 Генерация {args.rows} заказов ({args.format})...")
+    report = generate(args.output, args.rows, args.seed, params, args.format)
+    print(f"✅ Данные созданы: {args.output} за {report['seconds']:.1f} с "
+          f"({report['rows_per_s'] / 1e6:.2f} млн строк/с)")
+
+
 if __name__ == "__main__":
-    create_data()
\ No newline at end of file
+    main()
@@ -0,0 +1,93 @@
+import numpy as np
+from typing import Dict, Any, List, Tuple
+
+# Признаки, зависящие от цены бида
+PRICE_FEATURES = ('price_bid_local', 'price_ratio')
+
+
+def _float32_floor(threshold: float) -> float:
+    """Наибольшее float32-значение, не превышающее порог (sklearn сравнивает X в float32)"""
+    value = np.float32(threshold)
+    if value > threshold:
+        value = np.nextafter(value, np.float32(-np.inf))
+    return float(value)
+
+
+def _tree_price_leaves(tree, fixed_values: np.ndarray, price_feature: Dict[int, str],
+                       base_price: float) -> List[Tuple[float, float, float]]:
+    """
+    Обход одного дерева при фиксированных признаках заказа.
+
+    Ветви, противоречащие фиксированным признакам, отбрасываются. Возвращает
+    листья как интервалы цены (lo, hi] с вероятностью принятия в листе.
+    """
+    left = tree.children_left
+    right = tree.children_right
+    feature = tree.feature
+    threshold = tree.threshold
+    value = tree.value[:, 0, :]
+
+    leaves = []
+    stack = [(0, -np.inf, np.inf)]
+    while stack:
+        node, lo, hi = stack.pop()
+        if left[node] == -1:
+            proba = value[node] / value[node].sum()
+            leaves.append((lo, hi, proba[1]))
+            continue
+
+        f = feature[node]
+        if f in price_feature:
+            # Порог по признаку цены переводим в порог по самой цене бида
+            bound = _float32_floor(threshold[node])
+            if price_feature[f] == 'price_ratio':
+                bound *= base_price
+            if lo < bound:
+                stack.append((left[node], lo, min(hi, bound)))
+            if bound < hi:
+                stack.append((right[node], max(lo, bound), hi))
+        elif fixed_values[f] <= threshold[node]:
+            stack.append((left[node], lo, hi))
+        else:
+            stack.append((right[node], lo, hi))
+
+    return leaves
+
+
+def price_step_function(model, order_features: Dict[str, Any], feature_names: List[str],
+                        price_min: float, price_max: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Точная ступенчатая функция вероятности принятия от цены для RandomForest.
+
+    Возвращает правые границы ступеней на отрезке [price_min, price_max]
+    и вероятность на каждой ступени. Ожидаемый доход price * probability
+    внутри ступени растет, поэтому его максимум достигается на одной из границ.
+    """
+    base_price = float(order_features['price_start_local'])
+    price_feature = {j: name for j, name in enumerate(feature_names) if name in PRICE_FEATURES}
+
+    # Фиксированные признаки приводим к float32, как это делает sklearn
+    fixed_values = np.zeros(len(feature_names), dtype=np.float32)
+    for j, name in enumerate(feature_names):
+        if j not in price_feature:
+            fixed_values[j] = order_features[name]
+
+    tree_leaves = [_tree_price_leaves(estimator.tree_, fixed_values, price_feature, base_price)
+                   for estimator in model.estimators_]
+
+    # Границы ступеней внутри отрезка и его правый конец
+    bounds = [hi for leaves in tree_leaves for _, hi, _ in leaves
+              if price_min <= hi < price_max]
+    prices = np.unique(np.append(bounds, price_max))
+
+    # Вероятность леса на ступени (lo, hi] = среднее по деревьям
+    probabilities = np.zeros(len(prices) + 1)
+    for leaves in tree_leaves:
+        for lo, hi, proba in leaves:
+            start = np.searchsorted(prices, lo, side='right')
+            stop = np.searchsorted(prices, hi, side='right')
+            probabilities[start] += proba
+            probabilities[stop] -= proba
+    probabilities = np.cumsum(probabilities[:-1]) / len(tree_leaves)
+
+    return prices, probabilities
@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+
+# Признаки модели принятия заказа в фиксированном порядке колонок
+FEATURES = ['price_start_local', 'price_bid_local', 'price_ratio',
+            'driver_rating', 'distance_km', 'order_hour']
+
+# Производные признаки: имя -> (исходные колонки, вычисление по массивам)
+DERIVED = {
+    'distance_km': (('distance_in_meters',), lambda meters: meters / 1000),
+    'price_ratio': (('price_bid_local', 'price_start_local'), lambda bid, start: bid / start),
+}
+
+# Колонки исходных данных, из которых строятся признаки
+INPUT_COLUMNS = FEATURES + ['distance_in_meters']
+
+# Значения по умолчанию для отсутствующих признаков
+FEATURE_DEFAULTS = {
+    'driver_rating': 4.5,
+    'distance_km': 5.0,
+    'order_hour': 12
+}
+
+
+def _column(orders, name: str):
+    """Колонка заказов как float64 массив или None, если ее нет"""
+    if name not in orders:
+        return None
+    return np.asarray(orders[name], dtype=np.float64)
+
+
+def feature_values(orders, name: str, defaults=None) -> np.ndarray:
+    """
+    Значения признака name для заказов.
+
+    orders - DataFrame или словарь колонок (скаляры или массивы). Пропуски
+    заполняются сначала производным значением из исходных колонок
+    (distance_in_meters -> distance_km), затем значением по умолчанию.
+    """
+    defaults = FEATURE_DEFAULTS if defaults is None else defaults
+    values = _column(orders, name)
+
+    if name in DERIVED:
+        sources, derive = DERIVED[name]
+        if all(source in orders for source in sources):
+            derived = derive(*(_column(orders, source) for source in sources))
+            values = derived if values is None else np.where(np.isnan(values), derived, values)
+
+    if name in defaults:
+        values = (np.float64(defaults[name]) if values is None
+                  else np.where(np.isnan(values), defaults[name], values))
+
+    if values is None:
+        raise KeyError(f"Нет признака {name}: нужна колонка {name} или значение по умолчанию")
+    return values
+
+
+def _n_orders(orders) -> int:
+    if isinstance(orders, pd.DataFrame):
+        return len(orders)
+    return max([np.size(value) for value in orders.values()] + [1])
+
+
+def build_matrix(orders, feature_names=FEATURES, bid_prices=None, defaults=None) -> np.ndarray:
+    """
+    Непрерывная float32 матрица признаков (строки × feature_names).
+
+    Если задан bid_prices формы (заказы, цены), строки заказа идут подряд
+    по его ценам: price_bid_local и price_ratio берутся из сетки цен, а
+    остальные признаки повторяются. float32 совпадает с тем, к чему
+    приводит признаки sklearn, поэтому предсказания не меняются.
+    """
+    if bid_prices is None:
+        shape = (_n_orders(orders),)
+        grid = {}
+    else:
+        bid_prices = np.atleast_2d(np.asarray(bid_prices, dtype=np.float64))
+        shape = bid_prices.shape
+        base_price = feature_values(orders, 'price_start_local', defaults).reshape(-1, 1)
+        grid = {'price_bid_local': bid_prices, 'price_ratio': bid_prices / base_price}
+
+    matrix = np.empty((int(np.prod(shape)), len(feature_names)), dtype=np.float32)
+    for j, name in enumerate(feature_names):
+        if name in grid:
+            values = grid[name]
+        else:
+            values = feature_values(orders, name, defaults)
+            if grid and values.ndim:
+                values = values.reshape(-1, 1)
+        matrix[:, j] = np.broadcast_to(values, shape).ravel()
+    return matrix
+
+
+def build_frame(orders, feature_names=FEATURES, defaults=None) -> pd.DataFrame:
+    """build_matrix с именами колонок: модели, обученные на нем, запоминают порядок признаков"""
+    return pd.DataFrame(build_matrix(orders, feature_names, defaults=defaults),
+                        columns=list(feature_names), copy=False)
+
+
+def model_input(model, matrix: np.ndarray, feature_names):
+    """Матрица для sklearn predict_proba: модели с feature_names_in_ ждут DataFrame"""
+    if hasattr(model, 'feature_names_in_'):
+        return pd.DataFrame(matrix, columns=list(feature_names), copy=False)
+    return matrix
+
+
+def order_columns(orders: pd.DataFrame) -> dict:
+    """Исходные колонки заказов как массивы (для нарезки порций без DataFrame)"""
+    return {name: orders[name].to_numpy() for name in INPUT_COLUMNS if name in orders.columns}
@@ -0,0 +1,130 @@
+import argparse
+import copy
+import os
+import time
+
+import joblib
+import numpy as np
+
+from columnar import load_dataset
+from features import build_frame
+from model import prepare_features, INPUT_COLUMNS, data_dir
+from model_loader import load_model, MODEL_PATH, read_model_meta, write_model_meta
+
+
+def add_trees(model, X_new, y_new, n_new_trees: int, max_trees: int = None) -> int:
+    """
+    Дообучение RandomForest новыми деревьями.
+
+    Через warm_start добавляются n_new_trees деревьев, обученных только
+    на X_new, y_new; старые деревья не меняются, поэтому время зависит от
+    размера новых данных, а не от всей истории. При max_trees самые старые
+    деревья удаляются. Возвращает число удаленных деревьев.
+    """
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + n_new_trees)
+    model.fit(X_new, y_new)
+    model.set_params(warm_start=False)
+
+    retired = 0
+    if max_trees is not None and len(model.estimators_) > max_trees:
+        retired = len(model.estimators_) - max_trees
+        model.estimators_ = model.estimators_[retired:]
+        model.set_params(n_estimators=max_trees)
+    return retired
+
+
+def update_model(data_path: str, model_path: str = MODEL_PATH, n_new_trees: int = 20,
+                 max_trees: int = None, holdout: float = 0.2, max_auc_drop: float = 0.01) -> bool:
+    """
+    Инкрементальное обновление сохраненной модели новыми строками data_path.
+
+    Новыми считаются строки после trained_rows из сведений о модели.
+    Последняя доля holdout новых строк - отложенное окно: на нем ROC-AUC
+    сравнивается до и после обновления, и модель сохраняется, только
+    если AUC упал не больше чем на max_auc_drop. Строки окна не
+    отмечаются как учтенные и попадут в обучение следующего обновления.
+    """
+    from sklearn.metrics import roc_auc_score
+
+    meta = read_model_meta(model_path)
+    if 'trained_rows' not in meta:
+        print("❌ Нет сведений об обученных строках. Сначала запустите: python src/model.py")
+        return False
+
+    if meta.get('engine', 'forest') != 'forest':
+        print("❌ Дообучение деревьями доступно только для RandomForest, переобучите: python src/model.py")
+        return False
+
+    # Дообучаем копию: модель из кэша процесса используют оптимизатор и сервис,
+    # и отвергнутое или упавшее обновление не должно ее менять
+    model = copy.deepcopy(load_model(model_path))
+    features = list(model.feature_names_in_)
+    new_rows = load_dataset(data_path, INPUT_COLUMNS + ['is_done'], skip_rows=meta['trained_rows'])
+    print(f"📥 Новых строк: {len(new_rows)} (уже учтено {meta['trained_rows']})")
+    if len(new_rows) == 0:
+        print("✅ Модель актуальна")
+        return False
+
+    new_rows, _ = prepare_features(new_rows.copy(), verbose=False)
+    n_train = len(new_rows) - int(np.ceil(len(new_rows) * holdout))
+    train = new_rows.iloc[:n_train][features + ['is_done']].dropna()
+    window = new_rows.iloc[n_train:][features + ['is_done']].dropna()
+    X_train, X_window = build_frame(train, features), build_frame(window, features)
+    if train['is_done'].nunique() < 2 or window['is_done'].nunique() < 2:
+        print("❌ Мало новых данных: в обучении и в окне нужны оба исхода заказа")
+        return False
+
+    auc_before = roc_auc_score(window['is_done'], model.predict_proba(X_window)[:, 1])
+
+    start = time.perf_counter()
+    retired = add_trees(model, X_train, train['is_done'], n_new_trees, max_trees)
+    train_time = time.perf_counter() - start
+
+    auc_after = roc_auc_score(window['is_done'], model.predict_proba(X_window)[:, 1])
+    print(f"🎯 +{n_new_trees} деревьев на {len(train)} строках за {train_time:.2f} с, "
+          f"удалено старых: {retired}, всего: {len(model.estimators_)}")
+    print(f"📊 ROC-AUC на окне ({len(window)} строк): {auc_before:.3f} -> {auc_after:.3f}")
+
+    if auc_after < auc_before - max_auc_drop:
+        print(f"❌ AUC упал больше чем на {max_auc_drop}, модель не сохранена")
+        return False
+
+    # Файл заменяется целиком только после записи новой версии
+    tmp_path = model_path + '.tmp'
+    joblib.dump(model, tmp_path)
+    os.replace(tmp_path, model_path)
+    meta['trained_rows'] += n_train
+    meta['n_trees'] = len(model.estimators_)
+    meta.setdefault('updates', []).append({
+        'rows': len(train),
+        'added_trees': n_new_trees,
+        'retired_trees': retired,
+        'train_seconds': round(train_time, 3),
+        'auc_before': round(auc_before, 4),
+        'auc_after': round(auc_after, 4)
+    })
+    write_model_meta(meta, model_path)
+    load_model(model_path, reload=True)
+    print(f"💾 Модель обновлена: {model_path}")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Инкрементальное дообучение модели новыми заказами")
+    parser.add_argument('--data', default=os.path.join(data_dir, 'train.csv'))
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--new-trees', type=int, default=20)
+    parser.add_argument('--max-trees', type=int, default=None,
+                        help="Предельный размер леса, старые деревья удаляются")
+    parser.add_argument('--holdout', type=float, default=0.2,
+                        help="Доля новых строк в отложенном окне")
+    parser.add_argument('--max-auc-drop', type=float, default=0.01)
+    args = parser.parse_args()
+
+    print("🔄 Инкрементальное обновление модели...")
+    update_model(args.data, args.model, args.new_trees, args.max_trees,
+                 args.holdout, args.max_auc_drop)
+
+
+if __name__ == "__main__":
+    main()
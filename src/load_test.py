@@ -0,0 +1,81 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import numpy as np
+
+
+async def worker(host: str, port: int, n_requests: int, latencies: list, statuses: dict, seed: int):
+    """Одно keep-alive соединение, запросы отправляются последовательно"""
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(n_requests):
+            order = {
+                'price_start_local': rng.randint(200, 500),
+                'driver_rating': round(rng.uniform(3.5, 5.0), 2),
+                'distance_km': round(rng.uniform(1, 20), 1),
+                'order_hour': rng.randint(0, 23)
+            }
+            body = json.dumps({'order': order}).encode('utf-8')
+            request = (
+                f"POST /optimize HTTP/1.1\r\n"
+                f"Host: {host}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n"
+            ).encode('latin-1') + body
+
+            start = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+
+            status = int((await reader.readline()).split()[1])
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                if name.strip().lower() == 'content-length':
+                    length = int(value)
+            await reader.readexactly(length)
+
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+async def run(host: str, port: int, concurrency: int, total_requests: int):
+    latencies, statuses = [], {}
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        worker(host, port, total_requests // concurrency + (seed < total_requests % concurrency),
+               latencies, statuses, seed)
+        for seed in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    print(f"📊 Нагрузочный тест: {len(latencies)} запросов, {concurrency} соединений")
+    print(f"   - Пропускная способность: {len(latencies) / elapsed:.0f} запросов/с")
+    print(f"   - Задержка p50: {np.percentile(latencies_ms, 50):.1f} мс, "
+          f"p99: {np.percentile(latencies_ms, 99):.1f} мс")
+    print(f"   - Статусы ответов: {statuses}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальный нагрузочный тест сервиса рекомендаций")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.host, args.port, args.concurrency, args.requests))
+
+
+if __name__ == "__main__":
+    main()
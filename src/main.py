@@ -1,30 +1,40 @@
+import argparse
+
 import pandas as pd
 import numpy as np
-from analysis import DataAnalyzer
-from model import AcceptancePredictor
+from model import prepare_features, train_model, tuned_config, INPUT_COLUMNS
+from model_loader import MODEL_PATH, save_model
+from columnar import load_dataset
+from features import build_frame
 from optimization import PriceOptimizer
 from visualization import InterfaceDesigner
 import json
+import metrics
 
 def main():
     print("🚗 Запуск умного помощника Drivee...")
     
     # Шаг 1: Анализ данных
     print("\n📊 Шаг 1: Анализ данных...")
-    analyzer = DataAnalyzer('../data/train.csv')
-    data = analyzer.analyze_acceptance_patterns()
+    data = load_dataset('../data/train.csv', INPUT_COLUMNS + ['is_done'])
+    n_total = len(data)
+    data, available_features = prepare_features(data)
+    data = data[available_features + ['is_done']].dropna()
+    print(f"📊 Заказов: {len(data)}, принято: {data['is_done'].mean():.1%}")
     
     # Шаг 2: Обучение модели
     print("\n🤖 Шаг 2: Обучение модели...")
-    predictor = AcceptancePredictor()
-    model = predictor.train(data)
+    # С параметрами tuning.py, если подбор был (как в model.py)
+    tuned = tuned_config(MODEL_PATH)
+    engine = tuned.get('engine', 'forest')
+    model = train_model(build_frame(data, available_features), data['is_done'], engine, tuned.get('params'))
     
-    # Сохраняем модель
-    predictor.save_model('../models/acceptance_model.joblib')
+    # Сохраняем модель со сведениями для дообучения (incremental.py)
+    save_model(model, {**tuned, 'engine': engine, 'trained_rows': n_total}, MODEL_PATH)
     
     # Шаг 3: Оптимизация цены для примера заказа
     print("\n💰 Шаг 3: Оптимизация цены...")
-    optimizer = PriceOptimizer(predictor)
+    optimizer = PriceOptimizer(model)
     
     # Пример заказа
     sample_order = {
@@ -50,7 +60,7 @@ def main():
     print(f"Ожидаемый доход: {result['optimal']['expected_revenue']:.0f}₽")
     
     # Визуализация оптимизации
-    optimizer.plot_optimization_results(result)
+    optimizer.plot_optimization(result)
     
     # Шаг 4: Создание интерфейса
     print("\n🎨 Шаг 4: Создание интерфейса...")
@@ -63,7 +73,8 @@ def main():
     }
     
     interface_fig = designer.create_driver_interface(order_info, result)
-    interface_fig.savefig('../output/driver_interface.png', dpi=150, bbox_inches='tight')
+    with metrics.timer('interface.savefig'):
+        interface_fig.savefig('../output/driver_interface.png', dpi=150, bbox_inches='tight')
     print("💾 Интерфейс сохранен в output/driver_interface.png")
     
     # Шаг 5: Генерация отчета
@@ -99,4 +110,9 @@ def generate_report(optimization_result, order_features):
     print("📄 Отчет сохранен в output/recommendation_report.json")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Умный помощник Drivee: обучение, цена, интерфейс")
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    metrics.setup(args)
+    main()
+    metrics.report(args)
\ No newline at end of file
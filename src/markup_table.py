@@ -0,0 +1,239 @@
+import argparse
+import numpy as np
+import pandas as pd
+import itertools
+import os
+import sys
+import time
+from typing import Dict, Any
+
+from features import feature_values
+
+# Получаем абсолютные пути
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+models_dir = os.path.join(project_root, 'models')
+TABLE_PATH = os.path.join(models_dir, 'markup_table.npz')
+
+# Оси таблицы по умолчанию: рейтинг, дистанция, час заказа, базовая цена.
+# Шаг базовой цены мельче остальных: лес делит по абсолютной цене бида, и при
+# шаге 50₽ интерполяция между узлами сдвигает ступени вероятности
+DEFAULT_AXES = {
+    'driver_rating': np.round(np.arange(3.5, 5.0001, 0.1), 2),
+    'distance_km': np.array([1, 2, 3, 4, 5, 6, 8, 10, 12, 15, 20, 25, 30], dtype=float),
+    'order_hour': np.arange(24, dtype=float),
+    'price_start_local': np.arange(150, 801, 25, dtype=float),
+}
+
+# Сетка надбавок, как у PriceOptimizer.find_optimal_price по умолчанию
+DEFAULT_MARKUPS = np.linspace(0.0, 0.5, 50)
+
+# Допустимая потеря ожидаемого дохода относительно точной оптимизации (%),
+# средняя и 95-й перцентиль: таблица с большей ошибкой не сохраняется.
+# Сетка из 50 цен по самой модели теряет около 0.8% в среднем
+MAX_MEAN_REGRET_PERCENT = 1.5
+MAX_P95_REGRET_PERCENT = 5.0
+
+
+class MarkupTable:
+    """
+    Предрасчитанные кривые вероятности принятия по сетке признаков заказа.
+
+    В каждом узле сетки хранится вероятность принятия для сетки надбавок
+    markups. Вероятность для заказа - мультилинейная интерполяция кривых
+    2^4 соседних узлов и линейная по надбавке, без обращения к модели;
+    оптимальная цена - максимум ожидаемого дохода по интерполированной
+    кривой. Интерполировать саму оптимальную надбавку нельзя: на стыке
+    узлов с разными локальными максимумами дохода она скачет, и среднее
+    двух надбавок попадает в провал. Значения за пределами осей берутся
+    с ближайшей границы.
+    """
+
+    def __init__(self, axes: Dict[str, np.ndarray], markups: np.ndarray, probabilities: np.ndarray):
+        self.axes = {name: np.asarray(axis, dtype=float) for name, axis in axes.items()}
+        self.markups = np.asarray(markups, dtype=float)
+        # (...оси, надбавки): кривая узла целиком рядом в памяти
+        self.grid = np.asarray(probabilities, dtype=np.float32)
+        # Углы ячейки: 2^4 сдвигов 0/1 по осям
+        self._corners = np.array(list(itertools.product((0, 1), repeat=len(self.axes))))
+        expected_shape = tuple(len(axis) for axis in self.axes.values()) + (len(self.markups),)
+        if self.grid.shape != expected_shape:
+            raise ValueError(f"Форма таблицы {self.grid.shape} не совпадает с осями {expected_shape}")
+
+    @classmethod
+    def build(cls, optimizer, axes: Dict[str, np.ndarray] = None, markups: np.ndarray = None,
+              chunk_size: int = 2000) -> 'MarkupTable':
+        """Расчет кривых вероятности моделью оптимизатора по всем узлам сетки"""
+        axes = DEFAULT_AXES if axes is None else axes
+        markups = DEFAULT_MARKUPS if markups is None else np.asarray(markups, dtype=float)
+        names = list(axes)
+        shape = tuple(len(axis) for axis in axes.values())
+
+        nodes = np.array(list(itertools.product(*axes.values())), dtype=float)
+        orders = pd.DataFrame(nodes, columns=names)
+        print(f"🧮 Расчет таблицы {' × '.join(map(str, shape))} = {len(orders)} узлов "
+              f"× {len(markups)} надбавок...")
+        curves = optimizer.acceptance_curves(orders, markups, chunk_size=chunk_size)
+        return cls(axes, markups, curves.reshape(shape + (len(markups),)))
+
+    def curves(self, order_features, defaults=None) -> np.ndarray:
+        """
+        Кривые вероятности по сетке надбавок: форма (надбавки,) для одного
+        заказа (словарь скаляров) или (заказы, надбавки) для колонок заказов.
+        """
+        corners = self._corners
+        index, weight = [], 1.0
+        for k, (name, axis) in enumerate(self.axes.items()):
+            x = np.clip(np.asarray(feature_values(order_features, name, defaults), dtype=float),
+                        axis[0], axis[-1])[..., None]
+            i = np.clip(np.searchsorted(axis, x, side='right') - 1, 0, len(axis) - 2)
+            t = (x - axis[i]) / (axis[i + 1] - axis[i])
+            index.append(i + corners[:, k])
+            weight = weight * np.where(corners[:, k], t, 1 - t)
+
+        # Кривые 2^4 соседних узлов с весами произведения долей по осям
+        return np.einsum('...c,...cm->...m', weight, self.grid[tuple(index)].astype(np.float64))
+
+    def probabilities(self, order_features, bid_prices, defaults=None) -> np.ndarray:
+        """
+        Вероятность принятия для цен bid_prices, как AcceptanceCube.probabilities:
+        один заказ и цены формы (цены,) или колонки заказов и цены
+        (заказы, цены). Между узлами сетки надбавок - линейная интерполяция.
+        """
+        curves = np.atleast_2d(self.curves(order_features, defaults))
+        bid_prices = np.asarray(bid_prices, dtype=np.float64)
+        base_price = np.asarray(feature_values(order_features, 'price_start_local', defaults), dtype=float)
+        markups = np.clip(np.atleast_2d(bid_prices) / base_price.reshape(-1, 1) - 1,
+                          self.markups[0], self.markups[-1])
+
+        j = np.clip(np.searchsorted(self.markups, markups, side='right') - 1, 0, len(self.markups) - 2)
+        u = (markups - self.markups[j]) / (self.markups[j + 1] - self.markups[j])
+        rows = np.arange(len(curves)).reshape(-1, 1)
+        probabilities = curves[rows, j] * (1 - u) + curves[rows, j + 1] * u
+        return probabilities.reshape(bid_prices.shape)
+
+    def lookup(self, order_features: Dict[str, Any], default_values: Dict[str, float] = None,
+               safe_probability: float = 0.7) -> Dict[str, Any]:
+        """Рекомендация в формате PriceOptimizer.find_optimal_price (без all_options)"""
+        probabilities = self.curves(order_features, default_values)
+        base_price = order_features['price_start_local']
+        prices = base_price * (1 + self.markups)
+        expected_revenue = prices * probabilities
+
+        optimal_idx = int(np.argmax(expected_revenue))
+        safe_mask = probabilities >= safe_probability
+        safe_idx = int(np.argmax(np.where(safe_mask, expected_revenue, -np.inf))) if safe_mask.any() else optimal_idx
+
+        recommendation = {'base_price': base_price}
+        for kind, idx in (('optimal', optimal_idx), ('safe', safe_idx)):
+            recommendation[kind] = {
+                'price': float(prices[idx]),
+                'probability': float(probabilities[idx]),
+                'expected_revenue': float(expected_revenue[idx]),
+                'markup_percent': float(self.markups[idx] * 100)
+            }
+        return recommendation
+
+    def save(self, path: str = TABLE_PATH):
+        """Сохранение таблицы в компактный бинарный .npz файл"""
+        arrays = {f'axis_{name}': axis for name, axis in self.axes.items()}
+        np.savez_compressed(path, axis_order=np.array(list(self.axes)), markups=self.markups,
+                            probabilities=self.grid, **arrays)
+
+    @classmethod
+    def load(cls, path: str = TABLE_PATH) -> 'MarkupTable':
+        """Загрузка таблицы из .npz файла"""
+        with np.load(path) as data:
+            axes = {str(name): data[f'axis_{name}'] for name in data['axis_order']}
+            return cls(axes, data['markups'], data['probabilities'])
+
+
+def error_report(table: MarkupTable, optimizer, n_samples: int = 200,
+                 method: str = 'exact', seed: int = 0) -> pd.DataFrame:
+    """
+    Сравнение таблицы с точной оптимизацией на случайных заказах.
+
+    Для цены из таблицы доход пересчитывается моделью, поэтому regret -
+    реальная потеря ожидаемого дохода относительно оптимума.
+    """
+    rng = np.random.default_rng(seed)
+    rows = []
+    for _ in range(n_samples):
+        order = {
+            name: float(rng.uniform(axis[0], axis[-1]))
+            for name, axis in table.axes.items()
+        }
+        order['order_hour'] = int(rng.integers(0, 24))
+
+        exact = optimizer.find_optimal_price(order, method=method)['optimal']
+        approx = table.lookup(order)['optimal']
+        approx_revenue = approx['price'] * optimizer.predict_probability(order, approx['price'])
+        rows.append({
+            'markup_error': abs(approx['markup_percent'] - exact['markup_percent']),
+            'probability_error': abs(approx['probability'] - exact['probability']),
+            'regret': exact['expected_revenue'] - approx_revenue,
+            'regret_percent': (exact['expected_revenue'] - approx_revenue) / exact['expected_revenue'] * 100,
+        })
+    return pd.DataFrame(rows)
+
+
+def check_errors(report: pd.DataFrame, max_mean_regret_percent: float = MAX_MEAN_REGRET_PERCENT,
+                 max_p95_regret_percent: float = MAX_P95_REGRET_PERCENT):
+    """Проверка отчета error_report: ValueError, если потеря дохода выше порога"""
+    mean_regret = report['regret_percent'].mean()
+    p95_regret = report['regret_percent'].quantile(0.95)
+    if mean_regret > max_mean_regret_percent or p95_regret > max_p95_regret_percent:
+        raise ValueError(
+            f"Таблица теряет {mean_regret:.2f}% дохода в среднем и {p95_regret:.2f}% по 95-му перцентилю "
+            f"(допустимо {max_mean_regret_percent}% и {max_p95_regret_percent}%): "
+            f"нужна более частая сетка"
+        )
+
+
+def main():
+    from optimization import PriceOptimizer
+
+    parser = argparse.ArgumentParser(description='Предрасчет таблицы вероятностей принятия по сетке заказов')
+    parser.add_argument('--output', default=TABLE_PATH, help='Путь к файлу таблицы (.npz)')
+    parser.add_argument('--samples', type=int, default=200, help='Заказов для проверки ошибки')
+    parser.add_argument('--max-mean-regret', type=float, default=MAX_MEAN_REGRET_PERCENT,
+                        help='Допустимая средняя потеря дохода, %%')
+    parser.add_argument('--max-p95-regret', type=float, default=MAX_P95_REGRET_PERCENT,
+                        help='Допустимая потеря дохода по 95-му перцентилю, %%')
+    args = parser.parse_args()
+
+    optimizer = PriceOptimizer(verbose=False)
+
+    start = time.perf_counter()
+    table = MarkupTable.build(optimizer)
+    print(f"✅ Таблица построена за {time.perf_counter() - start:.1f} с")
+
+    order = {'price_start_local': 300, 'driver_rating': 4.7, 'distance_km': 5.2, 'order_hour': 18}
+    n_lookups = 1000
+    start = time.perf_counter()
+    for _ in range(n_lookups):
+        table.lookup(order)
+    print(f"⚡ Поиск в таблице: {(time.perf_counter() - start) / n_lookups * 1e6:.0f} мкс на заказ")
+
+    print("📏 Сравнение с точной оптимизацией...")
+    report = error_report(table, optimizer, n_samples=args.samples)
+    print(f"   - Ошибка надбавки: средняя {report['markup_error'].mean():.2f} п.п., "
+          f"максимальная {report['markup_error'].max():.2f} п.п.")
+    print(f"   - Ошибка вероятности: средняя {report['probability_error'].mean():.3f}")
+    print(f"   - Потеря дохода: средняя {report['regret'].mean():.2f}₽ "
+          f"({report['regret_percent'].mean():.2f}%), "
+          f"95-й перцентиль {report['regret_percent'].quantile(0.95):.2f}%, "
+          f"максимальная {report['regret'].max():.2f}₽")
+
+    try:
+        check_errors(report, args.max_mean_regret, args.max_p95_regret)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    table.save(args.output)
+    print(f"💾 Таблица сохранена: {args.output} ({os.path.getsize(args.output)} байт)")
+
+
+if __name__ == "__main__":
+    main()
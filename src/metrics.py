@@ -0,0 +1,190 @@
+import contextlib
+import functools
+import json
+import threading
+import time
+
+import numpy as np
+
+# Границы корзин гистограмм задержки (мс), последняя корзина - +Inf
+BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+_NULL_TIMER = contextlib.nullcontext()
+_lock = threading.Lock()
+_enabled = False
+_counters = {}
+_histograms = {}
+
+
+def enable(flag: bool = True):
+    """Включение сбора метрик. Выключенные таймеры и счетчики почти ничего не стоят"""
+    global _enabled
+    _enabled = flag
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def count(name: str, value: float = 1):
+    """Увеличение счетчика name на value"""
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def observe(stage: str, seconds: float):
+    """Длительность этапа stage в гистограмму с фиксированными корзинами"""
+    if not _enabled:
+        return
+    index = int(np.searchsorted(BUCKETS_MS, seconds * 1000))
+    with _lock:
+        histogram = _histograms.get(stage)
+        if histogram is None:
+            histogram = _histograms[stage] = {'buckets': [0] * (len(BUCKETS_MS) + 1), 'count': 0, 'sum': 0.0}
+        histogram['buckets'][index] += 1
+        histogram['count'] += 1
+        histogram['sum'] += seconds
+
+
+class _Timer:
+    __slots__ = ('stage', 'start')
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+def timer(stage: str):
+    """
+    Контекстный менеджер замера этапа:
+
+        with metrics.timer('optimizer.predict'):
+            ...
+
+    При выключенных метриках возвращает общий пустой контекст без замера времени.
+    """
+    if not _enabled:
+        return _NULL_TIMER
+    return _Timer(stage)
+
+
+def timed(stage: str):
+    """Декоратор: замер каждого вызова функции как этапа stage"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Timer(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _quantile(histogram: dict, q: float) -> float:
+    """Оценка квантиля по корзинам (верхняя граница корзины, мс)"""
+    target = q * histogram['count']
+    cumulative = np.cumsum(histogram['buckets'])
+    index = int(np.searchsorted(cumulative, target))
+    return BUCKETS_MS[index] if index < len(BUCKETS_MS) else float('inf')
+
+
+def snapshot() -> dict:
+    """Копия всех счетчиков и гистограмм (для JSON)"""
+    with _lock:
+        histograms = {stage: {**histogram, 'buckets': list(histogram['buckets'])}
+                      for stage, histogram in _histograms.items()}
+        return {
+            'timestamp': time.time(),
+            'buckets_ms': list(BUCKETS_MS),
+            'counters': dict(_counters),
+            'histograms': histograms
+        }
+
+
+def _prometheus_name(name: str) -> str:
+    return 'drivee_' + ''.join(char if char.isalnum() else '_' for char in name)
+
+
+def to_prometheus(data: dict = None) -> str:
+    """Метрики в текстовом формате Prometheus"""
+    data = data or snapshot()
+    lines = []
+    for name, value in sorted(data['counters'].items()):
+        metric = _prometheus_name(name) + '_total'
+        lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+
+    if data['histograms']:
+        metric = 'drivee_stage_duration_seconds'
+        lines.append(f"# TYPE {metric} histogram")
+    for stage, histogram in sorted(data['histograms'].items()):
+        cumulative = 0
+        for bound, bucket in zip(list(data['buckets_ms']) + [None], histogram['buckets']):
+            cumulative += bucket
+            le = '+Inf' if bound is None else f"{bound / 1000:g}"
+            lines.append(f'{metric}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+        lines.append(f'{metric}_sum{{stage="{stage}"}} {histogram["sum"]:.9f}')
+        lines.append(f'{metric}_count{{stage="{stage}"}} {histogram["count"]}')
+    return "\n".join(lines) + "\n"
+
+
+def write(path: str):
+    """Сохранение метрик: .prom - формат Prometheus, иначе JSON"""
+    data = snapshot()
+    with open(path, 'w', encoding='utf-8') as f:
+        if path.endswith('.prom'):
+            f.write(to_prometheus(data))
+        else:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+    print(f"📊 Метрики сохранены: {path}")
+
+
+def print_profile():
+    """Таблица по этапам: число вызовов, суммарное и среднее время, p50/p99 по корзинам"""
+    data = snapshot()
+    print("\n⏱️ Профиль по этапам:")
+    if not data['histograms']:
+        print("   (нет замеров - метрики выключены?)")
+    for stage, histogram in sorted(data['histograms'].items(), key=lambda item: -item[1]['sum']):
+        mean_ms = histogram['sum'] / histogram['count'] * 1000
+        print(f"   - {stage}: {histogram['count']} вызовов, всего {histogram['sum'] * 1000:.1f} мс, "
+              f"среднее {mean_ms:.3f} мс, p50 ≤ {_quantile(histogram, 0.5)} мс, "
+              f"p99 ≤ {_quantile(histogram, 0.99)} мс")
+    for name, value in sorted(data['counters'].items()):
+        print(f"   - {name}: {value:g}")
+
+
+def add_arguments(parser):
+    """Общие флаги скриптов: --profile и --metrics"""
+    parser.add_argument('--profile', action='store_true', help="Напечатать профиль по этапам")
+    parser.add_argument('--metrics', default=None,
+                        help="Сохранить метрики (.prom - Prometheus, иначе JSON)")
+
+
+def setup(args):
+    """Включение метрик, если запрошен профиль или файл метрик"""
+    if args.profile or args.metrics:
+        enable()
+
+
+def report(args):
+    """Вывод профиля и сохранение метрик по флагам add_arguments"""
+    if args.profile:
+        print_profile()
+    if args.metrics:
+        write(args.metrics)
@@ -1,15 +1,12 @@
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import classification_report, roc_auc_score, accuracy_score
-import matplotlib.pyplot as plt
-import seaborn as sns
-import joblib
+import json
 import os
 import sys
 
-print("🤖 Запуск обучения ML-модели...")
+from columnar import load_dataset
+from features import FEATURES, FEATURE_DEFAULTS, INPUT_COLUMNS, DERIVED, feature_values, build_frame
+from model_loader import MODEL_PATH, read_model_meta, save_model
 
 # Получаем абсолютные пути
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -18,200 +15,307 @@ data_dir = os.path.join(project_root, 'data')
 models_dir = os.path.join(project_root, 'models')
 output_dir = os.path.join(project_root, 'output')
 
-# Создаем папки если их нет
-os.makedirs(data_dir, exist_ok=True)
-os.makedirs(models_dir, exist_ok=True)
-os.makedirs(output_dir, exist_ok=True)
-
-print(f"📁 Корень проекта: {project_root}")
-print(f"📁 Папка data: {data_dir}")
-print(f"📁 Папка models: {models_dir}")
-
-# Проверяем существование данных
-data_path = os.path.join(data_dir, 'train.csv')
-if not os.path.exists(data_path):
-    print(f"❌ Файл {data_path} не найден!")
-    print("💡 Сначала запустите: python src/analysis.py")
-    sys.exit(1)
-
-try:
-    # Загружаем данные
-    print("📥 Загрузка данных...")
-    data = pd.read_csv(data_path)
-    print(f"✅ Данные загружены: {len(data)} записей, {len(data.columns)} колонок")
-    print(f"📊 Колонки: {list(data.columns)}")
-except Exception as e:
-    print(f"❌ Ошибка загрузки данных: {e}")
-    sys.exit(1)
-
-# Проверяем целевую переменную
-if 'is_done' not in data.columns:
-    print("❌ В данных нет колонки 'is_done' (целевая переменная)")
-    sys.exit(1)
-
-# Предобработка данных
-print("🔧 Подготовка данных...")
-
-# Создаем дополнительные признаки если их нет
-if 'distance_km' not in data.columns:
-    data['distance_km'] = data.get('distance_in_meters', 5000) / 1000
-
-if 'price_ratio' not in data.columns:
-    data['price_ratio'] = data['price_bid_local'] / data['price_start_local']
-
-# Выбираем доступные признаки
-available_features = []
-for feature in ['price_start_local', 'price_bid_local', 'price_ratio', 
-                'driver_rating', 'distance_km', 'order_hour']:
-    if feature in data.columns:
-        available_features.append(feature)
-    else:
-        print(f"⚠️ Признак {feature} отсутствует в данных")
-
-print(f"📊 Используется {len(available_features)} признаков: {available_features}")
-
-# Удаляем пропуски
-data_clean = data[available_features + ['is_done']].dropna()
-print(f"📈 После очистки: {len(data_clean)} записей")
-
-if len(data_clean) == 0:
-    print("❌ Нет данных для обучения после очистки!")
-    sys.exit(1)
-
-X = data_clean[available_features]
-y = data_clean['is_done']
-
-# Разделяем на обучающую и тестовую выборки
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, random_state=42, stratify=y
-)
-
-print(f"📊 Разделение данных:")
-print(f"   - Обучающая выборка: {X_train.shape[0]} записей")
-print(f"   - Тестовая выборка: {X_test.shape[0]} записей")
-print(f"   - Принято заказов: {y_train.mean():.1%}")
-
-# Обучаем модель
-print("🎯 Обучение модели RandomForest...")
-
-try:
-    model = RandomForestClassifier(
-        n_estimators=100,
-        max_depth=10,
-        min_samples_split=20,
-        min_samples_leaf=10,
-        random_state=42,
-        n_jobs=-1
-    )
+# Движки обучения: название -> описание для вывода
+ENGINES = {
+    'forest': 'RandomForest',
+    'hgb': 'HistGradientBoosting'
+}
+
+# Гиперпараметры движков по умолчанию
+FOREST_PARAMS = {
+    'n_estimators': 100,
+    'max_depth': 10,
+    'min_samples_split': 20,
+    'min_samples_leaf': 10,
+    'random_state': 42,
+    'n_jobs': -1
+}
+
+BOOSTING_PARAMS = {
+    'max_iter': 500,
+    'learning_rate': 0.1,
+    'max_leaf_nodes': 31,
+    'min_samples_leaf': 20,
+    'early_stopping': True,
+    'validation_fraction': 0.1,
+    'n_iter_no_change': 20,
+    'random_state': 42
+}
+
+# Сведения о модели, которые описывают подобранную tuning.py конфигурацию
+TUNED_KEYS = ('engine', 'params', 'cv_auc', 'latency_ms')
+
+def tuned_config(model_path: str = MODEL_PATH) -> dict:
+    """
+    Конфигурация, подобранная tuning.py, из сведений о текущей модели.
+
+    Переобучение с ней сохраняет ее в сведениях новой модели, поэтому
+    повторный запуск model.py не заменяет победителя поиска моделью с
+    параметрами по умолчанию. Пустой словарь, если подбора не было.
+    """
+    meta = read_model_meta(model_path)
+    if 'params' not in meta:
+        return {}
+    return {'engine': 'forest', **{key: meta[key] for key in TUNED_KEYS if key in meta}}
+
+def prepare_features(data: pd.DataFrame, verbose: bool = True):
+    """Создание производных признаков и выбор доступных"""
+    # Создаем производные признаки если их нет (правила - в features.DERIVED)
+    for feature in DERIVED:
+        if feature not in data.columns:
+            data[feature] = feature_values(data, feature)
+
+    # Выбираем доступные признаки
+    available_features = []
+    for feature in FEATURES:
+        if feature in data.columns:
+            available_features.append(feature)
+        elif verbose:
+            print(f"⚠️ Признак {feature} отсутствует в данных")
+
+    return data, available_features
+
+def train_model(X_train, y_train, engine: str = 'forest', params: dict = None):
+    """
+    Обучение модели выбранным движком (см. ENGINES).
+
+    params переопределяет гиперпараметры по умолчанию (FOREST_PARAMS
+    или BOOSTING_PARAMS), например лучшие найденные tuning.py.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Неизвестный движок: {engine}, доступны: {list(ENGINES)}")
+    if engine == 'hgb':
+        return train_boosting(X_train, y_train, params)
+
+    from sklearn.ensemble import RandomForestClassifier
+
+    model = RandomForestClassifier(**{**FOREST_PARAMS, **(params or {})})
+    model.fit(X_train, y_train)
+    return model
+
+def train_boosting(X_train, y_train, params: dict = None):
+    """
+    Обучение HistGradientBoosting с ранней остановкой.
 
+    Признаки разбиваются на гистограммы (до 255 корзин), поэтому обучение
+    почти линейно по числу строк, а число итераций подбирается по
+    отложенной доле обучающей выборки.
+    """
+    from sklearn.ensemble import HistGradientBoostingClassifier
+
+    model = HistGradientBoostingClassifier(**{**BOOSTING_PARAMS, **(params or {})})
     model.fit(X_train, y_train)
-    print("✅ Модель успешно обучена")
-except Exception as e:
-    print(f"❌ Ошибка обучения модели: {e}")
-    sys.exit(1)
-
-# Предсказания
-y_pred = model.predict(X_test)
-y_pred_proba = model.predict_proba(X_test)[:, 1]
-
-# Оценка модели
-accuracy = accuracy_score(y_test, y_pred)
-roc_auc = roc_auc_score(y_test, y_pred_proba)
-
-print("\n📊 Результаты модели:")
-print(f"   - Accuracy: {accuracy:.3f}")
-print(f"   - ROC-AUC: {roc_auc:.3f}")
-
-# Детальный отчет
-print("\n📋 Детальный отчет:")
-print(classification_report(y_test, y_pred, target_names=['Отклонен', 'Принят']))
-
-# Важность признаков
-feature_importance = pd.DataFrame({
-    'feature': available_features,
-    'importance': model.feature_importances_
-}).sort_values('importance', ascending=False)
-
-print("\n🔝 Важность признаков:")
-for _, row in feature_importance.iterrows():
-    print(f"   - {row['feature']}: {row['importance']:.3f}")
-
-# Визуализация важности признаков
-plt.figure(figsize=(10, 6))
-sns.barplot(data=feature_importance, x='importance', y='feature')
-plt.title('Важность признаков в модели')
-plt.xlabel('Важность')
-plt.tight_layout()
-
-# Сохраняем график
-feature_importance_path = os.path.join(output_dir, 'feature_importance.png')
-plt.savefig(feature_importance_path, dpi=150, bbox_inches='tight')
-print(f"✅ График важности признаков сохранен: {feature_importance_path}")
-
-# Сохраняем модель
-model_path = os.path.join(models_dir, 'acceptance_model.joblib')
-joblib.dump(model, model_path)
-print(f"💾 Модель сохранена: {model_path}")
-
-# Проверяем сохранение
-if os.path.exists(model_path):
-    file_size = os.path.getsize(model_path)
-    print(f"✅ Модель успешно сохранена, размер: {file_size} байт")
-else:
-    print("❌ Модель не сохранена!")
-
-# Демонстрация работы модели
-print("\n🎪 Демонстрация работы модели:")
-
-def predict_acceptance_probability(features_dict):
+    return model
+
+def plot_feature_importance(feature_importance: pd.DataFrame, output_path: str):
+    """Визуализация важности признаков"""
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    plt.figure(figsize=(10, 6))
+    sns.barplot(data=feature_importance, x='importance', y='feature')
+    plt.title('Важность признаков в модели')
+    plt.xlabel('Важность')
+    plt.tight_layout()
+
+    # Сохраняем график
+    plt.savefig(output_path, dpi=150, bbox_inches='tight')
+    print(f"✅ График важности признаков сохранен: {output_path}")
+
+def predict_acceptance_probability(model, features_dict, available_features):
     """Предсказание вероятности принятия заказа"""
     try:
-        # Создаем DataFrame с правильным порядком признаков
-        input_data = pd.DataFrame([features_dict])[available_features]
+        # Признаки в порядке обучения, производные и пропуски - как при обучении
+        input_data = build_frame(features_dict, available_features)
         probability = model.predict_proba(input_data)[0, 1]
         return probability
     except Exception as e:
         print(f"❌ Ошибка предсказания: {e}")
         return 0.5
 
-# Примеры предсказаний
-examples = [
-    {
-        'price_start_local': 300,
-        'price_bid_local': 320,
-        'price_ratio': 320/300,
-        'driver_rating': 4.8,
-        'distance_km': 5.0,
-        'order_hour': 18
-    },
-    {
-        'price_start_local': 300,
-        'price_bid_local': 400,
-        'price_ratio': 400/300,
-        'driver_rating': 4.2,
-        'distance_km': 15.0,
-        'order_hour': 3
-    }
-]
-
-for i, example in enumerate(examples, 1):
-    # Проверяем, что все признаки присутствуют
-    missing_features = [f for f in available_features if f not in example]
-    if missing_features:
-        print(f"⚠️ В примере {i} отсутствуют признаки: {missing_features}")
-        continue
-        
-    prob = predict_acceptance_probability(example)
-    print(f"   Пример {i}:")
-    print(f"      - Базовая цена: {example['price_start_local']}₽")
-    print(f"      - Цена бида: {example['price_bid_local']}₽")
-    print(f"      - Надбавка: {((example['price_ratio']-1)*100):.1f}%")
-    print(f"      - Рейтинг водителя: {example['driver_rating']}")
-    print(f"      - Вероятность принятия: {prob:.1%}")
-
-print("\n🎉 Обучение модели завершено!")
-print("🚀 Теперь можно запустить оптимизацию цены:")
-print("   python src/optimization.py")
-
-# Показываем график в конце
-plt.show()
\ No newline at end of file
+def main():
+    import argparse
+    from sklearn.model_selection import train_test_split
+    from sklearn.metrics import classification_report, roc_auc_score, accuracy_score
+    import matplotlib.pyplot as plt
+
+    parser = argparse.ArgumentParser(description="Обучение модели принятия заказа")
+    parser.add_argument('--engine', choices=list(ENGINES), default=None,
+                        help="По умолчанию - движок, подобранный tuning.py, иначе forest")
+    parser.add_argument('--default-params', action='store_true',
+                        help="Не использовать параметры, подобранные tuning.py")
+    args = parser.parse_args()
+
+    print("🤖 Запуск обучения ML-модели...")
+
+    # Создаем папки если их нет
+    os.makedirs(data_dir, exist_ok=True)
+    os.makedirs(models_dir, exist_ok=True)
+    os.makedirs(output_dir, exist_ok=True)
+
+    print(f"📁 Корень проекта: {project_root}")
+    print(f"📁 Папка data: {data_dir}")
+    print(f"📁 Папка models: {models_dir}")
+
+    # Проверяем существование данных
+    data_path = os.path.join(data_dir, 'train.csv')
+    if not os.path.exists(data_path):
+        print(f"❌ Файл {data_path} не найден!")
+        print("💡 Сначала запустите: python src/analysis.py")
+        sys.exit(1)
+
+    try:
+        # Загружаем данные
+        print("📥 Загрузка данных...")
+        data = load_dataset(data_path, INPUT_COLUMNS + ['is_done'])
+        print(f"✅ Данные загружены: {len(data)} записей, {len(data.columns)} колонок")
+        print(f"📊 Колонки: {list(data.columns)}")
+    except Exception as e:
+        print(f"❌ Ошибка загрузки данных: {e}")
+        sys.exit(1)
+
+    # Проверяем целевую переменную
+    if 'is_done' not in data.columns:
+        print("❌ В данных нет колонки 'is_done' (целевая переменная)")
+        sys.exit(1)
+
+    # Предобработка данных
+    print("🔧 Подготовка данных...")
+    data, available_features = prepare_features(data)
+
+    print(f"📊 Используется {len(available_features)} признаков: {available_features}")
+
+    # Удаляем пропуски
+    data_clean = data[available_features + ['is_done']].dropna()
+    print(f"📈 После очистки: {len(data_clean)} записей")
+
+    if len(data_clean) == 0:
+        print("❌ Нет данных для обучения после очистки!")
+        sys.exit(1)
+
+    # Та же float32 матрица признаков, что при оценке и оптимизации цены
+    X = build_frame(data_clean, available_features)
+    y = data_clean['is_done']
+
+    # Разделяем на обучающую и тестовую выборки
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=42, stratify=y
+    )
+
+    print(f"📊 Разделение данных:")
+    print(f"   - Обучающая выборка: {X_train.shape[0]} записей")
+    print(f"   - Тестовая выборка: {X_test.shape[0]} записей")
+    print(f"   - Принято заказов: {y_train.mean():.1%}")
+
+    # Подобранные tuning.py параметры важнее параметров по умолчанию
+    tuned = {} if args.default_params else tuned_config(MODEL_PATH)
+    engine = args.engine or tuned.get('engine', 'forest')
+    if tuned and tuned['engine'] != engine:
+        print(f"⚠️ Параметры tuning.py подобраны для {ENGINES[tuned['engine']]}, используем параметры по умолчанию")
+        tuned = {}
+    elif tuned:
+        print(f"🔧 Параметры, подобранные tuning.py: {json.dumps(tuned['params'])}")
+
+    # Обучаем модель
+    print(f"🎯 Обучение модели {ENGINES[engine]}...")
+
+    try:
+        model = train_model(X_train, y_train, engine, tuned.get('params'))
+        print("✅ Модель успешно обучена")
+    except Exception as e:
+        print(f"❌ Ошибка обучения модели: {e}")
+        sys.exit(1)
+
+    # Предсказания
+    y_pred = model.predict(X_test)
+    y_pred_proba = model.predict_proba(X_test)[:, 1]
+
+    # Оценка модели
+    accuracy = accuracy_score(y_test, y_pred)
+    roc_auc = roc_auc_score(y_test, y_pred_proba)
+
+    print("\n📊 Результаты модели:")
+    print(f"   - Accuracy: {accuracy:.3f}")
+    print(f"   - ROC-AUC: {roc_auc:.3f}")
+
+    # Детальный отчет
+    print("\n📋 Детальный отчет:")
+    print(classification_report(y_test, y_pred, target_names=['Отклонен', 'Принят']))
+
+    # Важность признаков (у бустинга встроенной оценки нет)
+    if hasattr(model, 'feature_importances_'):
+        feature_importance = pd.DataFrame({
+            'feature': available_features,
+            'importance': model.feature_importances_
+        }).sort_values('importance', ascending=False)
+
+        print("\n🔝 Важность признаков:")
+        for _, row in feature_importance.iterrows():
+            print(f"   - {row['feature']}: {row['importance']:.3f}")
+
+        # Визуализация важности признаков
+        feature_importance_path = os.path.join(output_dir, 'feature_importance.png')
+        plot_feature_importance(feature_importance, feature_importance_path)
+    else:
+        print(f"\n🔁 Итераций бустинга после ранней остановки: {model.n_iter_}")
+
+    # Сохраняем модель
+    model_path = MODEL_PATH
+    # Все строки train.csv учтены: дообучение возьмет только новые (см. incremental.py)
+    save_model(model, {**tuned, 'engine': engine, 'trained_rows': len(data)}, model_path)
+    print(f"💾 Модель сохранена: {model_path}")
+
+    # Проверяем сохранение
+    if os.path.exists(model_path):
+        file_size = os.path.getsize(model_path)
+        print(f"✅ Модель успешно сохранена, размер: {file_size} байт")
+    else:
+        print("❌ Модель не сохранена!")
+
+    # Демонстрация работы модели
+    print("\n🎪 Демонстрация работы модели:")
+
+    # Примеры предсказаний
+    examples = [
+        {
+            'price_start_local': 300,
+            'price_bid_local': 320,
+            'price_ratio': 320/300,
+            'driver_rating': 4.8,
+            'distance_km': 5.0,
+            'order_hour': 18
+        },
+        {
+            'price_start_local': 300,
+            'price_bid_local': 400,
+            'price_ratio': 400/300,
+            'driver_rating': 4.2,
+            'distance_km': 15.0,
+            'order_hour': 3
+        }
+    ]
+
+    for i, example in enumerate(examples, 1):
+        # Проверяем, что все признаки присутствуют
+        missing_features = [f for f in available_features if f not in example]
+        if missing_features:
+            print(f"⚠️ В примере {i} отсутствуют признаки: {missing_features}")
+            continue
+
+        prob = predict_acceptance_probability(model, example, available_features)
+        print(f"   Пример {i}:")
+        print(f"      - Базовая цена: {example['price_start_local']}₽")
+        print(f"      - Цена бида: {example['price_bid_local']}₽")
+        print(f"      - Надбавка: {((example['price_ratio']-1)*100):.1f}%")
+        print(f"      - Рейтинг водителя: {example['driver_rating']}")
+        print(f"      - Вероятность принятия: {prob:.1%}")
+
+    print("\n🎉 Обучение модели завершено!")
+    print("🚀 Теперь можно запустить оптимизацию цены:")
+    print("   python src/optimization.py")
+
+    # Показываем график в конце
+    plt.show()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import json
+import os
+import threading
+
+# Получаем абсолютные пути
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+models_dir = os.path.join(project_root, 'models')
+MODEL_PATH = os.path.join(models_dir, 'acceptance_model.joblib')
+COMPILED_PATH = os.path.join(models_dir, 'acceptance_model.forest')
+
+# Загруженные модели процесса по (путь, mmap_mode)
+_models = {}
+_lock = threading.Lock()
+
+
+def load_model(path: str = MODEL_PATH, mmap_mode=None, reload: bool = False):
+    """
+    Общая ленивая загрузка модели, безопасная для потоков.
+
+    Модель читается с диска один раз на процесс, следующие вызовы
+    возвращают тот же объект. mmap_mode='r' отображает массивы модели
+    в память, и рабочие процессы делят одни и те же страницы.
+    reload=True перечитывает файл (например, после переобучения).
+    """
+    key = (os.path.abspath(path), mmap_mode)
+    model = _models.get(key)
+    if model is not None and not reload:
+        return model
+
+    with _lock:
+        model = _models.get(key)
+        if model is None or reload:
+            if not os.path.exists(path):
+                raise FileNotFoundError(
+                    f"Модель не найдена: {path}. Сначала запустите: python src/model.py"
+                )
+            import joblib
+            print(f"📥 Загрузка модели: {path}")
+            model = joblib.load(path, mmap_mode=mmap_mode)
+            _models[key] = model
+    return model
+
+
+def clear_models():
+    """Сброс загруженных моделей"""
+    with _lock:
+        _models.clear()
+
+
+def compiled_dir(model_path: str = MODEL_PATH) -> str:
+    """Папка скомпилированного леса рядом с .joblib (у каждой модели своя)"""
+    return os.path.splitext(model_path)[0] + '.forest'
+
+
+def meta_path(model_path: str = MODEL_PATH) -> str:
+    """Файл сведений о модели рядом с .joblib: сколько строк она видела, история обновлений"""
+    return os.path.splitext(model_path)[0] + '.json'
+
+
+def read_model_meta(model_path: str = MODEL_PATH) -> dict:
+    """Сведения о модели (пустой словарь, если файла нет)"""
+    path = meta_path(model_path)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_model_meta(meta: dict, model_path: str = MODEL_PATH):
+    """Сохранение сведений о модели рядом с .joblib"""
+    with open(meta_path(model_path), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2, ensure_ascii=False)
+
+
+def save_model(model, meta: dict, model_path: str = MODEL_PATH):
+    """
+    Сохранение модели и сведений о ней (см. write_model_meta).
+
+    Число деревьев (итераций бустинга) записывается по самой модели:
+    по нему incremental.py считает добавленные деревья.
+    """
+    import joblib
+    joblib.dump(model, model_path)
+    n_trees = len(model.estimators_) if hasattr(model, 'estimators_') else model.n_iter_
+    write_model_meta({**meta, 'n_trees': n_trees, 'updates': meta.get('updates', [])}, model_path)
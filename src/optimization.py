@@ -1,12 +1,15 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import joblib
 import os
-import sys
-from typing import Dict, Any
-
-print("💰 Запуск оптимизации цены...")
+from typing import Dict, Any, Optional
+from search_strategies import SEARCH_STRATEGIES
+from tree_engine import CompiledForest
+from model_loader import load_model, MODEL_PATH
+from features import FEATURES, FEATURE_DEFAULTS, build_matrix, feature_values, model_input, order_columns
+from exact_pricing import PRICE_FEATURES, price_step_function
+from acceptance_cube import AcceptanceCube, CUBE_PATH
+from markup_table import MarkupTable, TABLE_PATH
+import metrics
 
 # Получаем абсолютные пути
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -14,122 +17,383 @@ project_root = os.path.dirname(current_dir)
 models_dir = os.path.join(project_root, 'models')
 output_dir = os.path.join(project_root, 'output')
 
-# Создаем папки если их нет
-os.makedirs(output_dir, exist_ok=True)
-
-print(f"📁 Корень проекта: {project_root}")
-print(f"📁 Папка models: {models_dir}")
-print(f"📁 Папка output: {output_dir}")
-
-# Проверяем существование модели
-model_path = os.path.join(models_dir, 'acceptance_model.joblib')
-if not os.path.exists(model_path):
-    print(f"❌ Модель не найдена: {model_path}")
-    print("💡 Сначала запустите: python src/model.py")
-    sys.exit(1)
-
-try:
-    # Загружаем модель
-    print("📥 Загрузка модели...")
-    model = joblib.load(model_path)
-    print("✅ Модель успешно загружена")
-except Exception as e:
-    print(f"❌ Ошибка загрузки модели: {e}")
-    sys.exit(1)
-
 class PriceOptimizer:
-    def __init__(self, model):
-        self.model = model
-        # Определяем признаки, которые использует модель
-        self.features = [
-            'price_start_local', 'price_bid_local', 'price_ratio',
-            'driver_rating', 'distance_km', 'order_hour'
-        ]
-        print(f"🔧 Оптимизатор инициализирован с {len(self.features)} признаками")
+    def __init__(self, model=None, compiled: bool = True,
+                 model_path: str = MODEL_PATH, mmap_mode: Optional[str] = None,
+                 cube: Optional[AcceptanceCube] = None, cube_path: Optional[str] = CUBE_PATH,
+                 table: Optional[MarkupTable] = None, table_path: Optional[str] = TABLE_PATH,
+                 verbose: bool = True):
+        """
+        Если model не передана, она загружается при первом использовании
+        через общий model_loader.load_model(model_path, mmap_mode).
+        
+        Куб долей принятия (cube или файл cube_path) - эмпирическая оценка
+        вероятности для method='cube' и запасной вариант, когда модель
+        недоступна.
+        
+        Таблица кривых вероятности (table или файл table_path, см.
+        markup_table) - источник вероятностей для method='table' без модели.
+        
+        verbose=False отключает сообщения о ходе расчета на каждый вызов
+        (для сервисов); ошибки печатаются всегда.
+        """
+        self.compiled = compiled
+        self.verbose = verbose
+        self.model_path = model_path
+        self.mmap_mode = mmap_mode
+        self._model = None
+        # Файл, из которого загружена модель (None - модель передана напрямую)
+        self._model_file = None
+        # {'stamp': (размер, время изменения) или None} файла модели при неудачной загрузке
+        self._load_failure = None
+        if model is not None:
+            self.set_model(model)
+        self.cube_path = cube_path
+        self._cube = cube
+        self.table_path = table_path
+        self._table = table
+        # Значения по умолчанию для отсутствующих признаков
+        self.default_values = dict(FEATURE_DEFAULTS)
+        # Порог вероятности для безопасной цены
+        self.safe_probability = 0.7
     
-    def predict_probability(self, order_features: Dict[str, Any], bid_price: float) -> float:
-        """Предсказание вероятности принятия для конкретной цены"""
+    def _ensure_model(self):
+        """Ленивая загрузка модели при первом обращении"""
+        if self._model is None:
+            self.set_model(load_model(self.model_path, mmap_mode=self.mmap_mode))
+            self._model_file = self.model_path
+    
+    def reload_model(self, model_path: Optional[str] = None):
+        """Перечитывание модели с диска (после переобучения) с тем же mmap_mode"""
+        if model_path is not None:
+            self.model_path = model_path
+        self.set_model(load_model(self.model_path, mmap_mode=self.mmap_mode, reload=True))
+        self._model_file = self.model_path
+    
+    @property
+    def model_file(self) -> Optional[str]:
+        """
+        Файл модели: model_path, если модель загружена (или будет лениво
+        загружена) из него, и None, если модель передана в конструктор
+        или set_model.
+        """
+        if self._model is None or self._model_file is not None:
+            return self.model_path
+        return None
+    
+    @property
+    def model(self):
+        """Модель принятия заказа"""
+        self._ensure_model()
+        return self._model
+    
+    @property
+    def cube(self):
+        """Куб долей принятия или None, если его нет"""
+        if self._cube is None and self.cube_path and os.path.exists(self.cube_path):
+            self._cube = AcceptanceCube.load(self.cube_path)
+        return self._cube
+    
+    @property
+    def table(self):
+        """Таблица кривых вероятности (загружается с диска при первом обращении)"""
+        if self._table is None and self.table_path and os.path.exists(self.table_path):
+            self._table = MarkupTable.load(self.table_path)
+        return self._table
+    
+    def _model_stamp(self):
         try:
-            # Копируем и обновляем признаки
-            features = order_features.copy()
-            features['price_bid_local'] = bid_price
-            features['price_ratio'] = bid_price / features['price_start_local']
-            
-            # Создаем DataFrame с правильным порядком признаков
-            # Используем только те признаки, которые есть в features
-            input_data = {}
-            for feature in self.features:
-                if feature in features:
-                    input_data[feature] = [features[feature]]
-                else:
-                    print(f"⚠️ Признак {feature} отсутствует, используем значение по умолчанию")
-                    # Значения по умолчанию
-                    if feature == 'driver_rating':
-                        input_data[feature] = [4.5]
-                    elif feature == 'distance_km':
-                        input_data[feature] = [5.0]
-                    elif feature == 'order_hour':
-                        input_data[feature] = [12]
-            
-            input_df = pd.DataFrame(input_data)
-            
-            # Убедимся, что порядок признаков правильный
-            input_df = input_df[self.features]
-            
-            probability = self.model.predict_proba(input_df)[0, 1]
-            return probability
+            stat = os.stat(self.model_path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+    
+    def model_available(self) -> bool:
+        """
+        Загружается ли модель (без исключения).
+        
+        Неудачная загрузка запоминается: пока файл модели не изменится
+        (появится, будет перезаписан), повторных попыток и сообщений нет.
+        """
+        if self._model is not None:
+            return True
+        stamp = self._model_stamp()
+        if self._load_failure is not None and self._load_failure['stamp'] == stamp:
+            return False
+        try:
+            self._ensure_model()
+        except Exception as e:
+            print(f"❌ Модель недоступна: {e}")
+            if self.cube is not None:
+                print("⚠️ Используем эмпирические доли принятия из куба")
+            self._load_failure = {'stamp': stamp}
+            return False
+        self._load_failure = None
+        return True
+    
+    def _use_cube(self, method: str) -> bool:
+        """Оценивать ли вероятности по кубу: по запросу или если модели нет, а куб есть"""
+        if method == 'table':
+            if self.table is None:
+                raise ValueError(f"Нет таблицы кривых вероятности: {self.table_path}")
+            return False
+        if method == 'cube':
+            if self.cube is None:
+                raise ValueError(f"Нет куба долей принятия: {self.cube_path}")
+            return True
+        if not self.model_available() and self.cube is not None:
+            metrics.count('optimizer.cube_fallbacks')
+            return True
+        return False
+    
+    def _fallback_probabilities(self, order_features: Dict[str, Any], bid_prices: np.ndarray) -> np.ndarray:
+        """Вероятности при ошибке модели: по кубу, если он есть, иначе 0.5"""
+        if self.cube is not None:
+            return self.cube.probabilities(order_features, bid_prices, self.default_values)
+        return np.full(np.shape(bid_prices), 0.5)
+    
+    @property
+    def features(self):
+        """Признаки модели в порядке обучения"""
+        self._ensure_model()
+        return self._features
+    
+    @property
+    def compiled_forest(self):
+        """Скомпилированный лес или None, если модель не RandomForest"""
+        self._ensure_model()
+        return self._compiled_forest
+    
+    def set_model(self, model):
+        """Установка (или замена) модели принятия заказа"""
+        # Порядок признаков берем из модели, если она обучалась на DataFrame
+        self._features = list(getattr(model, 'feature_names_in_', FEATURES))
+        
+        # RandomForest компилируем в массивы узлов для быстрого инференса без sklearn
+        self._compiled_forest = None
+        if self.compiled and hasattr(model, 'estimators_'):
+            self._compiled_forest = CompiledForest.from_model(model)
+        self._model = model
+        self._model_file = None
+        if self.verbose:
+            print(f"🔧 Оптимизатор инициализирован с {len(self._features)} признаками")
+    
+    def _grid_matrix(self, order_columns: Dict[str, Any], bid_prices: np.ndarray) -> np.ndarray:
+        """Матрица признаков (заказы × цены, признаки), строки заказа идут подряд"""
+        with metrics.timer('optimizer.features'):
+            return build_matrix(order_columns, self.features, bid_prices, self.default_values)
+    
+    def _feature_matrix(self, order_features: Dict[str, Any], bid_prices: np.ndarray) -> np.ndarray:
+        """Матрица признаков (цены × признаки) для одного заказа"""
+        return self._grid_matrix(order_features, np.asarray(bid_prices, dtype=float).reshape(1, -1))
+    
+    def _select_prices(self, probabilities: np.ndarray, expected_revenue: np.ndarray):
+        """Индексы оптимальной и безопасной цены по каждой строке сетки"""
+        optimal_idx = np.argmax(expected_revenue, axis=1)
+        
+        # Безопасная цена: максимум дохода среди цен с высокой вероятностью
+        safe_mask = probabilities >= self.safe_probability
+        safe_idx = np.argmax(np.where(safe_mask, expected_revenue, -np.inf), axis=1)
+        safe_idx = np.where(safe_mask.any(axis=1), safe_idx, optimal_idx)
+        
+        return optimal_idx, safe_idx
+    
+    def _predict_proba(self, matrix: np.ndarray) -> np.ndarray:
+        """Вероятность принятия для каждой строки матрицы признаков"""
+        metrics.count('optimizer.model_calls')
+        metrics.count('optimizer.model_evaluations', len(matrix))
+        with metrics.timer('optimizer.predict'):
+            # Скомпилированный лес при любом размере матрицы (порциями chunk_size):
+            # многопоточный sklearn складывает деревья в порядке завершения потоков,
+            # и вероятности перестали бы совпадать побитово
+            if self.compiled_forest is not None:
+                return self.compiled_forest.predict_proba(matrix)[:, 1]
+            # Один DataFrame на всю матрицу, чтобы сохранить имена признаков модели
+            return self.model.predict_proba(model_input(self.model, matrix, self.features))[:, 1]
+    
+    def predict_probabilities(self, order_features: Dict[str, Any], bid_prices: np.ndarray) -> np.ndarray:
+        """Вероятности принятия для набора цен одним вызовом модели"""
+        try:
+            return self._predict_proba(self._feature_matrix(order_features, bid_prices))
         except Exception as e:
             print(f"❌ Ошибка предсказания: {e}")
-            return 0.5
+            return self._fallback_probabilities(order_features, np.asarray(bid_prices, dtype=float))
+    
+    def predict_probability(self, order_features: Dict[str, Any], bid_price: float) -> float:
+        """Предсказание вероятности принятия для конкретной цены"""
+        return float(self.predict_probabilities(order_features, [bid_price])[0])
     
+    @metrics.timed('optimizer.find_optimal_price')
     def find_optimal_price(self, order_features: Dict[str, Any], 
                           min_markup: float = 0.0, 
                           max_markup: float = 0.5, 
-                          steps: int = 50) -> Dict[str, Any]:
-        """Находит оптимальную цену для максимизации ожидаемого дохода"""
+                          steps: int = 50,
+                          method: str = 'grid',
+                          **search_options) -> Dict[str, Any]:
+        """
+        Находит оптимальную цену для максимизации ожидаемого дохода.
+        
+        method выбирает стратегию поиска: 'grid' (равномерная сетка из steps
+        надбавок), 'coarse_to_fine', 'golden' (см. search_strategies, параметры
+        передаются через search_options, например tolerance в рублях; золотое
+        сечение на ступенчатой вероятности леса может найти локальный максимум) или
+        'exact' - точная ступенчатая функция вероятности по деревьям RandomForest,
+        'cube' - сетка с эмпирическими долями принятия из куба (без модели),
+        'table' - сетка с вероятностями из предрасчитанной таблицы (без модели).
+        Если модель недоступна, а куб есть, используется 'cube'.
+        """
         
         base_price = order_features['price_start_local']
+        price_min = base_price * (1 + min_markup)
+        price_max = base_price * (1 + max_markup)
         
-        # Генерируем варианты цен
-        markups = np.linspace(min_markup, max_markup, steps)
-        price_options = [base_price * (1 + markup) for markup in markups]
+        if self.verbose:
+            print("🔍 Расчет оптимальной цены...")
+        if self._use_cube(method):
+            method = 'cube'
+        elif method == 'exact' and not hasattr(self.model, 'estimators_'):
+            if self.verbose:
+                print("⚠️ Точный режим доступен только для RandomForest, используем сетку")
+            method = 'grid'
         
-        results = []
+        evaluations = {'prices': 0, 'model_calls': 0}
+        metrics.count('optimizer.recommendations')
         
-        print("🔍 Расчет оптимальной цены...")
-        for i, price in enumerate(price_options):
-            if i % 10 == 0:  # Прогресс каждые 10 шагов
-                print(f"   ...расчет {i+1}/{len(price_options)}")
-                
-            prob = self.predict_probability(order_features, price)
-            expected_revenue = price * prob
+        if method in ('cube', 'table'):
+            source = self.cube if method == 'cube' else self.table
+            prices = np.linspace(price_min, price_max, steps)
+            probabilities = source.probabilities(order_features, prices, self.default_values)
+            evaluations['prices'] += len(prices)
+        elif method == 'exact':
+            features = {feature: float(feature_values(order_features, feature, self.default_values))
+                        for feature in self.features if feature not in PRICE_FEATURES}
+            features['price_start_local'] = base_price
+            feature_names = list(getattr(self.model, 'feature_names_in_', self.features))
+            with metrics.timer('optimizer.exact_steps'):
+                prices, probabilities = price_step_function(
+                    self.model, features, feature_names, price_min, price_max
+                )
+        elif method in SEARCH_STRATEGIES:
+            def evaluate(bid_prices):
+                evaluations['prices'] += len(bid_prices)
+                evaluations['model_calls'] += 1
+                return self.predict_probabilities(order_features, bid_prices)
             
-            results.append({
-                'price': price,
-                'probability': prob,
+            if method == 'grid':
+                search_options.setdefault('steps', steps)
+            prices, probabilities = SEARCH_STRATEGIES[method](
+                evaluate, price_min, price_max, **search_options
+            )
+            
+            # Уточняющие стратегии могут оценить одну цену дважды
+            prices, unique_idx = np.unique(prices, return_index=True)
+            probabilities = probabilities[unique_idx]
+        else:
+            raise ValueError(f"Неизвестный метод оптимизации: {method}")
+        with metrics.timer('optimizer.results'):
+            markups = prices / base_price - 1
+            expected_revenue = prices * probabilities
+            
+            df_results = pd.DataFrame({
+                'price': prices,
+                'probability': probabilities,
                 'expected_revenue': expected_revenue,
-                'markup_percent': ((price - base_price) / base_price) * 100
+                'markup_percent': markups * 100
             })
+            
+            # Находим оптимальную и безопасную цену
+            optimal_idx, safe_idx = self._select_prices(probabilities.reshape(1, -1),
+                                                        expected_revenue.reshape(1, -1))
+            optimal_idx, safe_idx = int(optimal_idx[0]), int(safe_idx[0])
+            
+            return {
+                'optimal': df_results.iloc[optimal_idx].to_dict(),
+                'safe': df_results.iloc[safe_idx].to_dict(),
+                'all_options': df_results,
+                'base_price': base_price,
+                'evaluations': evaluations
+            }
+    
+    @metrics.timed('optimizer.optimize_batch')
+    def optimize_batch(self, orders: pd.DataFrame,
+                       min_markup: float = 0.0,
+                       max_markup: float = 0.5,
+                       steps: int = 50,
+                       chunk_size: int = 1000,
+                       method: str = 'grid',
+                       fallback: bool = True) -> pd.DataFrame:
+        """
+        Оптимальная и безопасная цена для каждого заказа из DataFrame.
         
-        df_results = pd.DataFrame(results)
+        Заказы разворачиваются в матрицу (заказы × сетка цен) и оцениваются
+        порциями по chunk_size заказов за один вызов модели. method='cube'
+        (или недоступная модель при наличии куба) - вероятности из куба,
+        method='table' - из предрасчитанной таблицы.
+        При ошибке модели порция получает запасные вероятности (куб или 0.5),
+        а при fallback=False исключение передается вызывающему.
+        """
+        if method not in ('grid', 'cube', 'table'):
+            raise ValueError(f"Неизвестный метод пакетной оптимизации: {method}")
+        source = self.cube if self._use_cube(method) else self.table if method == 'table' else None
+        markups = np.linspace(min_markup, max_markup, steps)
+        base_prices = orders['price_start_local'].to_numpy(dtype=float)
+        columns_by_name = order_columns(orders)
         
-        # Находим оптимальную цену
-        optimal_idx = df_results['expected_revenue'].idxmax()
-        optimal = df_results.loc[optimal_idx]
-        
-        # Находим безопасную цену (высокая вероятность)
-        safe_candidates = df_results[df_results['probability'] >= 0.7]
-        safe = safe_candidates.loc[safe_candidates['expected_revenue'].idxmax()] if len(safe_candidates) > 0 else optimal
-        
-        return {
-            'optimal': optimal.to_dict(),
-            'safe': safe.to_dict() if not safe.empty else None,
-            'all_options': df_results,
-            'base_price': base_price
-        }
+        n_orders = len(orders)
+        columns = {f'{kind}_{name}': np.empty(n_orders)
+                   for kind in ('optimal', 'safe')
+                   for name in ('price', 'probability', 'expected_revenue', 'markup_percent')}
+        
+        if self.verbose:
+            print(f"🔍 Расчет оптимальных цен для {n_orders} заказов...")
+        metrics.count('optimizer.batch_orders', n_orders)
+        for start in range(0, n_orders, chunk_size):
+            stop = min(start + chunk_size, n_orders)
+            prices = base_prices[start:stop, None] * (1 + markups)
+            chunk_columns = {name: values[start:stop] for name, values in columns_by_name.items()}
+            
+            if source is not None:
+                probabilities = source.probabilities(chunk_columns, prices, self.default_values)
+            else:
+                try:
+                    matrix = self._grid_matrix(chunk_columns, prices)
+                    probabilities = self._predict_proba(matrix).reshape(prices.shape)
+                except Exception as e:
+                    if not fallback:
+                        raise
+                    print(f"❌ Ошибка предсказания: {e}")
+                    probabilities = self._fallback_probabilities(chunk_columns, prices)
+            expected_revenue = prices * probabilities
+            
+            rows = np.arange(stop - start)
+            for kind, idx in zip(('optimal', 'safe'), self._select_prices(probabilities, expected_revenue)):
+                columns[f'{kind}_price'][start:stop] = prices[rows, idx]
+                columns[f'{kind}_probability'][start:stop] = probabilities[rows, idx]
+                columns[f'{kind}_expected_revenue'][start:stop] = expected_revenue[rows, idx]
+                columns[f'{kind}_markup_percent'][start:stop] = markups[idx] * 100
+        
+        return pd.DataFrame(columns, index=orders.index)
+    
+    def acceptance_curves(self, orders: pd.DataFrame, markups: np.ndarray,
+                          chunk_size: int = 1000) -> np.ndarray:
+        """Вероятности принятия моделью (заказы × надбавки) порциями по chunk_size заказов"""
+        markups = np.asarray(markups, dtype=float)
+        base_prices = orders['price_start_local'].to_numpy(dtype=float)
+        columns_by_name = order_columns(orders)
+        
+        curves = np.empty((len(orders), len(markups)), dtype=np.float32)
+        for start in range(0, len(orders), chunk_size):
+            stop = min(start + chunk_size, len(orders))
+            prices = base_prices[start:stop, None] * (1 + markups)
+            chunk_columns = {name: values[start:stop] for name, values in columns_by_name.items()}
+            matrix = self._grid_matrix(chunk_columns, prices)
+            curves[start:stop] = self._predict_proba(matrix).reshape(prices.shape)
+        return curves
     
     def plot_optimization(self, optimization_result: Dict[str, Any]):
         """Визуализация результатов оптимизации"""
+        import matplotlib.pyplot as plt
+        
         df = optimization_result['all_options']
         optimal = optimization_result['optimal']
         
@@ -158,6 +422,7 @@ class PriceOptimizer:
         plt.tight_layout()
         
         # Сохраняем график
+        os.makedirs(output_dir, exist_ok=True)
         output_path = os.path.join(output_dir, 'price_optimization.png')
         plt.savefig(output_path, dpi=150, bbox_inches='tight')
         print(f"✅ График оптимизации сохранен: {output_path}")
@@ -166,9 +431,16 @@ class PriceOptimizer:
 
 # Демонстрация работы
 if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+    
+    print("💰 Запуск оптимизации цены...")
+    print(f"📁 Корень проекта: {project_root}")
+    print(f"📁 Папка models: {models_dir}")
+    print(f"📁 Папка output: {output_dir}")
+    
     try:
-        # Инициализируем оптимизатор
-        optimizer = PriceOptimizer(model)
+        # Инициализируем оптимизатор (модель загрузится при первом расчете)
+        optimizer = PriceOptimizer()
         
         # Пример заказа
         sample_order = {
@@ -198,6 +470,12 @@ if __name__ == "__main__":
             print(f"   🔒 Безопасная цена: {result['safe']['price']:.0f}₽")
             print(f"   🛡️  Вероятность принятия: {result['safe']['probability']:.1%}")
         
+        # Эмпирическая оценка по кубу долей принятия (без модели)
+        if optimizer.cube is not None:
+            empirical = optimizer.find_optimal_price(sample_order, method='cube')['optimal']
+            print(f"   🧊 По кубу ({optimizer.cube.rows} заказов): {empirical['price']:.0f}₽, "
+                  f"вероятность {empirical['probability']:.1%}")
+        
         # Визуализация
         print("\n🎨 Создание графика оптимизации...")
         optimizer.plot_optimization(result)
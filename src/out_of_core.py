@@ -0,0 +1,281 @@
+import argparse
+import os
+import resource
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from columnar import iter_chunks
+from features import FEATURES, INPUT_COLUMNS, build_matrix
+from model import prepare_features, train_model, ENGINES, data_dir
+from model_loader import MODEL_PATH, save_model
+
+# Доля памяти сверх базовой, которую планируем занять: остальное - запас на
+# неучтенные копии и фрагментацию
+MEMORY_SAFETY = 0.8
+# Наибольшая доля памяти под порцию данных
+CHUNK_SHARE = 0.2
+# Порция: исходные колонки float64 и их копии при подготовке признаков
+CHUNK_BYTES_PER_ROW = len(INPUT_COLUMNS + ['is_done', 'order_id']) * 8 * 4
+# Память обучения сверх самой выборки, байт на строку: копия признаков и
+# буферы построения дерева (у леса - у каждого параллельного дерева свои).
+# Замерено на 200 тыс. - 800 тыс. строк, с запасом
+FIT_BYTES_PER_ROW = {'forest': 48, 'hgb': 192}
+FOREST_BYTES_PER_ROW_PER_JOB = 40
+# Сама обученная модель (МБ): 100 деревьев глубины 10 - до 2047 узлов по ~80 байт
+MODEL_MB = {'forest': 24, 'hgb': 8}
+# Проверочная выборка меньше обучающей в 4 раза
+VALID_RATIO = 0.25
+
+
+def peak_rss_mb() -> float:
+    """Максимальный объем резидентной памяти процесса (МБ)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def current_rss_mb() -> float:
+    """Текущий объем резидентной памяти процесса (МБ); без /proc - пик"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / 2**20
+    except OSError:
+        return peak_rss_mb()
+
+
+def fit_overhead_per_row(engine: str) -> float:
+    """Оценка памяти sklearn при обучении сверх самой выборки, байт на строку"""
+    if engine == 'forest':
+        return FIT_BYTES_PER_ROW[engine] + FOREST_BYTES_PER_ROW_PER_JOB * (os.cpu_count() or 1)
+    return FIT_BYTES_PER_ROW[engine]
+
+
+def memory_plan(available_mb: float, n_features: int, engine: str, chunk_size: int) -> tuple:
+    """
+    Размер обучающей выборки (строк) и порции из свободной памяти.
+
+    Чтение порциями и обучение идут по очереди, поэтому каждая фаза
+    укладывается в available_mb × MEMORY_SAFETY отдельно: резервуары и
+    порция при чтении, выборка с буферами sklearn при обучении.
+    """
+    budget = available_mb * MEMORY_SAFETY * 2**20
+    chunk_size = max(1000, min(chunk_size, int(budget * CHUNK_SHARE / CHUNK_BYTES_PER_ROW)))
+    reservoir_budget = budget - chunk_size * CHUNK_BYTES_PER_ROW
+    # При выборке из резервуара он и копия выборки в памяти одновременно
+    sample_bytes = n_features * 4 * (2 + VALID_RATIO)
+    fit_bytes = n_features * 4 * (1 + VALID_RATIO) + fit_overhead_per_row(engine)
+    capacity = int(min((budget - MODEL_MB[engine] * 2**20) / fit_bytes,
+                       budget / sample_bytes,
+                       reservoir_budget / (n_features * 4 * (1 + VALID_RATIO))))
+    if capacity < 100:
+        raise MemoryError(f"Свободно {available_mb:.0f} МБ: слишком мало для обучения")
+    return capacity, chunk_size
+
+
+class StratifiedReservoir:
+    """
+    Равномерные выборки фиксированного размера по каждому классу за один проход.
+
+    Память под строки выделяется сразу: capacity строк float32 на все
+    классы, поделенные по долям shares (по умолчанию поровну), и не растет
+    с длиной потока. Когда shares близки к долям классов в потоке, sample
+    возвращает почти все capacity строк.
+    """
+
+    def __init__(self, capacity: int, n_features: int, seed: int = 42, shares: dict = None):
+        shares = shares or {0: 0.5, 1: 0.5}
+        self.capacity = capacity
+        self.capacities = {label: max(int(capacity * share), 1) for label, share in shares.items()}
+        self.rng = np.random.default_rng(seed)
+        self.rows = {label: np.empty((size, n_features), dtype=np.float32)
+                     for label, size in self.capacities.items()}
+        self.seen = {label: 0 for label in self.capacities}
+
+    @property
+    def nbytes(self) -> int:
+        return sum(rows.nbytes for rows in self.rows.values())
+
+    def add(self, X: np.ndarray, y: np.ndarray):
+        """Алгоритм R, векторно по порции: строка с номером i попадает в выборку с вероятностью capacity / (i + 1)"""
+        for label, rows in self.rows.items():
+            capacity = self.capacities[label]
+            X_label = X[y == label]
+            seen = self.seen[label]
+            fill = min(max(capacity - seen, 0), len(X_label))
+            rows[seen:seen + fill] = X_label[:fill]
+
+            positions = np.arange(seen + fill, seen + len(X_label))
+            slots = (self.rng.random(len(positions)) * (positions + 1)).astype(np.int64)
+            keep = slots < capacity
+            # При повторе слота в порции побеждает более поздняя строка, как в последовательном алгоритме
+            rows[slots[keep]] = X_label[fill:][keep]
+            self.seen[label] += len(X_label)
+
+    def sample(self):
+        """Наибольшая выборка (до capacity строк) с долями классов как во всем потоке"""
+        total = sum(self.seen.values())
+        stored = {label: min(self.seen[label], self.capacities[label]) for label in self.rows}
+        # Размер ограничен классом, чей резервуар мал для его доли в потоке
+        size = min([total] + [stored[label] * total / self.seen[label]
+                              for label in self.rows if self.seen[label]])
+        X_parts, y_parts = [], []
+        for label, rows in self.rows.items():
+            n_rows = min(stored[label], int(round(size * self.seen[label] / max(total, 1))))
+            idx = np.sort(self.rng.choice(stored[label], n_rows, replace=False))
+            X_parts.append(rows[idx])
+            y_parts.append(np.full(n_rows, label, dtype=np.int8))
+        return np.concatenate(X_parts), np.concatenate(y_parts)
+
+
+def validation_mask(chunk: pd.DataFrame, offset: int, valid_percent: int) -> np.ndarray:
+    """
+    Разбиение по хешу order_id: заказ всегда попадает в одну и ту же часть,
+    независимо от порядка строк и размера порций. Без order_id хешируется
+    номер строки в файле.
+    """
+    if 'order_id' in chunk.columns:
+        keys = chunk['order_id']
+    else:
+        keys = pd.Series(np.arange(offset, offset + len(chunk)))
+    hashes = pd.util.hash_pandas_object(keys, index=False).to_numpy()
+    return hashes % 100 < valid_percent
+
+
+def train_out_of_core(data_path: str, model_path: str = MODEL_PATH, memory_limit_mb: float = 1024,
+                      valid_percent: int = 20, chunk_size: int = 200000,
+                      max_train_rows: int = None, engine: str = 'forest', seed: int = 42) -> dict:
+    """
+    Обучение на данных больше памяти.
+
+    Файл читается порциями, строки делятся на обучение и проверку по хешу
+    order_id, и каждая часть попадает в стратифицированный резервуар.
+    Размер выборки и порций выводится из memory_limit_mb за вычетом
+    памяти, уже занятой процессом, с учетом памяти обучения (memory_plan),
+    поэтому пик памяти не зависит от длины файла. Модель обучается на
+    выборке из резервуара (не больше max_train_rows строк, если задано).
+
+    Если замеренный пик памяти превышает предел при чтении или обучении,
+    поднимается MemoryError и модель не сохраняется; перед обучением
+    выборка уменьшается, если по текущей памяти обучение не уложится.
+    """
+    # sklearn импортируется до замера базовой памяти: его модули - десятки МБ
+    import sklearn.ensemble  # noqa: F401
+    from sklearn.metrics import roc_auc_score
+
+    def check_peak(stage: str, hint: str):
+        if peak_rss_mb() > memory_limit_mb:
+            raise MemoryError(f"Пик памяти {peak_rss_mb():.0f} МБ превысил предел {memory_limit_mb:.0f} МБ "
+                              f"({stage}): {hint} или увеличьте предел")
+
+    start = time.perf_counter()
+    available_mb = memory_limit_mb - peak_rss_mb()
+    if available_mb <= 0:
+        raise MemoryError(f"Предел {memory_limit_mb} МБ меньше памяти процесса ({peak_rss_mb():.0f} МБ)")
+    capacity, chunk_size = memory_plan(available_mb, len(FEATURES), engine, chunk_size)
+    if max_train_rows is not None:
+        capacity = min(capacity, max_train_rows)
+
+    train_reservoir = valid_reservoir = features = None
+    total_rows = 0
+    for chunk in iter_chunks(data_path, chunk_size, INPUT_COLUMNS + ['is_done', 'order_id']):
+        chunk, available = prepare_features(chunk.copy(), verbose=features is None)
+        valid = validation_mask(chunk, total_rows, valid_percent)
+        total_rows += len(chunk)
+
+        complete = chunk[available + ['is_done']].notna().all(axis=1).to_numpy()
+        y = chunk['is_done'].to_numpy()[complete].astype(np.int8)
+        if features is None:
+            features = available
+            # Резервуары делятся между классами по их долям в первой порции
+            share = float(np.clip(y.mean(), 0.05, 0.95)) if len(y) else 0.5
+            shares = {0: 1 - share, 1: share}
+            train_reservoir = StratifiedReservoir(capacity, len(features), seed, shares)
+            valid_reservoir = StratifiedReservoir(max(int(capacity * VALID_RATIO), 2), len(features),
+                                                  seed + 1, shares)
+            print(f"📦 Порции по {chunk_size} строк, выборка для обучения: до {capacity} строк")
+
+        X = build_matrix(chunk[complete], features)
+        train_reservoir.add(X[~valid[complete]], y[~valid[complete]])
+        valid_reservoir.add(X[valid[complete]], y[valid[complete]])
+        del chunk, X
+        check_peak('чтение порций', 'уменьшите --chunk-size')
+        print(f"   ...прочитано {total_rows} строк, пик памяти {peak_rss_mb():.0f} МБ")
+
+    if features is None:
+        raise ValueError(f"Нет данных: {data_path}")
+
+    train_rows = sum(train_reservoir.seen.values())
+    reservoir_mb = (train_reservoir.nbytes + valid_reservoir.nbytes) / 2**20
+    X_train, y_train = train_reservoir.sample()
+    del train_reservoir
+    X_valid, y_valid = valid_reservoir.sample()
+
+    # Выборка уменьшается, если по текущей памяти обучение не уложится в предел
+    free_bytes = ((memory_limit_mb - current_rss_mb()) * MEMORY_SAFETY - MODEL_MB[engine]) * 2**20
+    fit_rows = int(free_bytes / fit_overhead_per_row(engine))
+    if fit_rows < len(X_train):
+        keep = np.sort(np.random.default_rng(seed).choice(len(X_train), max(fit_rows, 0), replace=False))
+        X_train, y_train = X_train[keep], y_train[keep]
+        print(f"⚠️ Выборка уменьшена до {len(X_train)} строк, чтобы обучение уложилось в предел")
+    if len(X_train) == 0:
+        raise MemoryError(f"Для обучения не осталось памяти в пределе {memory_limit_mb:.0f} МБ")
+
+    print(f"🎯 Обучение {ENGINES[engine]} на выборке {len(X_train)} из {train_rows} строк обучения...")
+    train_start = time.perf_counter()
+    model = train_model(pd.DataFrame(X_train, columns=features, copy=False), y_train, engine)
+    train_time = time.perf_counter() - train_start
+    auc = roc_auc_score(y_valid, model.predict_proba(pd.DataFrame(X_valid, columns=features, copy=False))[:, 1])
+    check_peak('обучение', 'задайте --max-train-rows')
+
+    save_model(model, {'engine': engine, 'trained_rows': total_rows, 'sample_rows': len(X_train)}, model_path)
+
+    report = {
+        'rows': total_rows,
+        'train_rows': train_rows,
+        'valid_rows': sum(valid_reservoir.seen.values()),
+        'sample_rows': len(X_train),
+        'chunk_size': chunk_size,
+        'reservoir_mb': reservoir_mb,
+        'train_seconds': train_time,
+        'total_seconds': time.perf_counter() - start,
+        'auc': auc,
+        'peak_rss_mb': peak_rss_mb(),
+        'memory_limit_mb': memory_limit_mb
+    }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Обучение модели на данных больше памяти")
+    parser.add_argument('--data', default=os.path.join(data_dir, 'train.csv'))
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--engine', choices=list(ENGINES), default='forest')
+    parser.add_argument('--memory-limit-mb', type=float, default=1024)
+    parser.add_argument('--valid-percent', type=int, default=20)
+    parser.add_argument('--chunk-size', type=int, default=200000)
+    parser.add_argument('--max-train-rows', type=int, default=None,
+                        help="Предельный размер обучающей выборки")
+    args = parser.parse_args()
+
+    print(f"🤖 Обучение по порциям, предел памяти {args.memory_limit_mb:.0f} МБ...")
+    try:
+        report = train_out_of_core(args.data, args.model, args.memory_limit_mb, args.valid_percent,
+                                   args.chunk_size, args.max_train_rows, args.engine)
+    except MemoryError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    print(f"💾 Модель сохранена: {args.model}")
+    print("📊 Итоги:")
+    print(f"   - Прочитано строк: {report['rows']} (обучение {report['train_rows']}, "
+          f"проверка {report['valid_rows']})")
+    print(f"   - Выборка для обучения: {report['sample_rows']} строк, "
+          f"резервуары {report['reservoir_mb']:.1f} МБ")
+    print(f"   - ROC-AUC на проверке: {report['auc']:.3f}")
+    print(f"   - Время: обучение {report['train_seconds']:.1f} с, всего {report['total_seconds']:.1f} с")
+    print(f"   - Пик памяти: {report['peak_rss_mb']:.0f} МБ из {report['memory_limit_mb']:.0f} МБ")
+
+
+if __name__ == "__main__":
+    main()
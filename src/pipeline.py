@@ -0,0 +1,249 @@
+import argparse
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# Получаем абсолютные пути
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+STATE_PATH = os.path.join(project_root, 'output', 'pipeline_state.json')
+
+# Этапы пайплайна: скрипт в src, входы и выходы относительно корня проекта.
+# Этап зависит от этапов, чьи выходы входят в его входы
+STAGES = {
+    'analysis': {
+        'script': 'analysis.py',
+        'inputs': [],
+        'outputs': ['data/train.csv', 'data/train.columns', 'output/analysis_results.png',
+                    'output/analysis_aggregates.npz', 'models/acceptance_cube.npz']
+    },
+    'model': {
+        'script': 'model.py',
+        'inputs': ['data/train.csv', 'data/train.columns'],
+        'outputs': ['models/acceptance_model.joblib', 'models/acceptance_model.json']
+    },
+    'optimization': {
+        'script': 'optimization.py',
+        'inputs': ['models/acceptance_model.joblib', 'models/acceptance_cube.npz'],
+        'outputs': ['output/price_optimization.png']
+    },
+    'visualization': {
+        'script': 'visualization.py',
+        'inputs': [],
+        'outputs': ['output/driver_interface.png', 'output/interface.png']
+    },
+}
+
+
+def dependencies(stages: dict) -> dict:
+    """Этапы, от выходов которых зависит каждый этап"""
+    producers = {output: name for name, stage in stages.items() for output in stage['outputs']}
+    return {name: sorted({producers[path] for path in stage['inputs'] if path in producers} - {name})
+            for name, stage in stages.items()}
+
+
+def code_files(script: str) -> list:
+    """Скрипт этапа и все модули src, которые он импортирует (транзитивно)"""
+    seen, pending = set(), [script]
+    while pending:
+        name = pending.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        with open(os.path.join(current_dir, name), encoding='utf-8') as f:
+            tree = ast.parse(f.read())
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                modules = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                modules = [node.module]
+            else:
+                continue
+            for module in modules:
+                path = module.split('.')[0] + '.py'
+                if os.path.exists(os.path.join(current_dir, path)):
+                    pending.append(path)
+    return sorted(seen)
+
+
+class ContentHasher:
+    """
+    SHA-256 файлов и папок с памятью по (размер, время изменения):
+    неизменившийся файл не перечитывается между запусками.
+    """
+
+    def __init__(self, known: dict = None):
+        self.known = dict(known or {})
+
+    def file(self, path: str) -> str:
+        stat = os.stat(path)
+        stamp = [stat.st_size, stat.st_mtime_ns]
+        entry = self.known.get(path)
+        if entry is not None and entry[0] == stamp:
+            return entry[1]
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(2**20), b''):
+                digest.update(block)
+        self.known[path] = [stamp, digest.hexdigest()]
+        return digest.hexdigest()
+
+    def path(self, path: str):
+        """Хеш файла, папки (по именам и хешам файлов) или None, если пути нет"""
+        if os.path.isdir(path):
+            digest = hashlib.sha256()
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    file_path = os.path.join(root, name)
+                    digest.update(os.path.relpath(file_path, path).encode())
+                    digest.update(self.file(file_path).encode())
+            return digest.hexdigest()
+        if os.path.exists(path):
+            return self.file(path)
+        return None
+
+
+def stage_key(stage: dict, hasher: ContentHasher) -> str:
+    """Ключ этапа: хеши кода (скрипт и его модули), входов и интерпретатора"""
+    digest = hashlib.sha256(sys.version.encode())
+    for name in code_files(stage['script']):
+        digest.update(name.encode())
+        digest.update(hasher.file(os.path.join(current_dir, name)).encode())
+    for path in stage['inputs']:
+        digest.update(path.encode())
+        digest.update(str(hasher.path(os.path.join(project_root, path))).encode())
+    return digest.hexdigest()
+
+
+def run_stage(name: str, stage: dict) -> dict:
+    """Запуск скрипта этапа в отдельном процессе (как раньше в run_all.py)"""
+    env = dict(os.environ, MPLBACKEND='Agg')
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, stage['script']], cwd=current_dir, env=env,
+                            capture_output=True, text=True)
+    return {'returncode': result.returncode, 'stdout': result.stdout, 'stderr': result.stderr,
+            'seconds': time.perf_counter() - start}
+
+
+def load_state(path: str = STATE_PATH) -> dict:
+    if not os.path.exists(path):
+        return {'stages': {}, 'files': {}}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(state: dict, path: str = STATE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+
+
+def run_pipeline(stages: dict = None, jobs: int = 2, force: bool = False,
+                 verbose: bool = True, state_path: str = STATE_PATH) -> dict:
+    """
+    Запуск этапов в порядке зависимостей.
+
+    Этап пропускается, если его выходы на месте, а ключ (хеши кода и
+    входов) совпадает с ключом последнего успешного запуска. Ключ
+    считается, когда все зависимости этапа завершены, поэтому этап после
+    перезапущенной, но давшей тот же результат зависимости тоже
+    пропускается. Независимые этапы идут параллельно (до jobs процессов).
+    Если этап упал, зависящие от него не запускаются.
+    Возвращает отчет {этап: {status, seconds}}.
+    """
+    stages = STAGES if stages is None else stages
+    state = load_state(state_path)
+    hasher = ContentHasher(state.get('files'))
+    depends = dependencies(stages)
+    report = {}
+
+    def start(name):
+        stage = stages[name]
+        key = stage_key(stage, hasher)
+        outputs_ready = all(os.path.exists(os.path.join(project_root, path)) for path in stage['outputs'])
+        if not force and outputs_ready and state['stages'].get(name) == key:
+            report[name] = {'status': 'cached', 'seconds': 0.0}
+            print(f"♻️ {name}: входы и код не изменились, пропускаем")
+            return None
+        print(f"🎯 Запуск {name} ({stage['script']})...")
+        return key, executor.submit(run_stage, name, stage)
+
+    running = {}
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        while len(report) < len(stages):
+            progressed = False
+            for name in stages:
+                if name in report or name in running:
+                    continue
+                if any(report.get(dep, {}).get('status') in ('failed', 'skipped') for dep in depends[name]):
+                    report[name] = {'status': 'skipped', 'seconds': 0.0}
+                    print(f"⏭️ {name}: зависимость не выполнена")
+                    progressed = True
+                elif all(dep in report or dep not in stages for dep in depends[name]):
+                    started = start(name)
+                    if started is not None:
+                        running[name] = started
+                    progressed = True
+            if not running:
+                if not progressed:
+                    raise ValueError(f"Циклические зависимости этапов: {sorted(set(stages) - set(report))}")
+                continue
+
+            done, _ = wait([future for _, future in running.values()], return_when=FIRST_COMPLETED)
+            for name in [name for name, (_, future) in running.items() if future in done]:
+                key, future = running.pop(name)
+                result = future.result()
+                if result['returncode'] == 0:
+                    report[name] = {'status': 'done', 'seconds': result['seconds']}
+                    state['stages'][name] = key
+                    print(f"✅ {name} выполнен за {result['seconds']:.1f} с")
+                    if verbose:
+                        print(result['stdout'])
+                else:
+                    report[name] = {'status': 'failed', 'seconds': result['seconds']}
+                    state['stages'].pop(name, None)
+                    print(f"❌ Ошибка в {name}:")
+                    print(result['stderr'])
+                state['files'] = hasher.known
+                save_state(state, state_path)
+
+    state['files'] = hasher.known
+    save_state(state, state_path)
+    return report
+
+
+def print_report(report: dict, wall_seconds: float):
+    print("\n⏱️ Этапы пайплайна:")
+    for name, result in report.items():
+        print(f"   - {name}: {result['status']}, {result['seconds']:.1f} с")
+    cached = sum(result['status'] == 'cached' for result in report.values())
+    print(f"   Из кэша: {cached} из {len(report)}, "
+          f"сумма этапов {sum(result['seconds'] for result in report.values()):.1f} с, "
+          f"общее время {wall_seconds:.1f} с")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пайплайн Drivee с кэшированием этапов по хешам")
+    parser.add_argument('--jobs', type=int, default=2, help="Этапов одновременно")
+    parser.add_argument('--force', action='store_true', help="Перезапустить все этапы")
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES),
+                        help="Только эти этапы (их зависимости должны быть выполнены ранее)")
+    parser.add_argument('--quiet', action='store_true', help="Не печатать вывод этапов")
+    args = parser.parse_args()
+
+    stages = STAGES if not args.stages else {name: STAGES[name] for name in args.stages}
+    start = time.perf_counter()
+    report = run_pipeline(stages, args.jobs, args.force, not args.quiet)
+    print_report(report, time.perf_counter() - start)
+    if any(result['status'] == 'failed' for result in report.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
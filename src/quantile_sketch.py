@@ -0,0 +1,121 @@
+import json
+
+import numpy as np
+
+# Размер верхнего уровня: ошибка ранга порядка 1/k, в памяти около 3k значений
+DEFAULT_K = 2000
+
+# Уровни ниже верхнего короче в 2/3 раза на каждый шаг вниз
+LEVEL_RATIO = 2 / 3
+
+
+class KLLSketch:
+    """
+    Потоковый скетч квантилей KLL, который можно складывать (merge).
+
+    Значения уровня h весят 2^h. Переполненный уровень сортируется, и
+    каждое второе значение (со случайным сдвигом) переходит на уровень
+    выше, поэтому размер скетча не зависит от числа значений. Скетчи
+    порций, посчитанные в разных процессах, складываются в скетч всех
+    данных. Пропуски (NaN) не учитываются, но входят в rows. source -
+    произвольные сведения об источнике данных, сохраняются вместе со скетчем.
+    """
+
+    def __init__(self, k: int = DEFAULT_K, seed: int = 0):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.count = 0
+        self.rows = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self.source = {}
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - 1 - level
+        return max(int(np.ceil(self.k * LEVEL_RATIO ** depth)), 2)
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # При нечетном числе наименьшее значение остается на уровне
+                odd = len(items) % 2
+                promoted = items[odd + int(self._rng.integers(2))::2]
+                self.levels[level] = items[:odd]
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def update(self, values):
+        """Учет массива значений"""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        self.rows += len(values)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.count += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other: 'KLLSketch'):
+        """Сложение со скетчем другой части данных (тот же k)"""
+        if other.k != self.k:
+            raise ValueError(f"Скетчи с разным k нельзя сложить: {self.k} и {other.k}")
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self.rows += other.rows
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+
+    def quantiles(self, qs) -> np.ndarray:
+        """Приближенные квантили уровней qs (0 - минимум, 1 - максимум)"""
+        qs = np.asarray(qs, dtype=np.float64)
+        if self.count == 0:
+            return np.full(qs.shape, np.nan)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2.0 ** h) for h, level in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        items, cumulative = items[order], np.cumsum(weights[order])
+        index = np.minimum(np.searchsorted(cumulative, qs * cumulative[-1]), len(items) - 1)
+        result = items[index]
+        return np.where(qs <= 0, self.min, np.where(qs >= 1, self.max, result))
+
+    def quantile(self, q: float) -> float:
+        return float(self.quantiles([q])[0])
+
+    @property
+    def size(self) -> int:
+        """Число хранимых значений"""
+        return sum(len(level) for level in self.levels)
+
+    def save(self, path: str):
+        """Сохранение скетча в .npz файл"""
+        np.savez(path, items=np.concatenate(self.levels),
+                 level_sizes=np.array([len(level) for level in self.levels], dtype=np.int64),
+                 k=np.int64(self.k), count=np.int64(self.count), rows=np.int64(self.rows),
+                 min=np.float64(self.min), max=np.float64(self.max),
+                 source=np.array(json.dumps(self.source)))
+
+    @classmethod
+    def load(cls, path: str) -> 'KLLSketch':
+        """Загрузка скетча из .npz файла"""
+        with np.load(path) as data:
+            sketch = cls(int(data['k']))
+            sketch.levels = np.split(data['items'], np.cumsum(data['level_sizes'])[:-1])
+            sketch.count = int(data['count'])
+            sketch.rows = int(data['rows'])
+            sketch.min = float(data['min'])
+            sketch.max = float(data['max'])
+            if 'source' in data.files:
+                sketch.source = json.loads(str(data['source']))
+        return sketch
@@ -0,0 +1,149 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+import metrics
+
+# Шаг квантования признаков заказа по умолчанию
+DEFAULT_BUCKETS = {
+    'price_start_local': 1.0,
+    'driver_rating': 0.05,
+    'distance_km': 0.5,
+    'distance_in_meters': 500.0,
+    'order_hour': 1.0,
+}
+
+
+class RecommendationCache:
+    """
+    Кэш рекомендаций перед PriceOptimizer.find_optimal_price.
+
+    Признаки заказа квантуются по шагам buckets, и рекомендация считается
+    для центра корзины, поэтому близкие заказы (рейтинг 4.71 и 4.72)
+    получают один и тот же закэшированный ответ. Вытеснение - LRU
+    с ограничением max_size, ttl (в секундах) задает срок жизни записи.
+
+    При изменении файла model_path кэш очищается, а модель перезагружается
+    (PriceOptimizer.reload_model, с тем же mmap_mode). По умолчанию это
+    файл, из которого оптимизатор загрузил модель (model_file); модель,
+    переданная оптимизатору напрямую, файлом не заменяется. Записи помечены
+    поколением модели: ответ, посчитанный до очистки, в кэш не попадает.
+
+    Возвращаемые словари общие для всех попаданий, их нельзя изменять.
+    """
+
+    def __init__(self, optimizer, model_path: Optional[str] = None,
+                 max_size: int = 10000, ttl: Optional[float] = None,
+                 buckets: Optional[Dict[str, float]] = None):
+        self.optimizer = optimizer
+        self.model_path = model_path
+        self.max_size = max_size
+        self.ttl = ttl
+        self.buckets = dict(DEFAULT_BUCKETS if buckets is None else buckets)
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._generation = 0
+        self._model_stamp = self._read_model_stamp()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expired': 0, 'invalidations': 0,
+                      'stale': 0}
+
+    def watched_path(self) -> Optional[str]:
+        """Файл модели, за которым следит кэш (None - не следит)"""
+        if self.model_path is not None:
+            return self.model_path
+        return getattr(self.optimizer, 'model_file', None)
+
+    def _read_model_stamp(self):
+        """Путь файла модели и (время изменения, размер) или None, если файла нет"""
+        path = self.watched_path()
+        if path is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return path, None
+        return path, (stat.st_mtime_ns, stat.st_size)
+
+    def _check_model(self):
+        """Перезагрузка модели и сброс кэша, если ее файл изменился"""
+        if self._read_model_stamp() == self._model_stamp:
+            return
+        with self._reload_lock:
+            stamp = self._read_model_stamp()
+            if stamp == self._model_stamp:
+                return
+            # Сначала новая модель, затем новое поколение: запрос, начатый после
+            # очистки, уже считается новой моделью
+            if stamp is not None and stamp[1] is not None:
+                self.optimizer.reload_model(stamp[0])
+            with self._lock:
+                self._entries.clear()
+                self._model_stamp = stamp
+                self._generation += 1
+                self.stats['invalidations'] += 1
+        print(f"🔄 Модель изменилась, кэш рекомендаций очищен: {stamp[0] if stamp else 'модель без файла'}")
+
+    def quantize(self, order_features: Dict[str, Any]) -> Dict[str, Any]:
+        """Центр корзины для каждого квантуемого признака"""
+        quantized = dict(order_features)
+        for feature, step in self.buckets.items():
+            if feature in quantized:
+                quantized[feature] = round(quantized[feature] / step) * step
+        return quantized
+
+    def find_optimal_price(self, order_features: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+        """То же, что PriceOptimizer.find_optimal_price, но через кэш"""
+        self._check_model()
+
+        quantized = self.quantize(order_features)
+        key = (tuple(sorted(quantized.items())), tuple(sorted(kwargs.items())))
+        now = time.monotonic()
+
+        with self._lock:
+            generation = self._generation
+            entry = self._entries.get(key)
+            if entry is not None:
+                created, entry_generation, result = entry
+                if entry_generation == generation and (self.ttl is None or now - created < self.ttl):
+                    self._entries.move_to_end(key)
+                    self.stats['hits'] += 1
+                    metrics.count('cache.hits')
+                    return result
+                del self._entries[key]
+                self.stats['expired'] += 1
+                metrics.count('cache.expired')
+            self.stats['misses'] += 1
+            metrics.count('cache.misses')
+
+        result = self.optimizer.find_optimal_price(quantized, **kwargs)
+
+        with self._lock:
+            if generation != self._generation:
+                # Модель сменилась во время расчета
+                self.stats['stale'] += 1
+                return result
+            self._entries[key] = (time.monotonic(), generation, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+                metrics.count('cache.evictions')
+
+        return result
+
+    def clear(self):
+        """Полная очистка кэша"""
+        with self._lock:
+            self._entries.clear()
+
+    def hit_rate(self) -> float:
+        """Доля запросов, обслуженных из кэша"""
+        total = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / total if total else 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
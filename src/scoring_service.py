@@ -0,0 +1,317 @@
+import argparse
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from features import INPUT_COLUMNS
+from optimization import PriceOptimizer
+
+HTTP_STATUS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    500: 'Internal Server Error',
+    503: 'Service Unavailable',
+    504: 'Gateway Timeout',
+}
+
+# Текстовые ответы (строки) отдаются в формате экспозиции Prometheus
+TEXT_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+JSON_CONTENT_TYPE = 'application/json; charset=utf-8'
+
+
+class ScoringService:
+    """
+    Асинхронный сервис рекомендаций цены с динамическими микро-батчами.
+
+    Одновременные запросы собираются в батч до max_batch_size заказов или
+    до истечения max_wait_ms после первого заказа, и весь батч оценивается
+    одним PriceOptimizer.optimize_batch в единственном потоке инференса.
+    Очередь ограничена max_queue (при переполнении - 503), у каждого
+    запроса есть дедлайн deadline_ms (после него - 504).
+    Метрики (счетчики и гистограммы этапов) включены всегда и отдаются
+    на GET /metrics в формате Prometheus.
+    """
+
+    def __init__(self, optimizer: PriceOptimizer = None, max_batch_size: int = 64,
+                 max_wait_ms: float = 5.0, max_queue: int = 1024,
+                 deadline_ms: float = 1000.0, **optimize_options):
+        self.optimizer = optimizer or PriceOptimizer(verbose=False)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.deadline = deadline_ms / 1000
+        self.optimize_options = optimize_options
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='inference')
+        self.stats = {'requests': 0, 'batches': 0, 'batched_orders': 0,
+                      'rejected': 0, 'expired': 0, 'errors': 0}
+        # Счетчики дешевые, а без них /metrics был бы пустым
+        metrics.enable()
+
+    def _optimize(self, orders):
+        frame = pd.DataFrame(orders)
+        result = self.optimizer.optimize_batch(frame, chunk_size=len(frame), fallback=False,
+                                               **self.optimize_options)
+        return result.to_dict('records')
+
+    def _score(self, orders):
+        """
+        Оценка батча заказов (выполняется в потоке инференса).
+
+        Возвращает строку optimize_batch или исключение для каждого заказа:
+        если батч целиком не оценился, заказы оцениваются по одному, и
+        ошибка одного заказа не влияет на остальные.
+        """
+        # Заказы могут передавать разные наборы признаков: пропуски заполняет
+        # features.build_matrix (производными значениями или по умолчанию)
+        metrics.count('service.batches')
+        with metrics.timer('service.score_batch'):
+            try:
+                return self._optimize(orders)
+            except Exception:
+                if len(orders) == 1:
+                    raise
+            results = []
+            for order in orders:
+                try:
+                    results.append(self._optimize([order])[0])
+                except Exception as e:
+                    results.append(e)
+            return results
+
+    async def _collect_batch(self):
+        """Первый заказ из очереди и все, что успело прийти за max_wait"""
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        flush_at = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = flush_at - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def batcher(self):
+        """Цикл микро-батчинга"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect_batch()
+
+            # Просроченные и отмененные запросы не оцениваем
+            now = loop.time()
+            live = []
+            for order, deadline, future in batch:
+                if future.done():
+                    continue
+                if now > deadline:
+                    future.set_exception(asyncio.TimeoutError())
+                else:
+                    live.append((order, future))
+            if not live:
+                continue
+
+            try:
+                result = await loop.run_in_executor(self.executor, self._score,
+                                                    [order for order, _ in live])
+            except Exception as e:
+                self.stats['errors'] += 1
+                for _, future in live:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.stats['batches'] += 1
+            self.stats['batched_orders'] += len(live)
+            for (order, future), row in zip(live, result):
+                if future.done():
+                    continue
+                if isinstance(row, Exception):
+                    self.stats['errors'] += 1
+                    future.set_exception(row)
+                else:
+                    future.set_result(format_recommendation(order, row))
+
+    async def recommend(self, order: Dict[str, Any], deadline_ms: float = None) -> Dict[str, Any]:
+        """Рекомендация для одного заказа через очередь батчинга"""
+        loop = asyncio.get_running_loop()
+        timeout = self.deadline if deadline_ms is None else deadline_ms / 1000
+        future = loop.create_future()
+        self.stats['requests'] += 1
+        try:
+            self.queue.put_nowait((order, loop.time() + timeout, future))
+        except asyncio.QueueFull:
+            self.stats['rejected'] += 1
+            raise
+        try:
+            # Время в очереди и оценке батча до ответа
+            with metrics.timer('service.request'):
+                return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.stats['expired'] += 1
+            raise
+
+    async def handle_request(self, method: str, path: str, body: bytes):
+        """Маршрутизация HTTP-запроса, возвращает (статус, JSON или текст)"""
+        if method == 'GET' and path == '/health':
+            return 200, {'status': 'ok', 'queue': self.queue.qsize()}
+        if method == 'GET' and path == '/stats':
+            return 200, self.stats
+        if method == 'GET' and path == '/metrics':
+            return 200, metrics.to_prometheus()
+        if method == 'GET' and path == '/metrics.json':
+            return 200, metrics.snapshot()
+        if method != 'POST' or path != '/optimize':
+            return 404, {'error': 'not found'}
+
+        try:
+            payload = json.loads(body)
+            order = payload.get('order', payload)
+            deadline_ms = payload.get('deadline_ms')
+        except (ValueError, AttributeError) as e:
+            return 400, {'error': f'bad request: {e}'}
+        if not isinstance(order, dict) or 'price_start_local' not in order:
+            return 400, {'error': 'price_start_local is required'}
+        try:
+            order = parse_order(order)
+        except ValueError as e:
+            return 400, {'error': str(e)}
+
+        try:
+            return 200, await self.recommend(order, deadline_ms)
+        except asyncio.QueueFull:
+            return 503, {'error': 'queue is full'}
+        except asyncio.TimeoutError:
+            return 504, {'error': 'deadline exceeded'}
+        except Exception as e:
+            return 500, {'error': str(e)}
+
+    async def handle_connection(self, reader, writer):
+        """HTTP/1.1 с keep-alive поверх asyncio-потоков"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                status, response = await self.handle_request(method, path, body)
+
+                if isinstance(response, str):
+                    data, content_type = response.encode('utf-8'), TEXT_CONTENT_TYPE
+                else:
+                    data, content_type = json.dumps(response, ensure_ascii=False).encode('utf-8'), JSON_CONTENT_TYPE
+                writer.write(
+                    f"HTTP/1.1 {status} {HTTP_STATUS.get(status, 'Error')}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(data)}\r\n\r\n".encode('latin-1') + data
+                )
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 8080):
+        """Запуск HTTP-сервера и цикла батчинга"""
+        batcher = asyncio.create_task(self.batcher())
+        # Модель (или таблицу для method='table') загружаем до приема запросов, а не на первом батче
+        source = 'table' if self.optimize_options.get('method') == 'table' else 'model'
+        await asyncio.get_running_loop().run_in_executor(self.executor, getattr, self.optimizer, source)
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"🚀 Сервис рекомендаций: http://{host}:{port}/optimize")
+        print(f"   - Батч до {self.max_batch_size} заказов, ожидание {self.max_wait * 1000:.1f} мс")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            self.executor.shutdown(wait=False)
+
+
+def parse_order(order: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Признаки заказа как конечные числа (остальные поля отбрасываются).
+
+    ValueError, если значение не число или стартовая цена не положительна.
+    """
+    parsed = {}
+    for name in INPUT_COLUMNS:
+        if name not in order:
+            continue
+        value = order[name]
+        try:
+            if isinstance(value, bool):
+                raise TypeError
+            value = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} must be a number, got {value!r}")
+        if not np.isfinite(value):
+            raise ValueError(f"{name} must be finite, got {value!r}")
+        parsed[name] = value
+    if parsed['price_start_local'] <= 0:
+        raise ValueError("price_start_local must be positive")
+    return parsed
+
+
+def format_recommendation(order: Dict[str, Any], row: Dict[str, float]) -> Dict[str, Any]:
+    """Строка optimize_batch в формате find_optimal_price"""
+    recommendation = {'base_price': order['price_start_local']}
+    for kind in ('optimal', 'safe'):
+        recommendation[kind] = {
+            name: float(row[f'{kind}_{name}'])
+            for name in ('price', 'probability', 'expected_revenue', 'markup_percent')
+        }
+    return recommendation
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сервис рекомендаций цены с микро-батчингом")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--max-batch-size', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    parser.add_argument('--max-queue', type=int, default=1024)
+    parser.add_argument('--deadline-ms', type=float, default=1000.0)
+    parser.add_argument('--steps', type=int, default=50)
+    parser.add_argument('--method', choices=['grid', 'cube', 'table'], default='grid',
+                        help="Источник вероятностей: модель, куб долей принятия или таблица markup_table")
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    metrics.setup(args)
+
+    service = ScoringService(
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+        max_queue=args.max_queue,
+        deadline_ms=args.deadline_ms,
+        steps=args.steps,
+        method=args.method
+    )
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\n🛑 Сервис остановлен")
+    metrics.report(args)
+
+
+if __name__ == "__main__":
+    main()
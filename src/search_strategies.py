@@ -0,0 +1,92 @@
+import numpy as np
+from typing import Callable, Dict, Tuple
+
+# evaluate(prices) -> вероятности принятия для массива цен
+Evaluator = Callable[[np.ndarray], np.ndarray]
+
+GOLDEN_RATIO = (np.sqrt(5) - 1) / 2
+
+
+def grid_search(evaluate: Evaluator, price_min: float, price_max: float,
+                steps: int = 50) -> Tuple[np.ndarray, np.ndarray]:
+    """Равномерная сетка из steps цен, один вызов модели"""
+    prices = np.linspace(price_min, price_max, steps)
+    return prices, evaluate(prices)
+
+
+def coarse_to_fine_search(evaluate: Evaluator, price_min: float, price_max: float,
+                          coarse_steps: int = 10, fine_steps: int = 10,
+                          levels: int = 3) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Грубая сетка, затем уточнение вокруг лучшего узла.
+
+    На каждом уровне отрезок сужается до соседей лучшей цены
+    и заново покрывается fine_steps точками.
+    """
+    prices = np.linspace(price_min, price_max, coarse_steps)
+    probabilities = evaluate(prices)
+    all_prices, all_probabilities = [prices], [probabilities]
+
+    for _ in range(levels):
+        best = int(np.argmax(prices * probabilities))
+        low = prices[max(best - 1, 0)]
+        high = prices[min(best + 1, len(prices) - 1)]
+        if high <= low:
+            break
+        prices = np.linspace(low, high, fine_steps)
+        probabilities = evaluate(prices)
+        all_prices.append(prices)
+        all_probabilities.append(probabilities)
+
+    return np.concatenate(all_prices), np.concatenate(all_probabilities)
+
+
+def golden_section_search(evaluate: Evaluator, price_min: float, price_max: float,
+                          tolerance: float = 1.0,
+                          max_iterations: int = 100) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Золотое сечение на отрезке цен до точности tolerance рублей
+    (не больше max_iterations новых цен).
+
+    Предполагает унимодальность ожидаемого дохода; на каждом шаге
+    оценивается одна новая цена. Вероятность леса - ступенчатая функция
+    цены, доход на ней пилообразный, и поиск может остановиться на
+    локальном максимуме, пропустив узкий глобальный: для гарантии
+    нужна сетка или method='exact'.
+    """
+    if not tolerance > 0:
+        raise ValueError(f"Точность золотого сечения должна быть положительной: {tolerance}")
+
+    def revenue(price):
+        probability = evaluate(np.array([price]))[0]
+        prices.append(price)
+        probabilities.append(probability)
+        return price * probability
+
+    prices, probabilities = [], []
+    low, high = price_min, price_max
+    left = high - GOLDEN_RATIO * (high - low)
+    right = low + GOLDEN_RATIO * (high - low)
+    left_value, right_value = revenue(left), revenue(right)
+
+    for _ in range(max_iterations):
+        if high - low <= tolerance:
+            break
+        if left_value >= right_value:
+            high, right, right_value = right, left, left_value
+            left = high - GOLDEN_RATIO * (high - low)
+            left_value = revenue(left)
+        else:
+            low, left, left_value = left, right, right_value
+            right = low + GOLDEN_RATIO * (high - low)
+            right_value = revenue(right)
+
+    return np.array(prices), np.array(probabilities)
+
+
+# Доступные стратегии поиска для PriceOptimizer.find_optimal_price
+SEARCH_STRATEGIES: Dict[str, Callable[..., Tuple[np.ndarray, np.ndarray]]] = {
+    'grid': grid_search,
+    'coarse_to_fine': coarse_to_fine_search,
+    'golden': golden_section_search,
+}
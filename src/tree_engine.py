@@ -0,0 +1,237 @@
+import hashlib
+import numpy as np
+import os
+import sys
+import time
+
+# Массивы скомпилированного леса, сохраняемые как отдельные .npy файлы
+_ARRAYS = ('feature', 'threshold', 'left', 'right', 'value', 'roots', 'missing_left')
+
+
+class CompiledForest:
+    """
+    RandomForest, скомпилированный в плоские непрерывные массивы узлов.
+
+    Узлы всех деревьев лежат подряд в общих массивах feature, threshold,
+    left, right и value; roots хранит индекс корня каждого дерева. Листья
+    ссылаются сами на себя, поэтому все строки проходят деревья за
+    одинаковое число шагов без проверок на лист. missing_left - куда узел
+    отправляет пропуск (NaN), как missing_go_to_left в sklearn.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth, feature_names,
+                 missing_left=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.missing_left = (np.zeros(len(feature), dtype=bool) if missing_left is None
+                             else np.asarray(missing_left, dtype=bool))
+        self.max_depth = int(max_depth)
+        self.feature_names = list(feature_names)
+        # Потомки узла i лежат в children[2 * i] (правый) и children[2 * i + 1] (левый)
+        self.children = np.stack([right, left], axis=1).ravel()
+
+    @classmethod
+    def from_model(cls, model) -> 'CompiledForest':
+        """Компиляция обученного RandomForestClassifier"""
+        import sklearn
+        # До sklearn 1.4 в листьях хранились счетчики классов, а не доли
+        normalize_values = tuple(int(part) for part in sklearn.__version__.split('.')[:2]) < (1, 4)
+
+        features, thresholds, lefts, rights, values, roots, missing = [], [], [], [], [], [], []
+        offset = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            is_leaf = tree.children_left == -1
+            node_ids = np.arange(n_nodes)
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+            # До sklearn 1.3 пропуски не поддерживались
+            missing.append(getattr(tree, 'missing_go_to_left', np.zeros(n_nodes, dtype=np.uint8)).astype(bool))
+
+            # Вероятности классов в узле так же, как их считает DecisionTreeClassifier
+            value = tree.value[:, 0, :model.n_classes_].astype(np.float64)
+            if normalize_values:
+                normalizer = value.sum(axis=1)[:, np.newaxis]
+                normalizer[normalizer == 0.0] = 1.0
+                value = value / normalizer
+            values.append(value)
+
+            roots.append(offset)
+            offset += n_nodes
+
+        feature_names = getattr(model, 'feature_names_in_', range(model.n_features_in_))
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(features), dtype=np.intp),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+            left=np.ascontiguousarray(np.concatenate(lefts), dtype=np.intp),
+            right=np.ascontiguousarray(np.concatenate(rights), dtype=np.intp),
+            value=np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+            roots=np.array(roots, dtype=np.intp),
+            missing_left=np.concatenate(missing),
+            max_depth=max(estimator.tree_.max_depth for estimator in model.estimators_),
+            feature_names=[str(name) for name in feature_names]
+        )
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Индексы листьев (строки × деревья) в плоских массивах"""
+        X = np.ascontiguousarray(X)
+        flat_X = X.ravel()
+        row_offsets = (np.arange(len(X)) * X.shape[1])[:, np.newaxis]
+        node = np.repeat(self.roots[np.newaxis, :], len(X), axis=0)
+        has_missing = bool(np.isnan(flat_X).any())
+        for _ in range(self.max_depth):
+            x = flat_X[row_offsets + self.feature[node]]
+            go_left = x <= self.threshold[node]
+            if has_missing:
+                go_left |= np.isnan(x) & self.missing_left[node]
+            node = self.children[2 * node + go_left]
+        return node
+
+    def predict_proba(self, X, chunk_size: int = 2000) -> np.ndarray:
+        """
+        Вероятности классов как у RandomForest.predict_proba.
+
+        Как и sklearn, признаки приводятся к float32, а вероятности деревьев
+        складываются по порядку деревьев и делятся на их число: с n_jobs=1
+        результат совпадает побитово. Многопоточный sklearn складывает деревья
+        в порядке завершения потоков, и результаты расходятся на ошибку
+        округления (порядка 1e-16).
+        """
+        X = np.asarray(X, dtype=np.float32)
+        proba = np.zeros((len(X), self.value.shape[1]), dtype=np.float64)
+
+        for start in range(0, len(X), chunk_size):
+            leaves = self.apply(X[start:start + chunk_size])
+            chunk = proba[start:start + chunk_size]
+            for t in range(self.n_trees):
+                chunk += self.value[leaves[:, t]]
+
+        proba /= self.n_trees
+        return proba
+
+    def save(self, path: str):
+        """Сохранение массивов в папку path (по .npy файлу на массив)"""
+        os.makedirs(path, exist_ok=True)
+        for name in _ARRAYS:
+            np.save(os.path.join(path, f'{name}.npy'), getattr(self, name))
+        with open(os.path.join(path, 'meta.txt'), 'w', encoding='utf-8') as f:
+            f.write(f"{self.max_depth}\n")
+            f.write("\n".join(self.feature_names))
+
+    @classmethod
+    def load(cls, path: str, mmap_mode=None) -> 'CompiledForest':
+        """Загрузка скомпилированного леса из папки path"""
+        # missing_left нет в папках, скомпилированных до поддержки пропусков
+        arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode)
+                  for name in _ARRAYS if os.path.exists(os.path.join(path, f'{name}.npy'))}
+        with open(os.path.join(path, 'meta.txt'), encoding='utf-8') as f:
+            max_depth, *feature_names = f.read().splitlines()
+        return cls(max_depth=int(max_depth), feature_names=feature_names, **arrays)
+
+
+def check_parity(model, compiled: CompiledForest, X) -> bool:
+    """Проверка побитового совпадения с model.predict_proba (у модели должно быть n_jobs=1)"""
+    expected = model.predict_proba(X)
+    actual = compiled.predict_proba(X)
+    return expected.shape == actual.shape and np.array_equal(expected, actual)
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 содержимого файла"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(2**20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def save_compiled(compiled: CompiledForest, compiled_path: str, model_path: str):
+    """Сохранение массивов и хеша модели, из которой они собраны (пишется последним)"""
+    compiled.save(compiled_path)
+    with open(os.path.join(compiled_path, 'source.txt'), 'w', encoding='utf-8') as f:
+        f.write(file_digest(model_path))
+
+
+def compile_model_file(model_path: str = None, compiled_path: str = None) -> str:
+    """
+    Компиляция сохраненной модели в папку compiled_path (по умолчанию
+    рядом с .joblib, у каждой модели своя).
+
+    Массивы пересобираются, только если их нет или SHA-256 .joblib не
+    совпадает с сохраненным при компиляции, поэтому повторные вызовы
+    стоят одного чтения файла модели. Возвращает compiled_path.
+    """
+    from model_loader import load_model, MODEL_PATH, compiled_dir
+
+    model_path = model_path or MODEL_PATH
+    compiled_path = compiled_path or compiled_dir(model_path)
+    source_path = os.path.join(compiled_path, 'source.txt')
+    if os.path.exists(source_path):
+        with open(source_path, encoding='utf-8') as f:
+            if f.read().strip() == file_digest(model_path):
+                return compiled_path
+
+    print(f"⚙️ Компиляция модели в массивы узлов: {compiled_path}")
+    save_compiled(CompiledForest.from_model(load_model(model_path)), compiled_path, model_path)
+    return compiled_path
+
+
+def main():
+    import pandas as pd
+    from model_loader import load_model, MODEL_PATH, COMPILED_PATH
+
+    compiled_path = COMPILED_PATH
+
+    print("⚙️ Компиляция модели в массивы узлов...")
+    model = load_model()
+    # Последовательное сложение деревьев, как в CompiledForest
+    model.set_params(n_jobs=1)
+    compiled = CompiledForest.from_model(model)
+    save_compiled(compiled, compiled_path, MODEL_PATH)
+    print(f"✅ Скомпилировано {compiled.n_trees} деревьев, {len(compiled.feature)} узлов: {compiled_path}")
+
+    # Случайные заказы в диапазоне обучающих данных
+    rng = np.random.default_rng(42)
+    n_rows = 10000
+    price_start = rng.integers(200, 500, n_rows)
+    price_bid = price_start * rng.uniform(1.0, 1.5, n_rows)
+    X = pd.DataFrame({
+        'price_start_local': price_start,
+        'price_bid_local': price_bid,
+        'price_ratio': price_bid / price_start,
+        'driver_rating': rng.uniform(3.5, 5.0, n_rows),
+        'distance_km': rng.uniform(1, 20, n_rows),
+        'order_hour': rng.integers(0, 24, n_rows)
+    })[compiled.feature_names]
+
+    if not check_parity(model, compiled, X):
+        print("❌ Вероятности не совпадают с predict_proba!")
+        sys.exit(1)
+    print(f"✅ Побитовое совпадение с predict_proba на {n_rows} строках")
+
+    for n in (1, 50, n_rows):
+        rows = X.iloc[:n]
+        start = time.perf_counter()
+        model.predict_proba(rows)
+        sklearn_time = time.perf_counter() - start
+        start = time.perf_counter()
+        compiled.predict_proba(rows.to_numpy())
+        compiled_time = time.perf_counter() - start
+        print(f"   {n} строк: sklearn {sklearn_time * 1000:.2f} мс, "
+              f"массивы {compiled_time * 1000:.2f} мс")
+
+
+if __name__ == "__main__":
+    main()
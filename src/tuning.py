@@ -0,0 +1,227 @@
+import argparse
+import json
+import math
+import os
+import statistics
+import time
+
+import numpy as np
+
+from columnar import load_dataset
+from features import build_matrix, build_frame
+from model import prepare_features, train_model, ENGINES, INPUT_COLUMNS, data_dir
+from model_loader import MODEL_PATH, save_model
+from tree_engine import CompiledForest
+
+# Пространства поиска гиперпараметров по движкам
+SEARCH_SPACES = {
+    'forest': {
+        'n_estimators': [50, 100, 200],
+        'max_depth': [6, 8, 10, 14, None],
+        'min_samples_split': [2, 10, 20, 50],
+        'min_samples_leaf': [1, 5, 10, 20]
+    },
+    'hgb': {
+        'learning_rate': [0.03, 0.05, 0.1, 0.2],
+        'max_leaf_nodes': [15, 31, 63],
+        'min_samples_leaf': [10, 20, 50, 100],
+        'l2_regularization': [0.0, 0.1, 1.0]
+    }
+}
+
+# Размер сетки цен одного заказа в find_optimal_price: на нем меряется задержка
+# того же пути, что у PriceOptimizer (скомпилированный лес или sklearn)
+LATENCY_ROWS = 50
+
+
+def sample_candidates(space: dict, n_candidates: int, seed: int = 42) -> list:
+    """Случайные различные наборы гиперпараметров из пространства поиска"""
+    rng = np.random.default_rng(seed)
+    names = list(space)
+    total = math.prod(len(space[name]) for name in names)
+    candidates, seen = [], set()
+    while len(candidates) < min(n_candidates, total):
+        choice = tuple(int(rng.integers(len(space[name]))) for name in names)
+        if choice not in seen:
+            seen.add(choice)
+            candidates.append({name: space[name][i] for name, i in zip(names, choice)})
+    return candidates
+
+
+def make_folds(y: np.ndarray, n_folds: int, seed: int = 42) -> list:
+    """
+    Стратифицированные фолды, вычисляемые один раз на весь поиск.
+
+    Индексы обучения каждого фолда перемешаны, поэтому первые n строк -
+    случайная подвыборка для ранних раундов последовательного деления.
+    """
+    from sklearn.model_selection import StratifiedKFold
+
+    rng = np.random.default_rng(seed)
+    splitter = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=seed)
+    return [(rng.permutation(train_idx), test_idx)
+            for train_idx, test_idx in splitter.split(np.zeros(len(y)), y)]
+
+
+def fold_arrays(X: np.ndarray, y: np.ndarray, folds: list) -> list:
+    """
+    Обучающие и проверочные массивы фолдов, выбранные из X один раз.
+
+    Строки обучения идут в перемешанном порядке make_folds, поэтому
+    подвыборка раунда - срез X_train[:n_rows] без копирования.
+    """
+    return [(X[train_idx], y[train_idx], X[test_idx], y[test_idx]) for train_idx, test_idx in folds]
+
+
+def evaluate_candidate(engine: str, params: dict, data: list, n_rows: int,
+                       keep_model: bool = False) -> dict:
+    """
+    Средний ROC-AUC по фолдам data (см. fold_arrays) в рабочем процессе.
+
+    keep_model=True возвращает и модель последнего фолда: по ней
+    после отбора измеряется задержка (measure_latency).
+    """
+    from sklearn.metrics import roc_auc_score
+
+    if engine == 'forest':
+        # Параллельность - на уровне кандидатов, а не деревьев
+        params = {**params, 'n_jobs': 1}
+
+    aucs = []
+    for X_train, y_train, X_test, y_test in data:
+        model = train_model(X_train[:n_rows], y_train[:n_rows], engine, params)
+        aucs.append(roc_auc_score(y_test, model.predict_proba(X_test)[:, 1]))
+
+    result = {'auc': float(np.mean(aucs))}
+    if keep_model:
+        result['model'] = model
+    return result
+
+
+def measure_latency(engine: str, model, grid: np.ndarray, repeats: int = 20) -> float:
+    """Медианная задержка оценки сетки цен grid в миллисекундах"""
+    predictor = CompiledForest.from_model(model) if engine == 'forest' else model
+    predictor.predict_proba(grid)
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predictor.predict_proba(grid)
+        latencies.append(time.perf_counter() - start)
+    return statistics.median(latencies) * 1000
+
+
+def successive_halving(engine: str, data: list, candidates: list, eta: int = 3,
+                       min_rows: int = 500, cpu_budget: int = None) -> list:
+    """
+    Последовательное деление: все кандидаты оцениваются на малой
+    подвыборке, в следующий раунд проходит лучшая по AUC 1/eta, а
+    подвыборка растет в eta раз до полной обучающей части фолда. В
+    последнем раунде остается около eta кандидатов, между которыми
+    выбирает select_winner.
+
+    Кандидаты раунда считаются параллельно в пределах cpu_budget
+    процессов; массивы фолдов data передаются процессам через
+    отображение в память (joblib), а не копируются на кандидата.
+    Задержка здесь не меряется: параллельные процессы мешают друг другу.
+    Возвращает пары (параметры, результат с моделью) последнего раунда.
+    """
+    from joblib import Parallel, delayed
+
+    cpu_budget = cpu_budget or os.cpu_count()
+    max_rows = min(len(y_train) for _, y_train, _, _ in data)
+    n_rounds = max(1, int(math.log(max(len(candidates), 1), eta) + 1e-9))
+    n_rows = max(min_rows, max_rows // eta ** (n_rounds - 1))
+
+    with Parallel(n_jobs=min(cpu_budget, len(candidates))) as parallel:
+        for round_number in range(1, n_rounds + 1):
+            n_rows = min(n_rows, max_rows)
+            last = round_number == n_rounds or n_rows >= max_rows
+            start = time.perf_counter()
+            results = parallel(delayed(evaluate_candidate)(engine, params, data, n_rows, last)
+                               for params in candidates)
+            ranked = sorted(zip(candidates, results), key=lambda item: item[1]['auc'], reverse=True)
+            print(f"   Раунд {round_number}: {len(candidates)} кандидатов на {n_rows} строках "
+                  f"за {time.perf_counter() - start:.1f} с, лучший AUC {ranked[0][1]['auc']:.4f}")
+
+            if last:
+                return ranked
+            candidates = [params for params, _ in ranked[:max(1, len(candidates) // eta)]]
+            n_rows *= eta
+    return ranked
+
+
+def time_finalists(engine: str, ranked: list, grid: np.ndarray) -> list:
+    """Задержка финалистов, измеренная по очереди в одном процессе"""
+    for _, result in ranked:
+        result['latency_ms'] = measure_latency(engine, result.pop('model'), grid)
+    return ranked
+
+
+def select_winner(ranked: list, max_latency_ms: float, auc_tolerance: float):
+    """
+    Выбор по AUC и задержке: среди кандидатов в пределах max_latency_ms
+    берется самый быстрый, чей AUC не хуже лучшего больше чем на auc_tolerance.
+    """
+    feasible = [item for item in ranked if item[1]['latency_ms'] <= max_latency_ms]
+    if not feasible:
+        print(f"⚠️ Нет кандидатов быстрее {max_latency_ms} мс, выбираем по AUC")
+        feasible = ranked
+    best_auc = max(result['auc'] for _, result in feasible)
+    close = [item for item in feasible if item[1]['auc'] >= best_auc - auc_tolerance]
+    return min(close, key=lambda item: item[1]['latency_ms'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Подбор гиперпараметров модели принятия")
+    parser.add_argument('--data', default=os.path.join(data_dir, 'train.csv'))
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--engine', choices=list(ENGINES), default='forest')
+    parser.add_argument('--candidates', type=int, default=27)
+    parser.add_argument('--folds', type=int, default=3)
+    parser.add_argument('--eta', type=int, default=3)
+    parser.add_argument('--min-rows', type=int, default=500)
+    parser.add_argument('--cpu-budget', type=int, default=os.cpu_count())
+    parser.add_argument('--max-latency-ms', type=float, default=5.0,
+                        help=f"Предел задержки оценки {LATENCY_ROWS} строк")
+    parser.add_argument('--auc-tolerance', type=float, default=0.002)
+    args = parser.parse_args()
+
+    print(f"🔧 Подбор гиперпараметров {ENGINES[args.engine]}...")
+    data = load_dataset(args.data, INPUT_COLUMNS + ['is_done'])
+    n_total = len(data)
+    data, features = prepare_features(data.copy())
+    data = data[features + ['is_done']].dropna()
+
+    # Матрица признаков и массивы фолдов строятся один раз на весь поиск
+    X = build_matrix(data, features)
+    y = data['is_done'].to_numpy(dtype=np.int8)
+    folds = fold_arrays(X, y, make_folds(y, args.folds))
+    candidates = sample_candidates(SEARCH_SPACES[args.engine], args.candidates)
+    print(f"📦 {len(X)} строк, {args.folds} фолда, {len(candidates)} кандидатов, "
+          f"процессов: {args.cpu_budget}")
+
+    start = time.perf_counter()
+    ranked = successive_halving(args.engine, folds, candidates, args.eta, args.min_rows, args.cpu_budget)
+    ranked = time_finalists(args.engine, ranked, folds[0][2][:LATENCY_ROWS])
+    for params, result in ranked:
+        print(f"   - AUC {result['auc']:.4f}, {result['latency_ms']:.2f} мс: {json.dumps(params)}")
+    params, result = select_winner(ranked, args.max_latency_ms, args.auc_tolerance)
+    print(f"🏆 Лучшие параметры: {json.dumps(params)}")
+    print(f"   - ROC-AUC (CV): {result['auc']:.4f}, задержка: {result['latency_ms']:.2f} мс")
+    print(f"   - Поиск занял {time.perf_counter() - start:.1f} с")
+
+    # Победитель переобучается на всех данных и заменяет модель
+    model = train_model(build_frame(data, features), data['is_done'], args.engine, params)
+    # params в сведениях о модели - подобранная конфигурация для model.py
+    save_model(model, {
+        'engine': args.engine,
+        'params': params,
+        'cv_auc': round(result['auc'], 4),
+        'latency_ms': round(result['latency_ms'], 3),
+        'trained_rows': n_total
+    }, args.model)
+    print(f"💾 Модель сохранена: {args.model}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,157 @@
 import pandas as pd
 import numpy as np
+import argparse
+import hashlib
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
-def validate_data(data: pd.DataFrame) -> pd.DataFrame:
+from columnar import iter_chunks
+from quantile_sketch import KLLSketch
+
+# Получаем абсолютные пути
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+SKETCH_PATH = os.path.join(project_root, 'models', 'price_sketch.npz')
+
+# Колонка и доли для отсечения выбросов
+OUTLIER_COLUMN = 'price_bid_local'
+OUTLIER_QUANTILES = (0.01, 0.99)
+
+def validate_data(data: pd.DataFrame, bounds: tuple = None) -> pd.DataFrame:
     """
     Валидация и очистка данных
+    
+    bounds - готовые границы выбросов (например, outlier_bounds по скетчу),
+    иначе точные квантили по data.
     """
     # Проверка на пропуски
     print("Пропуски в данных:")
     print(data.isnull().sum())
     
     # Удаление выбросов в ценах
-    Q1 = data['price_bid_local'].quantile(0.01)
-    Q3 = data['price_bid_local'].quantile(0.99)
-    data = data[(data['price_bid_local'] >= Q1) & (data['price_bid_local'] <= Q3)]
+    if bounds is None:
+        bounds = tuple(data[OUTLIER_COLUMN].quantile(list(OUTLIER_QUANTILES)))
+    Q1, Q3 = bounds
+    data = data[(data[OUTLIER_COLUMN] >= Q1) & (data[OUTLIER_COLUMN] <= Q3)]
     
     return data
 
+# Хвост уже учтенной части файла, по которому проверяется, что файл только дописан
+FINGERPRINT_BYTES = 65536
+
+def _file_source(data_path: str, column: str) -> dict:
+    """Сведения о файле данных: путь, колонка, размер, время изменения и отпечаток хвоста"""
+    stat = os.stat(data_path)
+    with open(data_path, 'rb') as f:
+        f.seek(max(stat.st_size - FINGERPRINT_BYTES, 0))
+        tail = f.read(FINGERPRINT_BYTES)
+    return {'path': os.path.abspath(data_path), 'column': column, 'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns, 'tail_sha256': hashlib.sha256(tail).hexdigest()}
+
+def _appended(source: dict, data_path: str, column: str) -> bool:
+    """Дописан ли в data_path только хвост после файла, описанного source"""
+    stat = os.stat(data_path)
+    if (source.get('path') != os.path.abspath(data_path) or source.get('column') != column
+            or stat.st_size < source.get('size', -1)):
+        return False
+    with open(data_path, 'rb') as f:
+        f.seek(max(source['size'] - FINGERPRINT_BYTES, 0))
+        tail = f.read(source['size'] - max(source['size'] - FINGERPRINT_BYTES, 0))
+    if hashlib.sha256(tail).hexdigest() != source['tail_sha256']:
+        return False
+    # Тот же размер, но файл менялся - содержимое переписано, а не дописано
+    return stat.st_size > source['size'] or stat.st_mtime_ns == source['mtime_ns']
+
+def _sketch_chunk(values: np.ndarray, seed: int) -> KLLSketch:
+    sketch = KLLSketch(seed=seed)
+    sketch.update(values)
+    return sketch
+
+def price_sketch(data_path: str, sketch_path: str = SKETCH_PATH, chunk_size: int = 500000,
+                 n_workers: int = 1, column: str = OUTLIER_COLUMN, rebuild: bool = False) -> KLLSketch:
+    """
+    Скетч квантилей колонки за один проход порциями.
+    
+    Сохраненный скетч продолжается, только если он построен по этому же
+    файлу и колонке, а файл с тех пор лишь дописан (размер не меньше, хвост
+    учтенной части не изменился): тогда читаются только строки после
+    sketch.rows, и история не перечитывается. Иначе (или при rebuild)
+    скетч строится заново. Скетч каждой порции считается отдельно
+    (при n_workers > 1 - в пуле процессов) и складывается с общим по
+    порядку порций, поэтому результат не зависит от числа процессов.
+    В работе одновременно не более 2 * n_workers порций. Скетч
+    сохраняется в sketch_path.
+    """
+    sketch = KLLSketch()
+    if not rebuild and sketch_path and os.path.exists(sketch_path):
+        saved = KLLSketch.load(sketch_path)
+        if _appended(saved.source, data_path, column):
+            sketch = saved
+        else:
+            print(f"♻️ Скетч {sketch_path} построен по другим данным, строим заново")
+    source = _file_source(data_path, column)
+    # Зерно порции - номер ее первой строки, чтобы скетч был воспроизводим
+    first_row = sketch.rows
+    chunks = ((np.asarray(chunk[column], dtype=np.float64), first_row + i * chunk_size)
+              for i, chunk in enumerate(iter_chunks(data_path, chunk_size, [column], skip_rows=first_row)))
+    
+    if n_workers > 1:
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            for values, seed in chunks:
+                pending.append(executor.submit(_sketch_chunk, values, seed))
+                if len(pending) >= 2 * n_workers:
+                    sketch.merge(pending.popleft().result())
+            while pending:
+                sketch.merge(pending.popleft().result())
+    else:
+        for values, seed in chunks:
+            sketch.merge(_sketch_chunk(values, seed))
+    
+    sketch.source = source
+    if sketch_path:
+        os.makedirs(os.path.dirname(os.path.abspath(sketch_path)), exist_ok=True)
+        sketch.save(sketch_path)
+    return sketch
+
+def outlier_bounds(sketch: KLLSketch, quantiles: tuple = OUTLIER_QUANTILES) -> tuple:
+    """Границы выбросов по скетчу"""
+    return tuple(float(value) for value in sketch.quantiles(quantiles))
+
+def validate_chunks(data_path: str, bounds: tuple, chunk_size: int = 500000,
+                    columns=None, column: str = OUTLIER_COLUMN):
+    """Порции данных без выбросов по готовым границам (фильтр по одной порции)"""
+    low, high = bounds
+    for chunk in iter_chunks(data_path, chunk_size, columns):
+        values = chunk[column]
+        yield chunk[(values >= low) & (values <= high)]
+
+def validate_file(data_path: str, output_path: str, sketch_path: str = SKETCH_PATH,
+                  chunk_size: int = 500000, n_workers: int = 1, rebuild: bool = False) -> dict:
+    """
+    Потоковая валидация: границы по скетчу и запись очищенных данных
+    в output_path порциями, без загрузки всего набора в память.
+    """
+    sketch = price_sketch(data_path, sketch_path, chunk_size, n_workers, rebuild=rebuild)
+    bounds = outlier_bounds(sketch)
+    
+    missing = None
+    rows = kept = 0
+    for chunk in iter_chunks(data_path, chunk_size):
+        missing = chunk.isnull().sum() if missing is None else missing + chunk.isnull().sum()
+        values = chunk[OUTLIER_COLUMN]
+        valid = chunk[(values >= bounds[0]) & (values <= bounds[1])]
+        valid.to_csv(output_path, mode='w' if rows == 0 else 'a', header=rows == 0, index=False)
+        rows += len(chunk)
+        kept += len(valid)
+    
+    print("Пропуски в данных:")
+    print(missing)
+    return {'rows': rows, 'kept': kept, 'bounds': bounds}
+
 def calculate_metrics(actual: np.array, predicted: np.array) -> dict:
     """
     Расчет метрик качества модели
@@ -28,4 +163,31 @@ def calculate_metrics(actual: np.array, predicted: np.array) -> dict:
         'precision': precision_score(actual, predicted),
         'recall': recall_score(actual, predicted),
         'f1_score': f1_score(actual, predicted)
-    }
\ No newline at end of file
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Потоковая валидация данных по скетчу квантилей")
+    parser.add_argument('data', help="CSV с заказами (или путь, рядом с которым есть колоночная копия)")
+    parser.add_argument('--output', default=None, help="CSV без выбросов (без него - только границы)")
+    parser.add_argument('--sketch', default=SKETCH_PATH, help="Файл скетча (продолжается между запусками)")
+    parser.add_argument('--chunk-size', type=int, default=500000)
+    parser.add_argument('--workers', type=int, default=1, help="Процессов для скетча")
+    parser.add_argument('--rebuild', action='store_true', help="Построить скетч заново, не продолжая сохраненный")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.output:
+        report = validate_file(args.data, args.output, args.sketch, args.chunk_size, args.workers,
+                               args.rebuild)
+        print(f"✅ Очищенные данные: {args.output}, оставлено {report['kept']} из {report['rows']} строк")
+        bounds = report['bounds']
+    else:
+        sketch = price_sketch(args.data, args.sketch, args.chunk_size, args.workers, rebuild=args.rebuild)
+        print(f"📊 Скетч: {sketch.rows} строк, {sketch.size} значений")
+        bounds = outlier_bounds(sketch)
+    print(f"📏 Границы {OUTLIER_COLUMN}: {bounds[0]:.0f} - {bounds[1]:.0f} "
+          f"({time.perf_counter() - start:.1f} с)")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,46 +2,98 @@ import matplotlib.pyplot as plt
 import matplotlib.patches as patches
 from matplotlib.patches import FancyBboxPatch
 import numpy as np
+import html
 import os
+import string
 import sys
+import threading
 
-print("🎨 Создание интерфейса для водителя...")
+import metrics
 
 # Получаем абсолютные пути
 current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.dirname(current_dir)
 output_dir = os.path.join(project_root, 'output')
 
-# Создаем папку output если ее нет
-os.makedirs(output_dir, exist_ok=True)
+# Размер карточки в единицах осей (и в пикселях SVG)
+CARD_WIDTH = 400
+CARD_HEIGHT = 600
+
+
+def card_texts(order_info, recommendations):
+    """Тексты карточки, меняющиеся от заказа к заказу (общие для всех способов отрисовки)"""
+    optimal = recommendations['optimal']
+    safe = recommendations.get('safe')
+    return {
+        'distance': f"Маршрут: {order_info['distance_km']:.1f} км",
+        'duration': f"Время: {order_info['duration_min']:.0f} мин",
+        'base_price': f"Базовая цена: {order_info['base_price']}₽",
+        'safe': f"Надежный: {safe['price']:.0f}₽ (шанс: {safe['probability']:.0%})" if safe else '',
+        'optimal': f"Оптимальный: {optimal['price']:.0f}₽ (доход: {optimal['expected_revenue']:.0f}₽)",
+        'risky': f"Рискованный: {optimal['price'] * 1.2:.0f}₽",
+        'probability': f"{optimal['probability']:.0%}",
+        'button_price': f"{optimal['price']:.0f}₽",
+    }
 
-print(f"📁 Папка output: {output_dir}")
 
 class InterfaceDesigner:
-    def __init__(self):
+    """
+    Карточка водителя на matplotlib.
+
+    По умолчанию каждый вызов create_driver_interface строит новую фигуру
+    (предыдущая закрывается, чтобы фигуры не копились в pyplot). С
+    reuse=True макет строится один раз на объекте Figure вне pyplot, а
+    для следующих заказов меняются только тексты и ширина полосы
+    вероятности; tight_layout не вызывается. render_png в этом режиме
+    рисует статичный фон один раз и поверх его копии - только
+    изменяемые элементы.
+    """
+
+    def __init__(self, reuse: bool = False):
+        self.reuse = reuse
         self.fig = None
         self.ax = None
+        self._artists = {}
+        self._background = None
+        self._lock = threading.Lock()
     
+    @metrics.timed('interface.create')
     def create_driver_interface(self, order_info, recommendations):
         """
         Создает макет интерфейса для водителя
         """
+        if self.reuse and self.fig is not None:
+            self._update(order_info, recommendations)
+            return self.fig
+        
         # Создаем фигуру
-        self.fig, self.ax = plt.subplots(1, 1, figsize=(8, 10))
+        if self.reuse:
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            from matplotlib.figure import Figure
+            self.fig = Figure(figsize=(8, 10))
+            FigureCanvasAgg(self.fig)
+            self.ax = self.fig.add_axes([0, 0, 1, 1])
+            self._background = None
+        else:
+            if self.fig is not None:
+                plt.close(self.fig)
+            self.fig, self.ax = plt.subplots(1, 1, figsize=(8, 10))
+        self._artists = {}
+        texts = card_texts(order_info, recommendations)
         
         # Настройка области отображения
-        self.ax.set_xlim(0, 400)
-        self.ax.set_ylim(0, 600)
+        self.ax.set_xlim(0, CARD_WIDTH)
+        self.ax.set_ylim(0, CARD_HEIGHT)
         self.ax.axis('off')
         
         # Заголовок
         self._add_text(200, 580, "Drivee - Умный помощник", size=16, weight='bold')
         
         # Информация о заказе
-        self._add_order_info(order_info, 200, 520)
+        self._add_order_info(texts, 200, 520)
         
         # Рекомендации по цене
-        self._add_price_recommendations(recommendations, 200, 400)
+        self._add_price_recommendations(recommendations, texts, 200, 400)
         
         # Шкала вероятности
         self._add_probability_scale(recommendations, 200, 250)
@@ -49,19 +101,66 @@ class InterfaceDesigner:
         # Кнопка действия
         self._add_action_button(200, 150, recommendations)
         
-        plt.tight_layout()
+        if not self.reuse:
+            plt.tight_layout()
         return self.fig
     
-    def _add_text(self, x, y, text, size=12, weight='normal', color='black'):
+    def _update(self, order_info, recommendations):
+        """Обновление изменяемых элементов готового макета"""
+        for key, text in card_texts(order_info, recommendations).items():
+            self._artists[key].set_text(text)
+        has_safe = bool(recommendations.get('safe'))
+        self._artists['safe'].set_visible(has_safe)
+        self._artists['safe_rect'].set_visible(has_safe)
+        self._artists['fill'].set_width(200 * recommendations['optimal']['probability'])
+    
+    def render_png(self, order_info, recommendations, dpi=100) -> bytes:
+        """PNG карточки в памяти (удобно с reuse=True; безопасно из нескольких потоков)"""
+        import io
+        
+        with self._lock:
+            return self._render_png(order_info, recommendations, dpi, io.BytesIO())
+    
+    def _render_png(self, order_info, recommendations, dpi, buffer) -> bytes:
+        fig = self.create_driver_interface(order_info, recommendations)
+        with metrics.timer('interface.png'):
+            if not self.reuse:
+                fig.savefig(buffer, format='png', dpi=dpi)
+                return buffer.getvalue()
+            
+            from PIL import Image
+            
+            canvas = fig.canvas
+            if self._background is None or fig.dpi != dpi:
+                # Фон без изменяемых элементов рисуется один раз
+                fig.set_dpi(dpi)
+                for artist in self._artists.values():
+                    artist.set_animated(True)
+                canvas.draw()
+                self._background = canvas.copy_from_bbox(fig.bbox)
+                for artist in self._artists.values():
+                    artist.set_animated(False)
+            canvas.restore_region(self._background)
+            for artist in self._artists.values():
+                if artist.get_visible():
+                    fig.draw_artist(artist)
+            image = Image.frombuffer('RGBA', canvas.get_width_height(), canvas.buffer_rgba(), 'raw', 'RGBA', 0, 1)
+            image.save(buffer, format='png', compress_level=1)
+        return buffer.getvalue()
+    
+    def _add_text(self, x, y, text, size=12, weight='normal', color='black', key=None):
         """Добавляет текст на интерфейс"""
-        self.ax.text(x, y, text, 
+        artist = self.ax.text(x, y, text, 
                     fontsize=size, 
                     weight=weight, 
                     color=color,
                     ha='center', va='center',
                     fontfamily='DejaVu Sans')
+        if key is not None:
+            self._artists[key] = artist
+        return artist
     
-    def _add_order_info(self, order_info, x, y):
+    def _add_order_info(self, texts, x, y):
         """Блок информации о заказе"""
         # Фон блока
         rect = FancyBboxPatch((x-180, y-80), 360, 100,
@@ -70,35 +169,35 @@ class InterfaceDesigner:
         self.ax.add_patch(rect)
         
         self._add_text(x, y, "Информация о заказе", size=14, weight='bold')
-        self._add_text(x, y-20, f"Маршрут: {order_info['distance_km']:.1f} км")
-        self._add_text(x, y-40, f"Время: {order_info['duration_min']:.0f} мин")
-        self._add_text(x, y-60, f"Базовая цена: {order_info['base_price']}₽")
+        self._add_text(x, y-20, texts['distance'], key='distance')
+        self._add_text(x, y-40, texts['duration'], key='duration')
+        self._add_text(x, y-60, texts['base_price'], key='base_price')
     
-    def _add_price_recommendations(self, recommendations, x, y):
+    def _add_price_recommendations(self, recommendations, texts, x, y):
         """Блок рекомендаций по цене"""
-        optimal = recommendations['optimal']
         safe = recommendations.get('safe')
         
         self._add_text(x, y, "Рекомендуемые цены", size=14, weight='bold')
         
-        # Безопасный вариант
-        if safe:
+        # Безопасный вариант (в переиспользуемом макете создается всегда и скрывается без него)
+        if safe or self.reuse:
             safe_rect = FancyBboxPatch((x-180, y-60), 360, 40,
                                      boxstyle="round,pad=0.02",
                                      facecolor='green', alpha=0.3)
             self.ax.add_patch(safe_rect)
-            self._add_text(x, y-40, f"Надежный: {safe['price']:.0f}₽ (шанс: {safe['probability']:.0%})")
+            self._artists['safe_rect'] = safe_rect
+            self._add_text(x, y-40, texts['safe'], key='safe')
+            safe_rect.set_visible(bool(safe))
         
         # Оптимальный вариант
         optimal_rect = FancyBboxPatch((x-180, y-110), 360, 40,
                                     boxstyle="round,pad=0.02", 
                                     facecolor='orange', alpha=0.3)
         self.ax.add_patch(optimal_rect)
-        self._add_text(x, y-90, f"Оптимальный: {optimal['price']:.0f}₽ (доход: {optimal['expected_revenue']:.0f}₽)")
+        self._add_text(x, y-90, texts['optimal'], key='optimal')
         
         # Рискованный вариант
-        risky_price = optimal['price'] * 1.2
-        self._add_text(x, y-140, f"Рискованный: {risky_price:.0f}₽")
+        self._add_text(x, y-140, texts['risky'], key='risky')
     
     def _add_probability_scale(self, recommendations, x, y):
         """Шкала вероятности принятия"""
@@ -115,9 +214,10 @@ class InterfaceDesigner:
         fill_rect = patches.Rectangle((x-100, y-30), fill_width, 20,
                                     facecolor='blue', alpha=0.7)
         self.ax.add_patch(fill_rect)
+        self._artists['fill'] = fill_rect
         
         # Текст вероятности
-        self._add_text(x, y-20, f"{prob:.0%}", size=12, weight='bold', color='white')
+        self._add_text(x, y-20, f"{prob:.0%}", size=12, weight='bold', color='white', key='probability')
     
     def _add_action_button(self, x, y, recommendations):
         """Кнопка действия"""
@@ -127,10 +227,99 @@ class InterfaceDesigner:
         self.ax.add_patch(button_rect)
         self._add_text(x, y-5, "ПОДТВЕРДИТЬ", size=14, weight='bold', color='white')
         self._add_text(x, y-20, f"{recommendations['optimal']['price']:.0f}₽", 
-                      size=16, weight='bold', color='white')
+                      size=16, weight='bold', color='white', key='button_price')
+
+
+# Та же карточка строкой SVG: без matplotlib, координаты y отсчитываются сверху,
+# размеры шрифтов - пункты matplotlib в единицах осей
+SVG_TEMPLATE = string.Template('''<svg xmlns="http://www.w3.org/2000/svg" width="800" height="1200" viewBox="0 0 400 600" font-family="DejaVu Sans, sans-serif" text-anchor="middle" dominant-baseline="central">
+<rect width="400" height="600" fill="white"/>
+<text x="200" y="20" font-size="11" font-weight="bold">Drivee - Умный помощник</text>
+<rect x="20" y="60" width="360" height="100" rx="8" fill="lightblue" fill-opacity="0.3"/>
+<text x="200" y="80" font-size="10" font-weight="bold">Информация о заказе</text>
+<text x="200" y="100" font-size="8.5">$distance</text>
+<text x="200" y="120" font-size="8.5">$duration</text>
+<text x="200" y="140" font-size="8.5">$base_price</text>
+<text x="200" y="200" font-size="10" font-weight="bold">Рекомендуемые цены</text>
+<g visibility="$safe_visibility"><rect x="20" y="220" width="360" height="40" rx="8" fill="green" fill-opacity="0.3"/>
+<text x="200" y="240" font-size="8.5">$safe</text></g>
+<rect x="20" y="270" width="360" height="40" rx="8" fill="orange" fill-opacity="0.3"/>
+<text x="200" y="290" font-size="8.5">$optimal</text>
+<text x="200" y="340" font-size="8.5">$risky</text>
+<text x="200" y="350" font-size="10" font-weight="bold">Шанс принятия заказа</text>
+<rect x="100" y="360" width="200" height="20" fill="lightgray" fill-opacity="0.5"/>
+<rect x="100" y="360" width="$fill_width" height="20" fill="blue" fill-opacity="0.7"/>
+<text x="200" y="370" font-size="8.5" font-weight="bold" fill="white">$probability</text>
+<rect x="120" y="430" width="160" height="50" rx="10" fill="#4CAF50" fill-opacity="0.8"/>
+<text x="200" y="455" font-size="10" font-weight="bold" fill="white">ПОДТВЕРДИТЬ</text>
+<text x="200" y="470" font-size="11" font-weight="bold" fill="white">$button_price</text>
+</svg>
+''')
+
+
+@metrics.timed('interface.svg')
+def render_svg(order_info, recommendations) -> str:
+    """Карточка водителя строкой SVG по шаблону (без matplotlib)"""
+    values = {key: html.escape(text) for key, text in card_texts(order_info, recommendations).items()}
+    values['safe_visibility'] = 'visible' if recommendations.get('safe') else 'hidden'
+    values['fill_width'] = f"{200 * recommendations['optimal']['probability']:.1f}"
+    return SVG_TEMPLATE.substitute(values)
+
+
+# Дизайнер рабочего процесса (макет строится один раз на процесс)
+_worker_designer = None
+
+
+def _render_shard(cards, output_dir, start, backend, dpi):
+    """Отрисовка порции карточек в рабочем процессе, возвращает пути файлов"""
+    global _worker_designer
+    paths = []
+    for i, (order_info, recommendations) in enumerate(cards, start):
+        path = os.path.join(output_dir, f"card_{i:06d}.{backend}")
+        if backend == 'svg':
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(render_svg(order_info, recommendations))
+        else:
+            if _worker_designer is None:
+                _worker_designer = InterfaceDesigner(reuse=True)
+            with open(path, 'wb') as f:
+                f.write(_worker_designer.render_png(order_info, recommendations, dpi))
+        paths.append(path)
+    return paths
+
+
+def render_cards(cards, output_dir, backend='svg', n_workers=None, chunk_size=200, dpi=100):
+    """
+    Пакетная отрисовка карточек [(order_info, recommendations), ...] в файлы
+    card_000000.svg (или .png) в output_dir.
+
+    Порции по chunk_size карточек раздаются пулу процессов; в каждом
+    процессе PNG-макет строится один раз и переиспользуется. Возвращает
+    пути файлов в порядке карточек.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    
+    if backend not in ('svg', 'png'):
+        raise ValueError(f"Неизвестный формат карточек: {backend}")
+    os.makedirs(output_dir, exist_ok=True)
+    cards = list(cards)
+    n_workers = n_workers or os.cpu_count()
+    shards = [(cards[start:start + chunk_size], output_dir, start, backend, dpi)
+              for start in range(0, len(cards), chunk_size)]
+    if n_workers == 1:
+        return [path for shard in shards for path in _render_shard(*shard)]
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        futures = [executor.submit(_render_shard, *shard) for shard in shards]
+        return [path for future in futures for path in future.result()]
 
 # Основная часть скрипта
 def main():
+    print("🎨 Создание интерфейса для водителя...")
+    
+    # Создаем папку output если ее нет
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"📁 Папка output: {output_dir}")
+    
     try:
         # Создаем дизайнер
         designer = InterfaceDesigner()
@@ -170,7 +359,8 @@ def main():
         ]
         
         for output_path in output_paths:
-            plt.savefig(output_path, dpi=150, bbox_inches='tight')
+            with metrics.timer('interface.savefig'):
+                plt.savefig(output_path, dpi=150, bbox_inches='tight')
             if os.path.exists(output_path):
                 file_size = os.path.getsize(output_path)
                 print(f"✅ Интерфейс сохранен: {output_path} ({file_size} байт)")
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Модули src импортируются напрямую, как в скриптах проекта
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
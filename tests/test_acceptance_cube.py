@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from acceptance_cube import PRIOR_ORDERS, AcceptanceCube, build_cube
+from create_data import iter_blocks
+
+
+def orders_frame(n_rows: int = 3000) -> pd.DataFrame:
+    orders = pd.DataFrame(next(iter_blocks(n_rows)))
+    # Неполные строки: в ячейки не попадают, но учитываются в rows
+    orders.loc[[5, 1500, 2500], 'driver_rating'] = np.nan
+    orders.loc[7, 'is_done'] = np.nan
+    return orders
+
+
+def test_update_appended_rows_equals_full_rebuild(tmp_path):
+    orders = orders_frame()
+    path = str(tmp_path / 'train.csv')
+    orders.iloc[:2000].to_csv(path, index=False)
+
+    cube = AcceptanceCube()
+    assert cube.update(path, chunk_size=700) == 2000
+    assert cube.skipped == 3
+    orders.iloc[2000:].to_csv(path, mode='a', header=False, index=False)
+    assert cube.update(path, chunk_size=700) == 1000
+    assert cube.update(path) == 0
+
+    full = build_cube(path)
+    assert np.array_equal(cube.orders, full.orders)
+    assert np.array_equal(cube.accepted, full.accepted)
+    assert (cube.rows, cube.skipped) == (full.rows, full.skipped) == (3000, 4)
+
+    # Куб частей данных в сумме - тот же куб
+    merged = AcceptanceCube()
+    for part in (orders.iloc[:1234], orders.iloc[1234:]):
+        piece = AcceptanceCube()
+        piece.add(part)
+        merged.merge(piece)
+    assert np.array_equal(merged.orders, full.orders)
+    assert np.array_equal(merged.accepted, full.accepted)
+
+    cube.save(str(tmp_path / 'cube.npz'))
+    loaded = AcceptanceCube.load(str(tmp_path / 'cube.npz'))
+    assert np.array_equal(loaded.orders, full.orders)
+    assert (loaded.rows, loaded.skipped) == (3000, 4)
+
+
+def test_rollup_matches_direct_aggregation():
+    orders = orders_frame()
+    cube = AcceptanceCube()
+    cube.add(orders)
+    rollup = cube.rollup(['markup'], order_hour=(7, 10), distance_km=(0, 5))
+
+    distance = orders['distance_in_meters'] / 1000
+    markup = orders['price_bid_local'] / orders['price_start_local'] - 1
+    complete = orders[['driver_rating', 'is_done']].notna().all(axis=1)
+    selected = orders[complete & orders['order_hour'].between(7, 9) & (distance < 5)]
+    markup_bin = cube.bin_index('markup', markup[selected.index])
+    expected = selected.groupby(markup_bin)['is_done'].agg(['count', 'sum'])
+
+    assert rollup['markup'].tolist() == cube.axes['markup'][:-1].tolist()
+    present = rollup.iloc[expected.index]
+    assert present['orders'].tolist() == expected['count'].tolist()
+    assert present['accepted'].tolist() == expected['sum'].astype(int).tolist()
+    assert rollup['orders'].sum() == len(selected)
+
+    # Свертка по всем осям - итог по всем полным строкам
+    total = cube.rollup()
+    assert total['orders'].item() == complete.sum()
+    assert total['accepted'].item() == orders.loc[complete, 'is_done'].sum()
+
+
+def test_rates_back_off_to_coarser_cells():
+    cube = AcceptanceCube()
+    order = {'order_hour': 18, 'distance_km': 5.5, 'driver_rating': 4.75, 'price_start_local': 300.0}
+    cell = tuple(int(cube.bin_index(name, value)) for name, value in
+                 [('order_hour', 18), ('distance_km', 5.5), ('driver_rating', 4.75), ('markup', 0.02)])
+    other = tuple(int(cube.bin_index(name, value)) for name, value in
+                  [('order_hour', 3), ('distance_km', 20), ('driver_rating', 4.0), ('markup', 0.4)])
+    cube.orders[cell], cube.accepted[cell] = 100, 90
+    cube.orders[other], cube.accepted[other] = 100, 30
+    cube._rates = None
+
+    # Уровни BACKOFF: общая доля -> надбавка -> дистанция -> час -> рейтинг
+    overall = 120 / 200
+    by_markup = (90 + PRIOR_ORDERS * overall) / (100 + PRIOR_ORDERS)
+    by_distance = (90 + PRIOR_ORDERS * by_markup) / (100 + PRIOR_ORDERS)
+    by_hour = (90 + PRIOR_ORDERS * by_distance) / (100 + PRIOR_ORDERS)
+    by_rating = (90 + PRIOR_ORDERS * by_hour) / (100 + PRIOR_ORDERS)
+
+    assert cube.probabilities(order, [306.0]) == pytest.approx([by_rating])
+    # Пустые ячейки получают оценку ближайшего общего уровня
+    assert cube.probabilities({**order, 'driver_rating': 3.2}, [306.0]) == pytest.approx([by_hour])
+    assert cube.probabilities({**order, 'order_hour': 2}, [306.0]) == pytest.approx([by_distance])
+    assert cube.probabilities({**order, 'distance_km': 40}, [306.0]) == pytest.approx([by_markup])
+    assert cube.probabilities(order, [390.0]) == pytest.approx([overall])
+    assert 0.9 > by_rating > by_markup > overall
+
+    # Колонки заказов и матрица цен
+    orders = pd.DataFrame([order, {**order, 'distance_km': 40}])
+    assert np.allclose(cube.probabilities(orders, np.array([[306.0, 390.0]] * 2)),
+                       [[by_rating, overall], [by_markup, overall]])
+
+    assert np.all(AcceptanceCube().rates() == 0.5)
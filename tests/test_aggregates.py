@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+from aggregates import BinnedAggregates
+
+
+def orders_frame():
+    return pd.DataFrame({
+        'price_start_local': [300.0, 400.0, np.nan, 250.0],
+        'price_bid_local': [330.0, np.nan, 500.0, 260.0],
+        'driver_rating': [4.8, np.nan, 4.5, 4.9],
+        'distance_in_meters': [5000.0, 8000.0, np.nan, 2000.0],
+        'is_done': [1.0, 0.0, 1.0, np.nan],
+    })
+
+
+def test_add_skips_non_finite_values():
+    aggregates = BinnedAggregates()
+    aggregates.add(orders_frame())
+    counts = aggregates.counts
+
+    assert aggregates.rows == 4
+    assert aggregates.accepted == 2
+    assert counts['outcome'].tolist() == [1, 2]
+    assert aggregates.missing == {'price_start_local': 1, 'price_bid_local': 1, 'driver_rating': 1,
+                                  'distance_km': 1, 'is_done': 1}
+    assert counts['price_start_local'].sum() == 3
+    assert counts['price_bid_local'].sum() == 3
+    # Рейтинг нужен вместе с известным исходом: строки 0 и 2
+    assert counts['rating_accepted'].sum() == 2
+    assert counts['rating_rejected'].sum() == 0
+    # В ячейку попадает только строка 0 (у остальных нет бида, дистанции или исхода)
+    assert counts['cell_orders'].sum() == 1
+    assert counts['cell_accepted'].sum() == 1
+
+
+def test_inf_is_treated_as_missing():
+    aggregates = BinnedAggregates()
+    frame = orders_frame().fillna(np.inf)
+    aggregates.add(frame)
+    assert aggregates.rows == 4
+    assert sum(aggregates.missing.values()) == 5
+    assert aggregates.counts['cell_orders'].sum() == 1
+
+
+def test_merge_and_save_roundtrip(tmp_path):
+    first, second = BinnedAggregates(), BinnedAggregates()
+    first.add(orders_frame())
+    second.add(orders_frame())
+    first.merge(second)
+
+    path = tmp_path / 'aggregates.npz'
+    first.save(str(path))
+    loaded = BinnedAggregates.load(str(path))
+    assert loaded.rows == 8
+    assert loaded.missing['driver_rating'] == 2
+    for name, counts in first.counts.items():
+        assert np.array_equal(loaded.counts[name], counts)
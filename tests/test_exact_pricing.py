@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+
+from features import FEATURES
+from optimization import PriceOptimizer
+
+ORDERS = [
+    {'price_start_local': 300.0, 'driver_rating': 4.7, 'distance_km': 5.2, 'order_hour': 18},
+    {'price_start_local': 640.0, 'driver_rating': 3.9, 'distance_km': 21.0, 'order_hour': 3},
+    {'price_start_local': 175.0, 'driver_rating': 4.95, 'distance_km': 1.4, 'order_hour': 9},
+]
+
+
+def training_orders(seed: int = 0, n: int = 4000):
+    rng = np.random.default_rng(seed)
+    orders = pd.DataFrame({
+        'price_start_local': rng.uniform(150, 800, n),
+        'price_ratio': rng.uniform(1.0, 1.6, n),
+        'driver_rating': rng.uniform(3.5, 5.0, n),
+        'distance_km': rng.uniform(1, 30, n),
+        'order_hour': rng.integers(0, 24, n).astype(float),
+    })
+    orders['price_bid_local'] = orders['price_start_local'] * orders['price_ratio']
+    # Принятие зависит и от отношения, и от абсолютной цены бида
+    accept = 1.7 - orders['price_ratio'] - 0.0004 * orders['price_bid_local'] + 0.1 * (orders['driver_rating'] - 4)
+    y = (rng.random(n) < accept.clip(0, 1)).astype(int)
+    return orders[FEATURES], y
+
+
+def fit_pricing_forest(seed: int = 0):
+    X, y = training_orders(seed)
+    model = RandomForestClassifier(n_estimators=20, max_depth=10, min_samples_leaf=3, random_state=seed)
+    return model.fit(X, y)
+
+
+@pytest.fixture(scope='module')
+def forest():
+    return fit_pricing_forest()
+
+
+@pytest.mark.parametrize('compiled', [True, False])
+@pytest.mark.parametrize('order', ORDERS)
+def test_step_probabilities_match_model(forest, order, compiled):
+    optimizer = PriceOptimizer(forest, compiled=compiled, cube_path=None, verbose=False)
+    options = optimizer.find_optimal_price(order, method='exact')['all_options']
+    prices, probabilities = options['price'].to_numpy(), options['probability'].to_numpy()
+    assert len(prices) > 5
+
+    # Ступень (lo, hi]: правая граница и середина ступени дают ту же вероятность
+    assert np.allclose(optimizer.predict_probabilities(order, prices), probabilities, atol=1e-12)
+    middles = (prices[:-1] + prices[1:]) / 2
+    assert np.allclose(optimizer.predict_probabilities(order, middles), probabilities[1:], atol=1e-12)
+
+
+@pytest.mark.parametrize('order', ORDERS)
+def test_exact_optimum_is_not_worse_than_dense_grid(forest, order):
+    optimizer = PriceOptimizer(forest, cube_path=None, verbose=False)
+    exact = optimizer.find_optimal_price(order, method='exact')
+    grid = optimizer.find_optimal_price(order, steps=3000)
+
+    assert exact['optimal']['expected_revenue'] >= grid['optimal']['expected_revenue'] - 1e-9
+    # Точный режим не дороже сетки: число ступеней меньше числа цен сетки
+    assert len(exact['all_options']) < len(grid['all_options'])
+    assert exact['optimal']['probability'] == pytest.approx(
+        optimizer.predict_probability(order, exact['optimal']['price']), abs=1e-12)
+
+
+def test_exact_mode_falls_back_to_grid_without_trees():
+    X, y = training_orders()
+    optimizer = PriceOptimizer(LogisticRegression(max_iter=1000).fit(X, y), cube_path=None, verbose=False)
+    exact = optimizer.find_optimal_price(ORDERS[0], method='exact', steps=30)
+    grid = optimizer.find_optimal_price(ORDERS[0], steps=30)
+    assert exact['evaluations'] == grid['evaluations']
+    assert exact['optimal'] == grid['optimal']
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from features import FEATURES
+from markup_table import MarkupTable, check_errors
+from optimization import PriceOptimizer
+
+AXES = {
+    'driver_rating': np.array([4.0, 4.5, 5.0]),
+    'distance_km': np.array([1.0, 5.0, 10.0]),
+    'order_hour': np.array([0.0, 12.0, 23.0]),
+    'price_start_local': np.array([200.0, 300.0, 400.0]),
+}
+MARKUPS = np.linspace(0.0, 0.5, 11)
+ORDER = {'price_start_local': 260.0, 'driver_rating': 4.6, 'distance_km': 3.0, 'order_hour': 7}
+
+
+def linear_probability(rating, distance, hour, base_price, markup):
+    """Линейная по каждой оси вероятность: интерполяция таблицы для нее точна"""
+    return 0.2 + 0.1 * (rating - 4) + 0.01 * distance + 0.002 * hour + 0.0002 * base_price - 0.5 * markup
+
+
+def linear_table() -> MarkupTable:
+    grid = np.meshgrid(*AXES.values(), MARKUPS, indexing='ij')
+    return MarkupTable(AXES, MARKUPS, linear_probability(*grid))
+
+
+def test_lookup_interpolates_between_nodes():
+    table = linear_table()
+    expected = linear_probability(4.6, 3.0, 7, 260.0, MARKUPS)
+    assert np.allclose(table.curves(ORDER), expected, atol=1e-6)
+
+    # Цены между узлами сетки надбавок; заказ за пределами осей - по границе
+    prices = np.array([260.0, 270.4, 333.0])
+    assert np.allclose(table.probabilities(ORDER, prices),
+                       linear_probability(4.6, 3.0, 7, 260.0, prices / 260.0 - 1), atol=1e-6)
+    outside = {**ORDER, 'driver_rating': 5.5, 'distance_km': 0.2}
+    assert np.allclose(table.curves(outside), linear_probability(5.0, 1.0, 7, 260.0, MARKUPS), atol=1e-6)
+
+    # Колонки заказов - те же кривые, что и по одному заказу
+    orders = pd.DataFrame([ORDER, outside])
+    assert np.allclose(table.curves(orders), [table.curves(ORDER), table.curves(outside)])
+
+    recommendation = table.lookup(ORDER)
+    revenue = 260.0 * (1 + MARKUPS) * expected
+    assert recommendation['optimal']['markup_percent'] == pytest.approx(MARKUPS[np.argmax(revenue)] * 100)
+    assert recommendation['optimal']['expected_revenue'] == pytest.approx(revenue.max(), rel=1e-6)
+
+
+def test_save_and_load_round_trip(tmp_path):
+    table = linear_table()
+    path = str(tmp_path / 'table.npz')
+    table.save(path)
+    loaded = MarkupTable.load(path)
+
+    assert list(loaded.axes) == list(table.axes)
+    for name, axis in table.axes.items():
+        assert np.array_equal(loaded.axes[name], axis)
+    assert np.array_equal(loaded.markups, table.markups)
+    assert np.array_equal(loaded.grid, table.grid)
+    assert loaded.lookup(ORDER) == table.lookup(ORDER)
+
+
+def test_table_serves_optimizer_methods():
+    rng = np.random.default_rng(0)
+    X = rng.uniform([150, 150, 1, 3.5, 1, 0], [800, 1200, 1.5, 5, 30, 23], size=(3000, len(FEATURES)))
+    X[:, 1] = X[:, 0] * X[:, 2]
+    model = RandomForestClassifier(n_estimators=10, max_depth=6, random_state=0)
+    model.fit(X, (rng.random(len(X)) < 1.2 - X[:, 2] * 0.6).astype(int))
+
+    optimizer = PriceOptimizer(model, cube_path=None, verbose=False)
+    table = MarkupTable.build(optimizer, axes=AXES, markups=np.linspace(0.0, 0.5, 50))
+    optimizer = PriceOptimizer(model, cube_path=None, table=table, verbose=False)
+
+    # В узле сетки таблица хранит вероятности модели
+    node = {'price_start_local': 300.0, 'driver_rating': 4.5, 'distance_km': 5.0, 'order_hour': 12}
+    model_result = optimizer.find_optimal_price(node)
+    table_result = optimizer.find_optimal_price(node, method='table')
+    assert np.allclose(table_result['all_options']['probability'],
+                       model_result['all_options']['probability'], atol=1e-6)
+    assert table_result['optimal']['price'] == pytest.approx(model_result['optimal']['price'])
+
+    orders = pd.DataFrame([node, ORDER, {**ORDER, 'order_hour': 20}])
+    batch = optimizer.optimize_batch(orders, method='table')
+    for i, order in enumerate(orders.to_dict('records')):
+        single = optimizer.find_optimal_price(order, method='table')
+        assert batch['optimal_price'].iloc[i] == pytest.approx(single['optimal']['price'])
+        assert batch['safe_probability'].iloc[i] == pytest.approx(single['safe']['probability'])
+
+
+def test_table_method_without_table_is_rejected():
+    optimizer = PriceOptimizer(cube_path=None, table_path=None, verbose=False)
+    with pytest.raises(ValueError):
+        optimizer.find_optimal_price(ORDER, method='table')
+
+
+def test_build_gate_rejects_large_regret():
+    check_errors(pd.DataFrame({'regret_percent': np.full(100, 0.5)}))
+    with pytest.raises(ValueError):
+        check_errors(pd.DataFrame({'regret_percent': np.full(100, 2.7)}))
+    # Редкий большой промах в хвосте пропускается, систематический - нет
+    tail = np.r_[np.full(93, 0.2), np.full(7, 12.0)]
+    with pytest.raises(ValueError):
+        check_errors(pd.DataFrame({'regret_percent': tail}))
+    check_errors(pd.DataFrame({'regret_percent': np.r_[np.full(99, 0.5), 12.0]}))
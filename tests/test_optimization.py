@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from features import FEATURES
+from optimization import PriceOptimizer
+
+RESULT_FIELDS = ('price', 'probability', 'expected_revenue', 'markup_percent')
+
+
+def fit_pricing_forest(seed: int = 0):
+    """Лес на признаках проекта: принятие падает с отношением бида к стартовой цене"""
+    rng = np.random.default_rng(seed)
+    n = 4000
+    orders = pd.DataFrame({
+        'price_start_local': rng.uniform(150, 800, n),
+        'price_ratio': rng.uniform(1.0, 1.6, n),
+        'driver_rating': rng.uniform(3.5, 5.0, n),
+        'distance_km': rng.uniform(1, 30, n),
+        'order_hour': rng.integers(0, 24, n).astype(float),
+    })
+    orders['price_bid_local'] = orders['price_start_local'] * orders['price_ratio']
+    accept = 1.6 - orders['price_ratio'] + 0.1 * (orders['driver_rating'] - 4) - 0.005 * orders['distance_km']
+    y = (rng.random(n) < accept.clip(0, 1)).astype(int)
+    model = RandomForestClassifier(n_estimators=15, max_depth=8, min_samples_leaf=5, random_state=seed)
+    return model.fit(orders[FEATURES].to_numpy(), y)
+
+
+def sample_orders(n: int = 11, seed: int = 1) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    orders = pd.DataFrame({
+        'price_start_local': rng.uniform(150, 800, n).round(),
+        'driver_rating': rng.uniform(3.5, 5.0, n).round(2),
+        'distance_km': rng.uniform(1, 30, n).round(1),
+        'order_hour': rng.integers(0, 24, n),
+    })
+    # Пропуск признака заполняется значением по умолчанию в обоих путях
+    orders.loc[3, 'driver_rating'] = np.nan
+    return orders
+
+
+@pytest.mark.parametrize('compiled', [True, False])
+def test_batch_matches_single_order_optimization(compiled):
+    optimizer = PriceOptimizer(fit_pricing_forest(), compiled=compiled, cube_path=None, verbose=False)
+    orders = sample_orders()
+    # Порции не кратны числу заказов: последняя неполная
+    batch = optimizer.optimize_batch(orders, steps=40, chunk_size=4, max_markup=0.6)
+
+    assert list(batch.index) == list(orders.index)
+    for i, order in orders.iterrows():
+        order = {name: value for name, value in order.items() if not pd.isna(value)}
+        single = optimizer.find_optimal_price(order, steps=40, max_markup=0.6)
+        for kind in ('optimal', 'safe'):
+            for field in RESULT_FIELDS:
+                assert batch.loc[i, f'{kind}_{field}'] == pytest.approx(single[kind][field], rel=1e-12), \
+                    (i, kind, field)
+
+
+class BrokenModel:
+    """Модель, которая не может предсказать ни одной порции"""
+
+    def predict_proba(self, X):
+        raise RuntimeError("модель недоступна")
+
+
+def test_batch_model_error_uses_fallback_or_raises():
+    optimizer = PriceOptimizer(BrokenModel(), cube_path=None, verbose=False)
+    orders = sample_orders(5)
+
+    with pytest.raises(RuntimeError):
+        optimizer.optimize_batch(orders, fallback=False)
+
+    # Без куба запасная вероятность 0.5: максимум дохода на верхней надбавке
+    batch = optimizer.optimize_batch(orders, chunk_size=2)
+    assert (batch['optimal_probability'] == 0.5).all()
+    assert np.allclose(batch['optimal_markup_percent'], 50.0)
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from create_data import generate
+from out_of_core import StratifiedReservoir, peak_rss_mb, train_out_of_core, validation_mask
+
+
+def test_validation_split_is_deterministic_per_order_id():
+    rng = np.random.default_rng(0)
+    orders = pd.DataFrame({'order_id': rng.permutation(20000) + 1})
+    expected = pd.Series(validation_mask(orders, 0, 20), index=orders['order_id'])
+
+    # Другой порядок строк и другие порции: каждый заказ в той же части
+    shuffled = orders.sample(frac=1, random_state=1).reset_index(drop=True)
+    for offset in range(0, len(shuffled), 3000):
+        chunk = shuffled.iloc[offset:offset + 3000]
+        mask = validation_mask(chunk, offset, 20)
+        assert np.array_equal(mask, expected.loc[chunk['order_id']].to_numpy())
+
+    assert expected.mean() == pytest.approx(0.2, abs=0.01)
+
+
+def test_reservoir_sample_uses_whole_capacity_with_stream_shares():
+    rng = np.random.default_rng(0)
+    reservoir = StratifiedReservoir(1000, 3, shares={0: 0.7, 1: 0.3})
+    assert reservoir.nbytes == 1000 * 3 * 4
+    for _ in range(20):
+        X = rng.normal(size=(5000, 3)).astype(np.float32)
+        reservoir.add(X, (rng.random(5000) < 0.3).astype(np.int8))
+
+    X, y = reservoir.sample()
+    assert len(X) >= 950
+    assert y.mean() == pytest.approx(0.3, abs=0.01)
+
+
+def test_training_fits_small_memory_limit(tmp_path):
+    import sklearn.ensemble  # noqa: F401 - в базовой памяти, как в train_out_of_core
+
+    data_path = str(tmp_path / 'train.csv')
+    generate(data_path, 300000)
+
+    limit = peak_rss_mb() + 40
+    report = train_out_of_core(data_path, str(tmp_path / 'model.joblib'), memory_limit_mb=limit,
+                               engine='hgb')
+    assert report['peak_rss_mb'] <= limit
+    assert report['chunk_size'] < 200000
+    assert report['sample_rows'] < report['train_rows']
+    assert report['valid_rows'] == pytest.approx(0.2 * report['rows'], rel=0.05)
+
+    # Разбиение по order_id не зависит от размера порций
+    again = train_out_of_core(data_path, str(tmp_path / 'again.joblib'), memory_limit_mb=peak_rss_mb() + 40,
+                              chunk_size=7000, engine='hgb')
+    assert again['chunk_size'] == 7000
+    assert again['valid_rows'] == report['valid_rows']
+
+
+def test_limit_below_process_memory_is_rejected(tmp_path):
+    with pytest.raises(MemoryError):
+        train_out_of_core(str(tmp_path / 'train.csv'), str(tmp_path / 'model.joblib'),
+                          memory_limit_mb=peak_rss_mb() / 2)
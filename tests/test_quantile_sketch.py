@@ -0,0 +1,111 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from quantile_sketch import KLLSketch
+from utils import price_sketch
+
+QS = np.array([0.001, 0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99, 0.999])
+
+
+def rank_errors(sketch: KLLSketch, values: np.ndarray) -> np.ndarray:
+    """Отклонение доли значений не больше оценки квантиля от его уровня"""
+    values = np.sort(values)
+    ranks = np.searchsorted(values, sketch.quantiles(QS), side='right') / len(values)
+    return np.abs(ranks - QS)
+
+
+def stream(seed: int = 0, n_rows: int = 400000, chunk_size: int = 25000):
+    rng = np.random.default_rng(seed)
+    values = rng.lognormal(6, 0.5, n_rows)
+    return values, [values[i:i + chunk_size] for i in range(0, n_rows, chunk_size)]
+
+
+@pytest.mark.parametrize('k', [200, 2000])
+def test_rank_error_and_size_are_bounded(k):
+    values, chunks = stream()
+    sketch = KLLSketch(k)
+    for chunk in chunks:
+        sketch.update(chunk)
+
+    # Ошибка ранга порядка 1/k, память порядка 3k значений при любом объеме
+    assert rank_errors(sketch, values).max() <= 3 / k
+    assert sketch.size <= 3 * k + 2 * len(sketch.levels)
+    assert (sketch.count, sketch.rows) == (len(values), len(values))
+    assert (sketch.quantile(0), sketch.quantile(1)) == (values.min(), values.max())
+
+
+def test_merged_sketch_matches_single_pass():
+    values, chunks = stream(seed=1)
+    values = values.copy()
+    values[::97] = np.nan
+    chunks = [values[i:i + 25000] for i in range(0, len(values), 25000)]
+
+    single = KLLSketch(200)
+    for chunk in chunks:
+        single.update(chunk)
+    merged = KLLSketch(200)
+    for i, chunk in enumerate(chunks):
+        part = KLLSketch(200, seed=i)
+        part.update(chunk)
+        merged.merge(part)
+
+    known = values[~np.isnan(values)]
+    for sketch in (single, merged):
+        assert (sketch.count, sketch.rows, sketch.min, sketch.max) == \
+            (len(known), len(values), known.min(), known.max())
+        assert rank_errors(sketch, known).max() <= 3 / 200
+    assert merged.size <= 3 * 200 + 2 * len(merged.levels)
+
+    with pytest.raises(ValueError):
+        merged.merge(KLLSketch(100))
+
+
+def write_prices(path: str, prices: np.ndarray, mode: str = 'w'):
+    frame = pd.DataFrame({'price_start_local': prices, 'price_bid_local': prices})
+    frame.to_csv(path, mode=mode, header=mode == 'w', index=False)
+
+
+def test_saved_sketch_resumes_only_after_append(tmp_path, capsys):
+    rng = np.random.default_rng(0)
+    data_path, sketch_path = str(tmp_path / 'train.csv'), str(tmp_path / 'sketch.npz')
+    # Трехзначные цены: перезапись другими значениями сохраняет размер файла
+    prices = rng.integers(100, 1000, 30000)
+    write_prices(data_path, prices)
+    first = price_sketch(data_path, sketch_path, chunk_size=7000)
+    assert first.rows == 30000
+
+    # Дописан хвост: скетч продолжается, а не строится заново
+    write_prices(data_path, rng.integers(100, 1000, 5000), mode='a')
+    capsys.readouterr()
+    resumed = price_sketch(data_path, sketch_path, chunk_size=7000)
+    assert resumed.rows == 35000
+    assert '♻️' not in capsys.readouterr().out
+
+    # Тот же размер, другое содержимое: скетч по старым данным сбрасывается
+    stat = os.stat(data_path)
+    write_prices(data_path, np.r_[prices, np.full(5000, 999)][::-1])
+    os.utime(data_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert os.path.getsize(data_path) == stat.st_size
+    rebuilt = price_sketch(data_path, sketch_path, chunk_size=7000)
+    assert '♻️' in capsys.readouterr().out
+    assert rebuilt.rows == 35000
+    assert rebuilt.quantile(0.9) == 999
+
+    # Файл короче учтенного и другая колонка - тоже заново
+    write_prices(data_path, prices[:1000])
+    assert price_sketch(data_path, sketch_path).rows == 1000
+    assert '♻️' in capsys.readouterr().out
+    assert price_sketch(data_path, sketch_path, column='price_start_local').rows == 1000
+    assert '♻️' in capsys.readouterr().out
+
+
+def test_result_does_not_depend_on_worker_count(tmp_path):
+    data_path = str(tmp_path / 'train.csv')
+    write_prices(data_path, np.random.default_rng(0).lognormal(6, 0.5, 60000).round(2))
+    one = price_sketch(data_path, None, chunk_size=9000, n_workers=1)
+    two = price_sketch(data_path, None, chunk_size=9000, n_workers=2)
+    assert np.array_equal(one.quantiles(QS), two.quantiles(QS))
+    assert [len(level) for level in one.levels] == [len(level) for level in two.levels]
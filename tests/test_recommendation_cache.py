@@ -0,0 +1,161 @@
+import os
+import time
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from features import FEATURES
+from model_loader import load_model
+from optimization import PriceOptimizer
+from recommendation_cache import RecommendationCache
+
+ORDER = {'price_start_local': 300.0, 'driver_rating': 4.71, 'distance_km': 5.2, 'order_hour': 18}
+
+
+class CountingOptimizer:
+    """Оптимизатор без модели: ответ - квантованный заказ, вызовы считаются"""
+
+    model_file = None
+
+    def __init__(self):
+        self.calls = []
+
+    def find_optimal_price(self, order_features, **kwargs):
+        self.calls.append(order_features)
+        return {'order': order_features, **kwargs}
+
+
+def fit_forest(path, n_estimators: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(500, len(FEATURES)))
+    model = RandomForestClassifier(n_estimators=n_estimators, max_depth=4, random_state=seed)
+    model.fit(X, (X[:, 2] > 0).astype(int))
+    joblib.dump(model, path)
+    return model
+
+
+def touch_later(path):
+    """Новое время изменения файла, даже если файловая система округляет его"""
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+def test_close_orders_share_a_bucket():
+    optimizer = CountingOptimizer()
+    cache = RecommendationCache(optimizer)
+    first = cache.find_optimal_price(ORDER)
+    second = cache.find_optimal_price({**ORDER, 'driver_rating': 4.72, 'distance_km': 5.1})
+    assert second is first
+    assert len(optimizer.calls) == 1
+    # Расчет идет для центра корзины
+    assert optimizer.calls[0]['driver_rating'] == 4.7
+    assert optimizer.calls[0]['distance_km'] == 5.0
+
+    cache.find_optimal_price({**ORDER, 'driver_rating': 4.9})
+    cache.find_optimal_price(ORDER, steps=20)
+    assert len(optimizer.calls) == 3
+    assert cache.stats['hits'] == 1
+    assert cache.stats['misses'] == 3
+    assert cache.hit_rate() == 0.25
+
+
+def test_least_recently_used_entry_is_evicted():
+    optimizer = CountingOptimizer()
+    cache = RecommendationCache(optimizer, max_size=2)
+    orders = [{**ORDER, 'order_hour': hour} for hour in (1, 2, 3)]
+    cache.find_optimal_price(orders[0])
+    cache.find_optimal_price(orders[1])
+    cache.find_optimal_price(orders[0])
+    cache.find_optimal_price(orders[2])
+
+    assert len(cache) == 2
+    assert cache.stats['evictions'] == 1
+    cache.find_optimal_price(orders[0])
+    assert len(optimizer.calls) == 3
+    cache.find_optimal_price(orders[1])
+    assert len(optimizer.calls) == 4
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    optimizer = CountingOptimizer()
+    cache = RecommendationCache(optimizer, ttl=10)
+    cache.find_optimal_price(ORDER)
+    now[0] += 9
+    cache.find_optimal_price(ORDER)
+    assert len(optimizer.calls) == 1
+
+    now[0] += 2
+    cache.find_optimal_price(ORDER)
+    assert len(optimizer.calls) == 2
+    assert cache.stats['expired'] == 1
+    assert cache.stats['hits'] == 1
+
+
+def test_model_file_change_reloads_with_same_mmap_mode(tmp_path):
+    path = str(tmp_path / 'model.joblib')
+    fit_forest(path, n_estimators=3)
+    optimizer = PriceOptimizer(model_path=path, mmap_mode='r', cube_path=None, verbose=False)
+    cache = RecommendationCache(optimizer)
+    first = cache.find_optimal_price(ORDER)
+    assert len(optimizer.model.estimators_) == 3
+
+    fit_forest(path, n_estimators=5, seed=1)
+    touch_later(path)
+    second = cache.find_optimal_price(ORDER)
+    assert second is not first
+    assert cache.stats['invalidations'] == 1
+    assert cache.stats['misses'] == 2
+    assert len(optimizer.model.estimators_) == 5
+    assert optimizer.model is load_model(path, mmap_mode='r')
+    assert optimizer.model_file == path
+
+
+def test_injected_model_is_not_replaced_by_file(tmp_path):
+    path = str(tmp_path / 'model.joblib')
+    fit_forest(path, n_estimators=3)
+    injected = fit_forest(str(tmp_path / 'other.joblib'), n_estimators=4)
+    optimizer = PriceOptimizer(injected, model_path=path, cube_path=None, verbose=False)
+    cache = RecommendationCache(optimizer)
+    cache.find_optimal_price(ORDER)
+
+    fit_forest(path, n_estimators=5, seed=1)
+    touch_later(path)
+    cache.find_optimal_price(ORDER)
+    assert optimizer.model is injected
+    assert cache.stats['invalidations'] == 0
+    assert cache.stats['hits'] == 1
+
+
+def test_result_computed_before_invalidation_is_not_cached(tmp_path):
+    path = str(tmp_path / 'model.joblib')
+    fit_forest(path, n_estimators=3)
+
+    class RetrainedDuringLookup(CountingOptimizer):
+        """Файл модели меняется, пока считается ответ (как из другого потока)"""
+
+        model_file = path
+
+        def find_optimal_price(self, order_features, **kwargs):
+            result = super().find_optimal_price(order_features, **kwargs)
+            if len(self.calls) == 1:
+                touch_later(path)
+                cache._check_model()
+            return result
+
+        def reload_model(self, model_path=None):
+            self.reloaded = model_path
+
+    optimizer = RetrainedDuringLookup()
+    cache = RecommendationCache(optimizer)
+    cache.find_optimal_price(ORDER)
+    assert optimizer.reloaded == path
+    assert len(cache) == 0
+    assert cache.stats['stale'] == 1
+
+    cache.find_optimal_price(ORDER)
+    cache.find_optimal_price(ORDER)
+    assert len(optimizer.calls) == 2
+    assert cache.stats['hits'] == 1
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from search_strategies import coarse_to_fine_search, golden_section_search, grid_search
+
+PRICE_MIN, PRICE_MAX = 300.0, 450.0
+
+
+class Counted:
+    """Вероятность принятия с подсчетом оцененных цен"""
+
+    def __init__(self, probability):
+        self.probability = probability
+        self.prices = 0
+
+    def __call__(self, prices):
+        self.prices += len(prices)
+        return self.probability(np.asarray(prices, dtype=float))
+
+
+def logistic(prices):
+    """Гладкая убывающая вероятность: доход унимодален, максимум внутри отрезка"""
+    return 1 / (1 + np.exp((prices - 360) / 25))
+
+
+def steps(prices):
+    """
+    Ступенчатая вероятность, как у леса: узкий глобальный максимум дохода
+    около 326 и широкий локальный у 370
+    """
+    return np.select([prices <= 326, prices <= 370], [0.9, 0.75], 0.5)
+
+
+def best_revenue(prices, probabilities) -> float:
+    return float(np.max(prices * probabilities))
+
+
+def test_coarse_to_fine_matches_dense_grid_with_fewer_evaluations():
+    dense = best_revenue(*grid_search(logistic, PRICE_MIN, PRICE_MAX, steps=5000))
+    evaluate = Counted(logistic)
+    found = best_revenue(*coarse_to_fine_search(evaluate, PRICE_MIN, PRICE_MAX))
+    assert found == pytest.approx(dense, rel=1e-4)
+    assert evaluate.prices <= 40
+
+
+def test_golden_section_finds_unimodal_optimum():
+    dense = best_revenue(*grid_search(logistic, PRICE_MIN, PRICE_MAX, steps=5000))
+    prices, probabilities = golden_section_search(logistic, PRICE_MIN, PRICE_MAX, tolerance=0.5)
+    assert best_revenue(prices, probabilities) == pytest.approx(dense, rel=1e-4)
+
+
+def test_golden_section_can_stop_at_local_optimum_on_steps():
+    # Ограничение из докстринга: на ступенчатой вероятности сечение сужается
+    # к локальному максимуму, а сетка находит глобальный
+    grid_prices, grid_probabilities = grid_search(steps, PRICE_MIN, PRICE_MAX, steps=50)
+    golden_prices, golden_probabilities = golden_section_search(steps, PRICE_MIN, PRICE_MAX)
+    grid_best = grid_prices[np.argmax(grid_prices * grid_probabilities)]
+    golden_best = golden_prices[np.argmax(golden_prices * golden_probabilities)]
+
+    assert grid_best < 326
+    assert golden_best > 326
+    assert best_revenue(golden_prices, golden_probabilities) < best_revenue(grid_prices, grid_probabilities)
+
+
+@pytest.mark.parametrize('tolerance', [0, -1, float('nan')])
+def test_golden_section_rejects_non_positive_tolerance(tolerance):
+    with pytest.raises(ValueError):
+        golden_section_search(logistic, PRICE_MIN, PRICE_MAX, tolerance=tolerance)
+
+
+def test_golden_section_iterations_are_capped():
+    # Точность ниже шага float: без предела цикл не закончился бы
+    evaluate = Counted(logistic)
+    golden_section_search(evaluate, PRICE_MIN, PRICE_MAX, tolerance=1e-300, max_iterations=60)
+    assert evaluate.prices == 62
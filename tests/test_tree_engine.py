@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from optimization import PriceOptimizer
+from tree_engine import CompiledForest
+
+N_FEATURES = 6
+
+
+def training_data(seed: int = 0, missing: bool = False):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(2000, N_FEATURES))
+    y = (X[:, 0] + 0.5 * X[:, 1] - X[:, 2] + rng.normal(scale=0.5, size=len(X)) > 0).astype(int)
+    if missing:
+        # Пропуски в обучении: деревья сами выбирают, куда отправлять NaN
+        X[rng.random(X.shape) < 0.1] = np.nan
+    return X, y
+
+
+def fit_forest(missing: bool = False, n_jobs: int = 1, **params):
+    X, y = training_data(missing=missing)
+    params = {'n_estimators': 25, 'max_depth': 8, 'random_state': 0, 'n_jobs': n_jobs, **params}
+    return RandomForestClassifier(**params).fit(X, y)
+
+
+def query_rows(model, seed: int = 1) -> np.ndarray:
+    """Случайные строки, пороги деревьев и соседние с ними float32, крайние float32 и NaN"""
+    rng = np.random.default_rng(seed)
+    # inf sklearn не принимает, поэтому крайние значения - границы float32
+    largest = float(np.finfo(np.float32).max)
+    thresholds = np.concatenate([estimator.tree_.threshold[estimator.tree_.feature >= 0]
+                                 for estimator in model.estimators_])
+    # Разбиения "все известные против NaN" имеют порог inf
+    thresholds = thresholds[np.isfinite(thresholds)]
+    edges = np.concatenate([
+        thresholds,
+        np.nextafter(thresholds.astype(np.float32), np.float32(np.inf)),
+        np.nextafter(thresholds.astype(np.float32), np.float32(-np.inf)),
+        [largest, -largest, 0.0, -0.0],
+    ])
+    X = rng.normal(scale=2, size=(3000, N_FEATURES))
+    mask = rng.random(X.shape) < 0.3
+    X[mask] = rng.choice(edges, size=mask.sum())
+    X[rng.random(X.shape) < 0.1] = np.nan
+    return X
+
+
+@pytest.mark.parametrize('missing', [False, True])
+def test_bitwise_parity_with_sequential_sklearn(missing):
+    model = fit_forest(missing=missing)
+    compiled = CompiledForest.from_model(model)
+    X = query_rows(model)
+    assert np.array_equal(compiled.predict_proba(X), model.predict_proba(X))
+
+
+def test_parity_without_missing_values():
+    model = fit_forest()
+    compiled = CompiledForest.from_model(model)
+    X = query_rows(model)
+    X = X[~np.isnan(X).any(axis=1)]
+    assert np.array_equal(compiled.predict_proba(X), model.predict_proba(X))
+
+
+def test_multithreaded_sklearn_matches_up_to_rounding():
+    model = fit_forest(n_jobs=2, n_estimators=60)
+    compiled = CompiledForest.from_model(model)
+    X = query_rows(model)
+    np.testing.assert_allclose(compiled.predict_proba(X), model.predict_proba(X), rtol=0, atol=1e-12)
+
+
+def test_save_load_roundtrip(tmp_path):
+    model = fit_forest(missing=True)
+    compiled = CompiledForest.from_model(model)
+    compiled.save(str(tmp_path / 'forest'))
+    loaded = CompiledForest.load(str(tmp_path / 'forest'), mmap_mode='r')
+    X = query_rows(model)
+    assert np.array_equal(loaded.predict_proba(X), model.predict_proba(X))
+
+
+def test_optimizer_stays_bitwise_on_large_matrices():
+    # Больше прежнего порога перехода на многопоточный sklearn (5000 строк)
+    model = fit_forest(n_jobs=2)
+    X = np.tile(query_rows(model), (4, 1))
+    optimizer = PriceOptimizer(model, cube_path=None, verbose=False)
+    probabilities = optimizer._predict_proba(X)
+    model.set_params(n_jobs=1)
+    assert np.array_equal(probabilities, model.predict_proba(X)[:, 1])